@@ -1,44 +1,211 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, session
+from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, session, Response, stream_with_context, g, has_app_context, make_response
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager, UserMixin, login_user, login_required, logout_user, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
 import secrets
 import string
-from datetime import datetime
+from collections import Counter
+from datetime import datetime, timedelta
+import base64
+import hashlib
+import hmac
+import math
+import csv
+import io
 import json
+import zlib
+from functools import wraps
 import os
 from dotenv import load_dotenv
+from ingest_queue import IngestQueue, QueueFull, IngestTimeout, ACK_BEFORE_COMMIT
+from webhook_cache import WebhookCache, CachedWebhook
+import log_storage
+import payload_store
+from payload_store import PayloadStore, PayloadTooLarge, SpilledBody
+import retention
+from live_tail import LogBroadcaster, TooManySubscribers
+from traffic_stats import StatsCollector
+from metrics import MetricsRegistry, COUNTER, GAUGE, HISTOGRAM, SUM, MIN
+from rate_limit import RateLimiter, LoadShedder, MemoryBucketStore, SQLiteBucketStore
+import delivery
+import replay
+from db_routing import RoutingSession, ReplicaMonitor, REPLICA_BIND, sync_sqlite
+import search_index
+import dedup
+import user_session
+from user_session import PasswordHasher, HasherBusy
+from response_cache import Versions, MemoryVersionStore, SQLiteVersionStore, ResponseCache, build_salt
+from field_extraction import FieldExtractor, MAX_LENGTHS as FIELD_LENGTHS, load_paths as load_field_paths
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
+import threading
+import time
 
 # Carregar variáveis de ambiente
 load_dotenv()
 
-# Criar pasta instance
+# Configurar Flask
+app = Flask(__name__)
+app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'dev-key-change-in-production-VERY-IMPORTANT')
+
+# Pasta instance (criada por create_app, não na importação) com o estado de
+# execução: stamps dos caches, versões, rate limit, locks, payloads, métricas
+app.config['INSTANCE_DIR'] = os.getenv('INSTANCE_DIR', os.path.join(app.root_path, 'instance'))
+
 def ensure_instance_folder():
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    instance_path = os.path.join(current_dir, 'instance')
-    
+    instance_path = app.config['INSTANCE_DIR']
     if not os.path.exists(instance_path):
         os.makedirs(instance_path, exist_ok=True)
         print(f"✅ Pasta instance criada: {instance_path}")
     
     return instance_path
 
-# Garantir pasta instance
-instance_path = ensure_instance_folder()
-
-# Configurar Flask
-app = Flask(__name__)
-app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'dev-key-change-in-production-VERY-IMPORTANT')
+def instance_file(name):
+    return os.path.join(app.config['INSTANCE_DIR'], name)
 
 app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+# Pool de conexões: deve cobrir as threads que usam o banco ao mesmo tempo
+# (ASGI_DB_THREADS, workers em segundo plano); tamanho e overflow não se
+# aplicam ao SQLite. Reciclar antes do wait_timeout do MySQL e testar a
+# conexão na retirada evita "MySQL server has gone away" após ociosidade.
+app.config['DB_POOL_SIZE'] = int(os.getenv('DB_POOL_SIZE', '10'))
+app.config['DB_MAX_OVERFLOW'] = int(os.getenv('DB_MAX_OVERFLOW', '10'))
+app.config['DB_POOL_TIMEOUT'] = float(os.getenv('DB_POOL_TIMEOUT', '30'))
+app.config['DB_POOL_RECYCLE'] = int(os.getenv('DB_POOL_RECYCLE', '280'))
+app.config['DB_POOL_PRE_PING'] = os.getenv('DB_POOL_PRE_PING', '1') == '1'
+# Réplica de leitura para o painel e a API (vazio = tudo no primário). Fora
+# do ar ou com atraso acima de DB_REPLICA_MAX_LAG_S (0 = não medir), as
+# leituras voltam ao primário; depois de uma alteração, o usuário lê do
+# primário por DB_REPLICA_STICKY_S segundos
+app.config['DATABASE_REPLICA_URL'] = os.getenv('DATABASE_REPLICA_URL')
+app.config['DB_REPLICA_MAX_LAG_S'] = float(os.getenv('DB_REPLICA_MAX_LAG_S', '5'))
+app.config['DB_REPLICA_CHECK_S'] = float(os.getenv('DB_REPLICA_CHECK_S', '2'))
+app.config['DB_REPLICA_STICKY_S'] = float(os.getenv('DB_REPLICA_STICKY_S', '10'))
+# Desenvolvimento com dois SQLite (sem replicação): copiar o primário para a
+# réplica a cada verificação (ou manualmente: flask --app app sync-replica)
+app.config['DB_REPLICA_SQLITE_SYNC'] = os.getenv('DB_REPLICA_SQLITE_SYNC', '0') == '1'
+
+# Ingestão: 'sync' (commit por requisição) ou 'queue' (fila write-behind em lote)
+app.config['INGEST_MODE'] = os.getenv('INGEST_MODE', 'sync')
+app.config['INGEST_DURABILITY'] = os.getenv('INGEST_DURABILITY', ACK_BEFORE_COMMIT)
+app.config['INGEST_BATCH_SIZE'] = int(os.getenv('INGEST_BATCH_SIZE', '500'))
+app.config['INGEST_FLUSH_MS'] = int(os.getenv('INGEST_FLUSH_MS', '50'))
+app.config['INGEST_QUEUE_MAX'] = int(os.getenv('INGEST_QUEUE_MAX', '10000'))
+app.config['INGEST_ENQUEUE_TIMEOUT_MS'] = int(os.getenv('INGEST_ENQUEUE_TIMEOUT_MS', '100'))
+app.config['INGEST_COMMIT_TIMEOUT_S'] = float(os.getenv('INGEST_COMMIT_TIMEOUT_S', '5'))
+# Logs da fila que não puderam ser gravados (JSON por linha; padrão: <instance>/ingest_dead_letter.jsonl)
+app.config['INGEST_DEAD_LETTER'] = os.getenv('INGEST_DEAD_LETTER')
+# Front-end assíncrono (asgi_ingest.py): threads para as etapas com banco e
+# requisições aguardando essas threads antes de responder 503
+app.config['ASGI_DB_THREADS'] = int(os.getenv('ASGI_DB_THREADS', '8'))
+app.config['ASGI_MAX_PENDING'] = int(os.getenv('ASGI_MAX_PENDING', '1000'))
+
+# Deduplicação: off | header (id de entrega do provedor) | body (id ou hash do corpo)
+app.config['INGEST_DEDUP'] = os.getenv('INGEST_DEDUP', dedup.DEDUP_OFF)
+app.config['INGEST_DEDUP_HEADERS'] = [
+    name.strip() for name in os.getenv('INGEST_DEDUP_HEADERS', ','.join(dedup.DEFAULT_HEADERS)).split(',') if name.strip()
+]
+app.config['INGEST_DEDUP_CACHE_SIZE'] = int(os.getenv('INGEST_DEDUP_CACHE_SIZE', '100000'))
+
+# Cache de resolução de webhooks nas rotas públicas (segundos)
+app.config['WEBHOOK_CACHE_TTL'] = float(os.getenv('WEBHOOK_CACHE_TTL', '60'))
+app.config['WEBHOOK_CACHE_NEGATIVE_TTL'] = float(os.getenv('WEBHOOK_CACHE_NEGATIVE_TTL', '10'))
+app.config['WEBHOOK_CACHE_SIZE'] = int(os.getenv('WEBHOOK_CACHE_SIZE', '10000'))
+app.config['WEBHOOK_CACHE_STAMP_INTERVAL'] = float(os.getenv('WEBHOOK_CACHE_STAMP_INTERVAL', '1'))
+
+# Usuário logado: cache por id e identidade na sessão (segundos)
+app.config['USER_CACHE_TTL'] = float(os.getenv('USER_CACHE_TTL', '60'))
+app.config['USER_CACHE_NEGATIVE_TTL'] = float(os.getenv('USER_CACHE_NEGATIVE_TTL', '10'))
+app.config['USER_CACHE_SIZE'] = int(os.getenv('USER_CACHE_SIZE', '10000'))
+app.config['USER_CACHE_STAMP_INTERVAL'] = float(os.getenv('USER_CACHE_STAMP_INTERVAL', '1'))
+app.config['USER_SESSION_TTL'] = float(os.getenv('USER_SESSION_TTL', '300'))
+# ETag/Last-Modified no painel e na API (RESPONSE_VERSION_STORE=memory para um único processo)
+app.config['HTTP_CACHE'] = os.getenv('HTTP_CACHE', '1') == '1'
+app.config['RESPONSE_VERSION_STORE'] = os.getenv('RESPONSE_VERSION_STORE', 'sqlite')
+# Hash de senhas fora da thread da requisição
+app.config['AUTH_HASH_WORKERS'] = int(os.getenv('AUTH_HASH_WORKERS', '2'))
+app.config['AUTH_HASH_MAX_PENDING'] = int(os.getenv('AUTH_HASH_MAX_PENDING', '16'))
 
-print(f"🗄️ Banco configurado via variável .env")
+# Armazenamento dos logs: corpos acima do limite (bytes) são comprimidos
+app.config['LOG_BODY_COMPRESS_THRESHOLD'] = int(os.getenv('LOG_BODY_COMPRESS_THRESHOLD', '1024'))
+app.config['LOG_BODY_CODEC'] = log_storage.available_codec(os.getenv('LOG_BODY_CODEC', log_storage.CODEC_ZLIB))
+# Corpos recebidos: limite (bytes; 0 = sem limite, o valor por webhook tem prioridade)
+# e transbordo para arquivos em PAYLOAD_DIR acima do limiar
+app.config['INGEST_MAX_BODY_BYTES'] = int(os.getenv('INGEST_MAX_BODY_BYTES', str(10 * 1024 * 1024)))
+app.config['INGEST_SPILL_THRESHOLD'] = int(os.getenv('INGEST_SPILL_THRESHOLD', str(1024 * 1024)))
+app.config['PAYLOAD_DIR'] = os.getenv('PAYLOAD_DIR')  # padrão: <instance>/payloads
+app.config['PAYLOAD_PREVIEW_BYTES'] = int(os.getenv('PAYLOAD_PREVIEW_BYTES', str(256 * 1024)))
 
-# Inicializar SQLAlchemy e Login Manager
-db = SQLAlchemy(app)
+# Retenção de logs (0 = sem limite); valores por webhook têm prioridade
+app.config['LOG_RETENTION_DAYS'] = int(os.getenv('LOG_RETENTION_DAYS', '0'))
+app.config['LOG_RETENTION_MAX_ROWS'] = int(os.getenv('LOG_RETENTION_MAX_ROWS', '0'))
+app.config['LOG_RETENTION_BATCH'] = int(os.getenv('LOG_RETENTION_BATCH', '1000'))
+app.config['LOG_RETENTION_PAUSE_MS'] = int(os.getenv('LOG_RETENTION_PAUSE_MS', '50'))
+app.config['LOG_RETENTION_INTERVAL_S'] = float(os.getenv('LOG_RETENTION_INTERVAL_S', '300'))
+app.config['LOG_RETENTION_WORKER'] = os.getenv('LOG_RETENTION_WORKER', '0') == '1'
+
+# Acompanhamento ao vivo (SSE); LIVE_TAIL_POLL_S=0 desliga o poller entre workers
+app.config['LIVE_TAIL_MAX_SUBSCRIBERS'] = int(os.getenv('LIVE_TAIL_MAX_SUBSCRIBERS', '100'))
+app.config['LIVE_TAIL_BUFFER'] = int(os.getenv('LIVE_TAIL_BUFFER', '200'))
+app.config['LIVE_TAIL_HEARTBEAT_S'] = float(os.getenv('LIVE_TAIL_HEARTBEAT_S', '15'))
+app.config['LIVE_TAIL_POLL_S'] = float(os.getenv('LIVE_TAIL_POLL_S', '2'))
+
+# Rollups de tráfego por minuto
+app.config['STATS_FLUSH_S'] = float(os.getenv('STATS_FLUSH_S', '10'))
+app.config['STATS_RETENTION_DAYS'] = int(os.getenv('STATS_RETENTION_DAYS', '30'))
+
+# Campos extraídos do corpo JSON na ingestão (LOG_FIELD_PATHS sobrescreve os caminhos)
+app.config['LOG_FIELD_PATHS'] = load_field_paths(os.getenv('LOG_FIELD_PATHS'))
+# Limite dos corpos interpretados; corpos em disco até este tamanho são lidos do arquivo
+app.config['LOG_EXTRACT_MAX_BYTES'] = int(os.getenv('LOG_EXTRACT_MAX_BYTES', str(4 * 1024 * 1024)))
+
+# Busca textual nos payloads (FTS5 no SQLite, FULLTEXT no MySQL)
+app.config['SEARCH_INDEX'] = os.getenv('SEARCH_INDEX', '1') == '1'
+app.config['SEARCH_INDEX_BATCH'] = int(os.getenv('SEARCH_INDEX_BATCH', '500'))
+app.config['SEARCH_INDEX_INTERVAL_S'] = float(os.getenv('SEARCH_INDEX_INTERVAL_S', '5'))
+app.config['SEARCH_MAX_CHARS'] = int(os.getenv('SEARCH_MAX_CHARS', '65536'))
+
+# Métricas Prometheus (/metrics); METRICS_TOKEN exige Authorization: Bearer.
+# Sem token o endpoint só responde para 127.0.0.1/::1
+app.config['METRICS_DIR'] = os.getenv('METRICS_DIR')  # padrão: <instance>/metrics
+app.config['METRICS_SYNC_S'] = float(os.getenv('METRICS_SYNC_S', '5'))
+app.config['METRICS_TOKEN'] = os.getenv('METRICS_TOKEN')
+
+# Limite de taxa no endpoint público (requisições/s; 0 = sem limite)
+app.config['RATE_LIMIT_STORE'] = os.getenv('RATE_LIMIT_STORE', 'sqlite')
+app.config['RATE_LIMIT_WEBHOOK_RPS'] = float(os.getenv('RATE_LIMIT_WEBHOOK_RPS', '0'))
+app.config['RATE_LIMIT_WEBHOOK_BURST'] = int(os.getenv('RATE_LIMIT_WEBHOOK_BURST', '50'))
+app.config['RATE_LIMIT_IP_RPS'] = float(os.getenv('RATE_LIMIT_IP_RPS', '0'))
+app.config['RATE_LIMIT_IP_BURST'] = int(os.getenv('RATE_LIMIT_IP_BURST', '20'))
+
+# Descarte de carga: aceitar sem gravar corpos acima destes limites (0 = desligado)
+app.config['SHED_QUEUE_DEPTH'] = int(os.getenv('SHED_QUEUE_DEPTH', '0'))
+app.config['SHED_DB_LATENCY_MS'] = float(os.getenv('SHED_DB_LATENCY_MS', '0'))
+
+# Reenvio para destinos (DELIVERY_WORKER=1 liga o despachante neste processo)
+app.config['DELIVERY_WORKER'] = os.getenv('DELIVERY_WORKER', '0') == '1'
+app.config['DELIVERY_WORKERS'] = int(os.getenv('DELIVERY_WORKERS', '8'))
+app.config['DELIVERY_POLL_S'] = float(os.getenv('DELIVERY_POLL_S', '1'))
+app.config['DELIVERY_TIMEOUT_S'] = float(os.getenv('DELIVERY_TIMEOUT_S', '10'))
+app.config['DELIVERY_MAX_ATTEMPTS'] = int(os.getenv('DELIVERY_MAX_ATTEMPTS', '8'))
+app.config['DELIVERY_BACKOFF_S'] = float(os.getenv('DELIVERY_BACKOFF_S', '5'))
+app.config['DELIVERY_LEASE_S'] = float(os.getenv('DELIVERY_LEASE_S', '300'))
+# Limite por destino somado entre todos os processos (conta as entregas em andamento no banco)
+app.config['DELIVERY_DEST_CONCURRENCY'] = int(os.getenv('DELIVERY_DEST_CONCURRENCY', '4'))
+# Hosts/redes internos liberados como destino, ex.: "localhost,10.0.0.0/8" (padrão: só endereços públicos)
+app.config['DELIVERY_ALLOWED_HOSTS'] = os.getenv('DELIVERY_ALLOWED_HOSTS', '')
+app.config['DELIVERY_RETENTION_DAYS'] = int(os.getenv('DELIVERY_RETENTION_DAYS', '7'))
+
+# Replay de tráfego histórico (API e replay_logs.py)
+app.config['REPLAY_MAX_RUNNING'] = int(os.getenv('REPLAY_MAX_RUNNING', '2'))
+app.config['REPLAY_MAX_CONCURRENCY'] = int(os.getenv('REPLAY_MAX_CONCURRENCY', '32'))
+app.config['REPLAY_TIMEOUT_S'] = float(os.getenv('REPLAY_TIMEOUT_S', '10'))
+
+# SQLAlchemy e Login Manager sem app: o engine só é criado em create_app()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 login_manager = LoginManager()
-login_manager.init_app(app)
 login_manager.login_view = 'login'
 login_manager.login_message = 'Você precisa fazer login para acessar esta página.'
 login_manager.login_message_category = 'info'
@@ -68,6 +235,17 @@ class Webhook(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     is_active = db.Column(db.Boolean, default=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    # Política de retenção própria (None = usar o padrão global)
+    retention_days = db.Column(db.Integer)
+    retention_max_rows = db.Column(db.Integer)
+    # Limite de taxa próprio (requisições/s e rajada; None = padrão global)
+    rate_limit = db.Column(db.Float)
+    rate_limit_burst = db.Column(db.Integer)
+    # Tamanho máximo do corpo em bytes (None = padrão global)
+    max_body_bytes = db.Column(db.Integer)
+    # Mantidos pelos rollups de tráfego (não por COUNT(*) nos logs)
+    request_count = db.Column(db.Integer, default=0)
+    last_request = db.Column(db.DateTime)
     
     # Relacionamentos
     logs = db.relationship('WebhookLog', backref='webhook', lazy=True, cascade='all, delete-orphan')
@@ -76,29 +254,430 @@ class Webhook(db.Model):
     def __repr__(self):
         return f'<Webhook {self.name}>'
 
+class HeaderSet(db.Model):
+    """Conjunto de cabeçalhos internado, endereçado pelo SHA-256 do JSON"""
+    hash = db.Column(db.String(64), primary_key=True)
+    headers = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<HeaderSet {self.hash[:12]}>'
+
 class WebhookLog(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     webhook_id = db.Column(db.Integer, db.ForeignKey('webhook.id'), nullable=False)
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
     method = db.Column(db.String(10), nullable=False)
-    headers = db.Column(db.Text)
-    body = db.Column(db.Text)
+    # headers/body em texto puro ficam para logs antigos e corpos pequenos;
+    # são carregados só quando o log é aberto (deferred)
+    headers = db.deferred(db.Column(db.Text))
+    headers_hash = db.Column(db.String(64), index=True)
+    body = db.deferred(db.Column(db.Text))
+    body_blob = db.deferred(db.Column(db.LargeBinary(length=2**32 - 1)))
+    body_codec = db.Column(db.String(10))
+    body_size = db.Column(db.Integer)
+    # SHA-256 do corpo gravado em disco (body_codec = 'file'), ver payload_store.py
+    body_ref = db.Column(db.String(64))
     ip_address = db.Column(db.String(45))
     user_agent = db.Column(db.String(200))
+    # Campos extraídos do corpo na ingestão (ver field_extraction.py)
+    event_object = db.Column(db.String(FIELD_LENGTHS['event_object']))
+    event_field = db.Column(db.String(FIELD_LENGTHS['event_field']))
+    event_type = db.Column(db.String(FIELD_LENGTHS['event_type']))
+    message_id = db.Column(db.String(FIELD_LENGTHS['message_id']))
+    sender = db.Column(db.String(FIELD_LENGTHS['sender']))
+    error_code = db.Column(db.String(FIELD_LENGTHS['error_code']))
+    # Chave de deduplicação (id de entrega ou hash do corpo), ver dedup.py
+    dedup_key = db.Column(db.String(64))
+    
+    # Índice composto para paginação por keyset (seek) em (timestamp, id);
+    # os campos mais filtrados têm o mesmo formato
+    __table_args__ = (
+        db.Index('ix_webhook_log_webhook_ts', 'webhook_id', 'timestamp', 'id'),
+        db.Index('ix_webhook_log_event_type', 'webhook_id', 'event_type', 'timestamp', 'id'),
+        db.Index('ix_webhook_log_sender', 'webhook_id', 'sender', 'timestamp', 'id'),
+        db.Index('ix_webhook_log_message_id', 'webhook_id', 'message_id'),
+        db.Index('ix_webhook_log_error_code', 'webhook_id', 'error_code'),
+        db.Index('ix_webhook_log_body_ref', 'body_ref'),
+        db.Index('uq_webhook_log_dedup', 'webhook_id', 'dedup_key', unique=True),
+    )
     
     def __repr__(self):
         return f'<WebhookLog {self.id}>'
 
+class WebhookLogSearch(db.Model):
+    """Texto indexado de cada log (ver search_index.py)"""
+    __tablename__ = search_index.SEARCH_TABLE
+    
+    log_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    webhook_id = db.Column(db.Integer, nullable=False)
+    content = db.Column(db.Text(length=2**24 - 1), nullable=False)
+    
+    __table_args__ = (
+        db.Index('ix_webhook_log_search_webhook', 'webhook_id', 'log_id'),
+        db.Index('ft_webhook_log_search', 'content', mysql_prefix='FULLTEXT').ddl_if(dialect='mysql'),
+    )
+
+class WebhookStat(db.Model):
+    """Rollup de tráfego: requisições por webhook, minuto, método e status"""
+    __tablename__ = 'webhook_stats'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    webhook_id = db.Column(db.Integer, db.ForeignKey('webhook.id'), nullable=False)
+    bucket = db.Column(db.DateTime, nullable=False, index=True)
+    method = db.Column(db.String(10), nullable=False)
+    status = db.Column(db.Integer, nullable=False)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    
+    __table_args__ = (
+        db.UniqueConstraint('webhook_id', 'bucket', 'method', 'status', name='uq_webhook_stats_bucket'),
+    )
+    
+    def __repr__(self):
+        return f'<WebhookStat {self.webhook_id} {self.bucket}>'
+
+class WebhookDestination(db.Model):
+    """URL para onde os payloads recebidos são reenviados"""
+    id = db.Column(db.Integer, primary_key=True)
+    webhook_id = db.Column(db.Integer, db.ForeignKey('webhook.id'), nullable=False, index=True)
+    url = db.Column(db.String(500), nullable=False)
+    is_active = db.Column(db.Boolean, default=True)
+    max_concurrency = db.Column(db.Integer)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<WebhookDestination {self.url}>'
+
+class DeliveryAttempt(db.Model):
+    """Entrega de um log a um destino (pending → delivered | dead)"""
+    id = db.Column(db.Integer, primary_key=True)
+    webhook_id = db.Column(db.Integer, nullable=False, index=True)
+    # Sem FK: a retenção pode excluir o log antes da entrega
+    log_id = db.Column(db.Integer, nullable=False)
+    destination_id = db.Column(db.Integer, db.ForeignKey('webhook_destination.id'), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default=delivery.PENDING)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    last_status_code = db.Column(db.Integer)
+    last_error = db.Column(db.String(500))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        db.Index('ix_delivery_attempt_due', 'status', 'next_attempt_at'),
+    )
+    
+    def __repr__(self):
+        return f'<DeliveryAttempt {self.id} {self.status}>'
+
+class ReplayRun(db.Model):
+    """Replay de logs para uma URL de teste (running → finished | cancelled | failed)"""
+    id = db.Column(db.Integer, primary_key=True)
+    webhook_id = db.Column(db.Integer, db.ForeignKey('webhook.id'), nullable=False, index=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    target_url = db.Column(db.String(500), nullable=False)
+    # Filtros e parâmetros (JSON) e relatório atualizado durante a execução
+    params = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(20), nullable=False, default=replay.RUNNING)
+    cancel_requested = db.Column(db.Boolean, default=False)
+    report = db.Column(db.Text)
+    error = db.Column(db.String(500))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+    
+    def __repr__(self):
+        return f'<ReplayRun {self.id} {self.status}>'
+
+class DatabaseHeartbeat(db.Model):
+    """Batimento gravado no primário e lido na réplica para medir o atraso"""
+    id = db.Column(db.Integer, primary_key=True)
+    beat_at = db.Column(db.Float, nullable=False)
+
+def load_cached_user(user_id):
+    """Cópia leve do usuário para o cache (None se não existir)"""
+    with app.app_context():
+        user = db.session.get(User, user_id)
+        return user_session.from_user(user) if user else None
+
+def user_version(user_id):
+    """Versão do usuário: muda só quando ele é alterado (senha, desativação)"""
+    return response_versions.version(f'account:{user_id}')
+
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    # Identidade recente na sessão assinada: nenhuma consulta ao banco
+    version = user_version(user_id)
+    user = user_session.load_identity(session, user_id, version, app.config['USER_SESSION_TTL'])
+    if user is not None:
+        return user
+    
+    user = user_cache.get(int(user_id))
+    if user is None or not user.is_active:
+        session.pop(user_session.SESSION_KEY, None)
+        return None
+    user_session.store_identity(session, user, version)
+    return user
+
+# Alterações de usuários (senha, desativação) invalidam o cache após o commit
+@event.listens_for(User, 'after_update')
+def mark_user_changed(mapper, connection, target):
+    db.session.info.setdefault('changed_users', set()).add(target.id)
+
+@event.listens_for(db.session, 'after_commit')
+def invalidate_changed_users(session_):
+    changed = session_.info.pop('changed_users', ())
+    for user_id in changed:
+        user_cache.invalidate(user_id)
+    response_versions.bump(*(f'account:{user_id}' for user_id in changed))
+
+@event.listens_for(db.session, 'after_rollback')
+def forget_changed_users(session_):
+    session_.info.pop('changed_users', None)
+    session_.info.pop('changed_versions', None)
+
+# RÉPLICA DE LEITURA
+def probe_replica():
+    """Gravar o batimento no primário; retorna o último que chegou à réplica"""
+    table = DatabaseHeartbeat.__table__
+    with app.app_context():
+        with db.engine.begin() as conn:
+            updated = conn.execute(table.update().where(table.c.id == 1).values(beat_at=time.time())).rowcount
+        if not updated:
+            try:
+                with db.engine.begin() as conn:
+                    conn.execute(table.insert().values(id=1, beat_at=time.time()))
+            except IntegrityError:
+                pass  # outro processo criou a linha
+        if app.config['DB_REPLICA_SQLITE_SYNC']:
+            sync_replica()
+        with db.engines[REPLICA_BIND].connect() as conn:
+            return conn.execute(db.select(table.c.beat_at).where(table.c.id == 1)).scalar()
+
+def sync_replica():
+    """Copiar o primário SQLite para a réplica SQLite (requer app context)"""
+    primary, replica = db.engine, db.engines[REPLICA_BIND]
+    if primary.dialect.name != 'sqlite' or replica.dialect.name != 'sqlite':
+        raise RuntimeError('Sincronização local só entre dois bancos SQLite')
+    sync_sqlite(primary, replica)
+
+# Até quando (epoch) o usuário lê do primário depois de uma alteração
+STICKY_SESSION_KEY = '_db_primary_until'
+
+def replica_reads(view):
+    """Views somente leitura: consultas de GET/HEAD vão para a réplica quando possível"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if app.config['DATABASE_REPLICA_URL'] and request.method in ('GET', 'HEAD'):
+            sticky = session.get(STICKY_SESSION_KEY, 0) > time.time()
+            g.db_replica = replica_monitor.healthy and not sticky
+            metrics.inc('db_read_route_total', target='replica' if g.db_replica else 'primary')
+        try:
+            return view(*args, **kwargs)
+        finally:
+            error = g.pop('db_replica_error', None)
+            if error is not None:
+                replica_monitor.fail(f'{type(error).__name__}: ' + (str(error).splitlines() or [''])[0])
+                metrics.inc('db_read_route_total', target='fallback')
+    return wrapper
+
+def replica_behind(last_modified):
+    """A réplica lida nesta requisição pode ainda não ter a versão ``last_modified``"""
+    if not g.get('db_replica', False) or last_modified is None:
+        return False
+    position = replica_monitor.position
+    return position is None or last_modified > position
+
+@event.listens_for(db.session, 'after_commit')
+def mark_request_wrote(session_):
+    if has_app_context():
+        g.db_wrote = True
+
+@app.after_request
+def stick_to_primary(response):
+    """Depois de alterar algo, o usuário lê do primário até a réplica alcançar"""
+    if (g.get('db_wrote') and app.config['DATABASE_REPLICA_URL']
+            and request.method not in ('GET', 'HEAD') and '_user_id' in session):
+        session[STICKY_SESSION_KEY] = time.time() + app.config['DB_REPLICA_STICKY_S']
+    return response
+
+# CACHE HTTP DO PAINEL
+def build_response_salt():
+    """Muda a cada deploy: páginas em cache no navegador não sobrevivem a templates novos.
+    
+    Calculado em init_components (percorre templates/ e static/), não na importação.
+    """
+    return build_salt(
+        os.path.abspath(__file__),
+        os.path.join(app.root_path, app.template_folder),
+        os.path.join(app.root_path, 'static')
+    )
+
+# Alterações de webhooks e destinos mudam o ETag das páginas do dono
+@event.listens_for(Webhook, 'after_insert')
+@event.listens_for(Webhook, 'after_update')
+@event.listens_for(Webhook, 'after_delete')
+def mark_webhook_changed(mapper, connection, target):
+    db.session.info.setdefault('changed_versions', set()).update({f'user:{target.user_id}', f'webhook:{target.id}'})
+
+@event.listens_for(WebhookDestination, 'after_insert')
+@event.listens_for(WebhookDestination, 'after_update')
+@event.listens_for(WebhookDestination, 'after_delete')
+def mark_destination_changed(mapper, connection, target):
+    db.session.info.setdefault('changed_versions', set()).add(f'webhook:{target.webhook_id}')
+
+@event.listens_for(db.session, 'after_commit')
+def bump_changed_versions(session_):
+    keys = session_.info.pop('changed_versions', None)
+    if keys:
+        response_versions.bump(*keys)
+
+# PAINEL
+DASHBOARD_VOLUME_WINDOW = timedelta(hours=24)
+
+def dashboard_window_key():
+    """Minuto atual: o volume em 24h muda com o tempo mesmo sem tráfego novo"""
+    return datetime.utcnow().strftime('%Y%m%d%H%M')
+
+def load_dashboard(user_id):
+    """[(webhook, volume nas últimas 24h)] do usuário numa única consulta agrupada"""
+    volume = (
+        db.select(WebhookStat.webhook_id, db.func.sum(WebhookStat.count).label('volume'))
+        .join(Webhook, Webhook.id == WebhookStat.webhook_id)
+        .where(Webhook.user_id == user_id, WebhookStat.bucket >= datetime.utcnow() - DASHBOARD_VOLUME_WINDOW)
+        .group_by(WebhookStat.webhook_id)
+        .subquery()
+    )
+    rows = db.session.execute(
+        db.select(Webhook, db.func.coalesce(volume.c.volume, 0))
+        .outerjoin(volume, volume.c.webhook_id == Webhook.id)
+        .where(Webhook.user_id == user_id)
+        .order_by(Webhook.id)
+    ).all()
+    return [(webhook, int(volume_24h)) for webhook, volume_24h in rows]
+
+def serialize_dashboard(rows):
+    """Resumo JSON do painel: webhooks e totais"""
+    webhooks = [{
+        'id': webhook.id,
+        'name': webhook.name,
+        'is_active': bool(webhook.is_active),
+        'created_at': webhook.created_at.isoformat(),
+        'url': url_for('receive_webhook', webhook_name=webhook.name, _external=True),
+        'request_count': webhook.request_count or 0,
+        'last_request': webhook.last_request.isoformat() if webhook.last_request else None,
+        'volume_24h': volume_24h
+    } for webhook, volume_24h in rows]
+    last_requests = [w['last_request'] for w in webhooks if w['last_request']]
+    return {
+        'webhooks': webhooks,
+        'totals': {
+            'webhooks': len(webhooks),
+            'active': sum(1 for w in webhooks if w['is_active']),
+            'request_count': sum(w['request_count'] for w in webhooks),
+            'volume_24h': sum(w['volume_24h'] for w in webhooks),
+            'last_request': max(last_requests) if last_requests else None
+        }
+    }
+
+def user_webhook_ids(user_id):
+    """Ids dos webhooks do usuário, consultados só quando o conjunto muda"""
+    version, updated = response_versions.validators([f'user:{user_id}'])
+    ids = user_webhook_ids_cache.get(user_id, version) if version else None
+    if ids is None:
+        ids = tuple(db.session.execute(
+            db.select(Webhook.id).where(Webhook.user_id == user_id).order_by(Webhook.id)
+        ).scalars())
+        if version and not replica_behind(updated):
+            user_webhook_ids_cache.put(user_id, version, ids)
+    return ids
+
+def dashboard_validators(webhook_ids=None, *extra):
+    """(etag, last_modified) de uma página do usuário logado, sem consultar o banco.
+    
+    Retorna (None, None) quando a resposta não deve ser validada (mensagens
+    flash pendentes, cache desligado ou réplica atrás da versão atual).
+    """
+    if not app.config['HTTP_CACHE'] or '_flashes' in session:
+        return None, None
+    if webhook_ids is None:
+        webhook_ids = user_webhook_ids(current_user.id)
+    keys = [f'user:{current_user.id}'] + [f'webhook:{webhook_id}' for webhook_id in webhook_ids]
+    etag, last_modified = response_versions.validators(keys, response_salt, current_user.id, request.host_url, *extra)
+    if replica_behind(last_modified):
+        # Conteúdo da réplica pode ser anterior a esta versão: não cachear com este ETag
+        return None, None
+    return etag, last_modified
+
+def not_modified(etag, last_modified):
+    """Resposta 304 se o cliente já tem esta versão (None caso contrário)"""
+    if etag is None:
+        return None
+    if request.if_none_match:
+        matched = request.if_none_match.contains(etag)
+    elif request.if_modified_since and last_modified:
+        matched = int(last_modified) <= request.if_modified_since.timestamp()
+    else:
+        matched = False
+    return with_validators(Response(status=304), etag, last_modified) if matched else None
+
+def cached_json(cache_key, etag, last_modified, build):
+    """Resposta JSON servida do cache quando o ETag não mudou; ``build()`` monta os dados"""
+    body = api_response_cache.get(cache_key, etag) if etag else None
+    if body is None:
+        body = app.json.dumps(build())
+        if etag:
+            api_response_cache.put(cache_key, etag, body)
+    return with_validators(Response(body, mimetype='application/json'), etag, last_modified)
+
+def with_validators(response, etag, last_modified):
+    """Adicionar ETag/Last-Modified e exigir revalidação a cada uso"""
+    if etag is None:
+        return response
+    response.set_etag(etag)
+    if last_modified:
+        response.last_modified = int(last_modified)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
 
 # FUNÇÕES AUXILIARES
+def upgrade_schema():
+    """Adicionar colunas e índices novos a tabelas já existentes.
+    
+    create_all() só cria tabelas que não existem; isto cobre as colunas
+    (sempre anuláveis) e índices adicionados depois aos modelos.
+    """
+    inspector = db.inspect(db.engine)
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            column_type = column.type.compile(dialect=db.engine.dialect)
+            with db.engine.begin() as conn:
+                conn.execute(db.text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+            print(f"🔧 Coluna adicionada: {table.name}.{column.name}")
+        # MySQL particionado não aceita índice único sem a coluna de partição
+        partitioned = False
+        if db.engine.dialect.name == 'mysql':
+            import partitions
+            partitioned = partitions.is_partitioned(db.engine, table.name)
+        for index in table.indexes:
+            if index.unique and partitioned:
+                continue
+            index.create(bind=db.engine, checkfirst=True)
+
 def create_tables():
     """Criar tabelas do banco de dados"""
     try:
         with app.app_context():
             db.create_all()
+            
+            upgrade_schema()
+            with db.engine.begin() as conn:
+                search_index.ensure_schema(conn)
             print("✅ Tabelas criadas com sucesso!")
             
             # Criar usuário admin padrão se não existir
@@ -123,6 +702,1125 @@ def create_tables():
         print(f"❌ Erro ao criar tabelas: {e}")
         raise
 
+# Filtros aceitos pela API de logs (colunas extraídas)
+LOG_FIELD_FILTERS = tuple(FIELD_LENGTHS)
+
+def prepare_log_row(row, header_sets):
+    """Converter headers/body brutos para o formato de armazenamento"""
+    headers_json = row.pop('headers', None)
+    row['headers'] = None
+    row['headers_hash'] = None
+    if headers_json is not None:
+        # Estáveis no conjunto internado; os que mudam a cada entrega na linha
+        stable, volatile = log_storage.split_headers(json.loads(headers_json))
+        if volatile:
+            row['headers'] = json.dumps(volatile, sort_keys=True)
+        if stable:
+            stable_json = json.dumps(stable, sort_keys=True)
+            digest = log_storage.header_hash(stable_json)
+            row['headers_hash'] = digest
+            header_sets[digest] = stable_json
+    
+    # Inserts em lote exigem as mesmas chaves em todas as linhas
+    row.setdefault('dedup_key', None)
+    
+    # Interpretar o JSON uma única vez, antes de comprimir
+    raw_body = row.pop('body', None)
+    parse_body = spilled_body_text(row['body_ref'], row.get('body_size')) if row.get('body_ref') else raw_body
+    row.update(field_extractor.extract(parse_body))
+    
+    # Corpo já gravado em disco na leitura: só a referência vai para a linha
+    if row.get('body_ref'):
+        row.update(body=None, body_blob=None, body_codec=log_storage.CODEC_FILE)
+        return row
+    
+    body, body_blob, body_codec, body_size = log_storage.encode_body(
+        raw_body,
+        app.config['LOG_BODY_COMPRESS_THRESHOLD'],
+        app.config['LOG_BODY_CODEC']
+    )
+    row.update(body=body, body_blob=body_blob, body_codec=body_codec, body_size=body_size, body_ref=None)
+    return row
+
+def spilled_body_text(digest, size=None):
+    """Texto de um corpo em disco para a extração de campos (None acima de LOG_EXTRACT_MAX_BYTES)"""
+    limit = app.config['LOG_EXTRACT_MAX_BYTES']
+    if size is not None and size > limit:
+        return None
+    try:
+        data = payloads.read(digest, limit + 1)
+    except (OSError, ValueError) as e:
+        print(f"Erro ao ler corpo {digest[:12]} do disco: {e}")
+        return None
+    return data.decode('utf-8', errors='replace') if len(data) <= limit else None
+
+def intern_header_sets(header_sets):
+    """Inserir conjuntos de cabeçalhos novos (ignorando os que já existem).
+    
+    Sempre na mesma transação dos logs, sem confiar num cache local de
+    hashes já gravados: o GC de conjuntos órfãos (compact_logs.py) pode
+    ter excluído o conjunto desde então.
+    """
+    if not header_sets:
+        return
+    stmt = (
+        db.insert(HeaderSet)
+        .prefix_with('IGNORE', dialect='mysql')
+        .prefix_with('OR IGNORE', dialect='sqlite')
+    )
+    now = datetime.utcnow()
+    db.session.execute(stmt, [
+        {'hash': digest, 'headers': headers_json, 'created_at': now}
+        for digest, headers_json in header_sets.items()
+    ])
+
+def existing_dedup_ids(rows):
+    """{(webhook_id, dedup_key): id} dos logs já gravados com as chaves do lote"""
+    keys_by_webhook = {}
+    for row in rows:
+        if row.get('dedup_key'):
+            keys_by_webhook.setdefault(row['webhook_id'], set()).add(row['dedup_key'])
+    found = {}
+    for webhook_id, keys in keys_by_webhook.items():
+        for log_id, key in db.session.execute(
+            db.select(WebhookLog.id, WebhookLog.dedup_key)
+            .where(WebhookLog.webhook_id == webhook_id, WebhookLog.dedup_key.in_(keys))
+        ):
+            found[(webhook_id, key)] = log_id
+    return found
+
+def store_webhook_logs(rows, return_ids=False, with_duplicates=False):
+    """Gravar um lote de logs, sem regravar duplicatas (requer app context).
+    
+    Para duplicatas o id retornado é o do log original; com
+    ``with_duplicates`` cada item é o par (id, é duplicata).
+    """
+    if not any(row.get('dedup_key') for row in rows):
+        ids = insert_webhook_logs(rows, return_ids)
+        return [(log_id, False) for log_id in ids] if ids is not None and with_duplicates else ids
+    
+    for attempt in range(2):
+        originals = existing_dedup_ids(rows)
+        fresh = []
+        # Para cada linha: ('db', id original) ou ('new', posição em fresh)
+        targets = []
+        batch_keys = {}
+        for row in rows:
+            key = (row['webhook_id'], row.get('dedup_key'))
+            if row.get('dedup_key') and key in originals:
+                targets.append(('db', originals[key]))
+            elif row.get('dedup_key') and key in batch_keys:
+                targets.append(('new', batch_keys[key]))
+            else:
+                if row.get('dedup_key'):
+                    batch_keys[key] = len(fresh)
+                targets.append(('new', len(fresh)))
+                fresh.append(row)
+        try:
+            ids = insert_webhook_logs(fresh, return_ids) if fresh else []
+            break
+        except IntegrityError:
+            # Outro processo gravou a mesma chave entre a consulta e o insert
+            if attempt:
+                raise
+    
+    duplicates = len(rows) - len(fresh)
+    if duplicates:
+        metrics.inc('ingest_duplicates_total', duplicates)
+    if not return_ids:
+        return None
+    
+    result = [value if kind == 'db' else ids[value] for kind, value in targets]
+    for row, log_id in zip(rows, result):
+        if row.get('dedup_key'):
+            recent_dedup_keys.add(row['webhook_id'], row['dedup_key'], log_id)
+    if with_duplicates:
+        # Repetidas dentro do próprio lote também contam como duplicatas
+        seen = set()
+        flags = []
+        for kind, value in targets:
+            flags.append(kind == 'db' or (kind, value) in seen)
+            seen.add((kind, value))
+        return list(zip(result, flags))
+    return result
+
+def insert_webhook_logs(rows, return_ids=False):
+    """Gravar um lote de logs numa única transação (requer app context)"""
+    header_sets = {}
+    rows = [prepare_log_row(dict(row), header_sets) for row in rows]
+    # Ids são necessários também para publicar no stream ao vivo e para
+    # registrar as entregas aos destinos
+    publish = any(live_tail.has_subscribers(row['webhook_id']) for row in rows)
+    destinations = [
+        destinations_cache.get(row['webhook_id']) if row['method'] != 'GET' else None
+        for row in rows
+    ]
+    fan_out = any(destinations)
+    started = time.perf_counter()
+    try:
+        intern_header_sets(header_sets)
+        if return_ids or publish or fan_out:
+            logs = [WebhookLog(**row) for row in rows]
+            db.session.add_all(logs)
+            db.session.flush()
+            ids = [log.id for log in logs]
+            if fan_out:
+                now = datetime.utcnow()
+                db.session.execute(DeliveryAttempt.__table__.insert(), [
+                    {
+                        'webhook_id': row['webhook_id'], 'log_id': log_id, 'destination_id': destination_id,
+                        'status': delivery.PENDING, 'attempts': 0, 'next_attempt_at': now,
+                        'created_at': now, 'updated_at': now
+                    }
+                    for row, log_id, destination_ids in zip(rows, ids, destinations)
+                    for destination_id in (destination_ids or ())
+                ])
+            db.session.commit()
+        else:
+            db.session.execute(WebhookLog.__table__.insert(), rows)
+            db.session.commit()
+            ids = None
+    except Exception:
+        db.session.rollback()
+        raise
+    load_shedder.observe_db_latency(time.perf_counter() - started)
+    if fan_out:
+        delivery_engine.notify()
+    search_indexer.notify()
+    # Logs novos mudam as páginas do webhook: uma escrita de versão por lote gravado
+    response_versions.bump(*{f"webhook:{row['webhook_id']}" for row in rows})
+    if publish:
+        for row, log_id in zip(rows, ids):
+            live_tail.publish(row['webhook_id'], log_event(row, log_id))
+    return ids if return_ids else None
+
+def log_event(row, log_id):
+    """Evento do stream ao vivo (mesmo formato de serialize_log)"""
+    return {
+        'id': log_id,
+        'timestamp': row['timestamp'].isoformat(),
+        'method': row['method'],
+        'ip_address': row['ip_address'],
+        'user_agent': row['user_agent'],
+        'body_size': row['body_size'],
+        'fields': {name: row[name] for name in LOG_FIELD_FILTERS if row.get(name) is not None}
+    }
+
+def poll_new_log_events(webhook_id, after_id):
+    """Logs gravados por outros processos, para o stream ao vivo"""
+    with app.app_context():
+        logs = (
+            WebhookLog.query
+            .filter(WebhookLog.id > after_id, WebhookLog.webhook_id == webhook_id)
+            .order_by(WebhookLog.id)
+            .limit(app.config['LIVE_TAIL_BUFFER'])
+            .all()
+        )
+        return [serialize_log(log) for log in logs]
+
+def catch_up_log_events(webhook_id, after_id, head_id):
+    """Logs entre ``after_id`` e ``head_id`` para a retomada do stream, paginados por id.
+
+    Cada página é lida sob demanda (fora do contexto da requisição), então um
+    painel muito atrasado recebe tudo sem carregar o histórico de uma vez.
+    """
+    page_size = app.config['LIVE_TAIL_BUFFER']
+    while after_id < head_id:
+        with app.app_context():
+            logs = (
+                WebhookLog.query
+                .filter(WebhookLog.id > after_id, WebhookLog.id <= head_id, WebhookLog.webhook_id == webhook_id)
+                .order_by(WebhookLog.id)
+                .limit(page_size)
+                .all()
+            )
+            events = [serialize_log(log) for log in logs]
+        yield from events
+        if len(events) < page_size:
+            return
+        after_id = events[-1]['id']
+
+def flush_webhook_logs(rows, return_ids=False):
+    """Gravar um lote vindo da fila de ingestão"""
+    with app.app_context():
+        return store_webhook_logs(rows, return_ids, with_duplicates=return_ids)
+
+def write_dead_letter(row, error):
+    """Guardar um log da fila que não pôde ser gravado (já foi respondido ao remetente)"""
+    path = app.config['INGEST_DEAD_LETTER'] or instance_file('ingest_dead_letter.jsonl')
+    record = {'error': f'{type(error).__name__}: {error}', 'failed_at': datetime.utcnow().isoformat(), 'row': row}
+    with open(path, 'a') as f:
+        f.write(json.dumps(record, default=str) + '\n')
+    metrics.inc('app_errors_total', type='IngestDeadLetter')
+
+def load_log_headers(log):
+    """Cabeçalhos (JSON) do log, resolvendo o conjunto internado"""
+    stable = None
+    if log.headers_hash:
+        header_set = db.session.get(HeaderSet, log.headers_hash)
+        stable = header_set.headers if header_set else None
+    return log_storage.merge_headers(stable, log.headers)
+
+def decode_stored_body(body, body_blob, body_codec, body_ref=None, limit=None):
+    """Texto do corpo a partir das colunas do log (lendo do disco se transbordado).
+    
+    ``limit`` (bytes) restringe a leitura dos corpos em disco.
+    """
+    if body_codec == log_storage.CODEC_FILE and body_ref:
+        try:
+            return payloads.read(body_ref, limit).decode('utf-8', errors='replace')
+        except OSError as e:
+            print(f"Erro ao ler corpo {body_ref[:12]} do disco: {e}")
+            return None
+    return log_storage.decode_body(body, body_blob, body_codec)
+
+def extractable_body_text(body, body_blob, body_codec, body_ref=None, body_size=None):
+    """Texto para a extração de campos: corpos em disco com a mesma leitura limitada da ingestão"""
+    if body_codec == log_storage.CODEC_FILE and body_ref:
+        return spilled_body_text(body_ref, body_size)
+    return decode_stored_body(body, body_blob, body_codec)
+
+def load_log_body(log, limit=None):
+    """Corpo original do log, descomprimindo se necessário"""
+    return decode_stored_body(log.body, log.body_blob, log.body_codec, log.body_ref, limit)
+
+def stored_body_bytes(body, body_blob, body_codec, body_ref=None):
+    """Bytes do corpo para reenvio (corpos em disco sem decodificar)"""
+    if body_codec == log_storage.CODEC_FILE:
+        return payloads.read(body_ref)
+    text = log_storage.decode_body(body, body_blob, body_codec)
+    return text.encode('utf-8') if text is not None else None
+
+def referenced_payloads(digests):
+    """Hashes ainda referenciados por algum log (para o GC dos arquivos)"""
+    return db.session.execute(
+        db.select(WebhookLog.body_ref).where(WebhookLog.body_ref.in_(digests)).distinct()
+    ).scalars().all()
+
+def gc_payloads():
+    """Excluir corpos em disco cujos logs já foram excluídos"""
+    return payloads.gc(referenced_payloads)
+
+def load_cached_webhook(name):
+    """Carregar dados mínimos do webhook para o cache de resolução"""
+    with app.app_context():
+        webhook = Webhook.query.filter_by(name=name).first()
+        if not webhook:
+            return None
+        return CachedWebhook(
+            webhook.id, webhook.name, webhook.token, webhook.is_active,
+            webhook.rate_limit, webhook.rate_limit_burst, webhook.max_body_bytes
+        )
+
+# REENVIO PARA DESTINOS
+def load_destination_ids(webhook_id):
+    """Ids dos destinos ativos do webhook (None se não houver)"""
+    with app.app_context():
+        ids = db.session.execute(
+            db.select(WebhookDestination.id)
+            .where(WebhookDestination.webhook_id == webhook_id, WebhookDestination.is_active.is_(True))
+        ).scalars().all()
+        return tuple(ids) or None
+
+def build_delivery_job(attempt, destination):
+    """Montar o job de entrega com o método, cabeçalhos e corpo originais"""
+    log = db.session.get(WebhookLog, attempt.log_id)
+    if log is None:
+        return None
+    body = stored_body_bytes(log.body, log.body_blob, log.body_codec, log.body_ref)
+    headers_json = load_log_headers(log)
+    headers = delivery.forward_headers(json.loads(headers_json) if headers_json else {})
+    headers['X-Webhook-Log-Id'] = str(log.id)
+    headers['X-Webhook-Delivery-Id'] = str(attempt.id)
+    return {
+        'attempt_id': attempt.id,
+        'destination_id': destination.id,
+        'attempts': attempt.attempts,
+        'url': destination.url,
+        'method': log.method,
+        'headers': headers,
+        'body': body
+    }
+
+def destination_allowlist():
+    return delivery.parse_allowlist(app.config['DELIVERY_ALLOWED_HOSTS'])
+
+def claim_deliveries(limit, in_flight):
+    """Reivindicar tentativas vencidas respeitando a concorrência por destino.
+    
+    O limite vale para todos os processos: conta as tentativas em andamento
+    (lease válido) gravadas no banco. Dois despachantes reivindicando ao
+    mesmo tempo ainda podem passar do limite por uma rodada.
+    """
+    with app.app_context():
+        now = datetime.utcnow()
+        lease_expired = now - timedelta(seconds=app.config['DELIVERY_LEASE_S'])
+        claimable = db.or_(
+            db.and_(DeliveryAttempt.status == delivery.PENDING, DeliveryAttempt.next_attempt_at <= now),
+            db.and_(DeliveryAttempt.status == delivery.IN_PROGRESS, DeliveryAttempt.updated_at < lease_expired)
+        )
+        candidates = db.session.execute(
+            db.select(DeliveryAttempt.id, DeliveryAttempt.destination_id, WebhookDestination.max_concurrency)
+            .join(WebhookDestination, WebhookDestination.id == DeliveryAttempt.destination_id)
+            .where(claimable)
+            .order_by(DeliveryAttempt.next_attempt_at)
+            .limit(limit * 4)
+        ).all()
+        
+        busy = db.session.execute(
+            db.select(DeliveryAttempt.destination_id, db.func.count(DeliveryAttempt.id))
+            .where(DeliveryAttempt.status == delivery.IN_PROGRESS, DeliveryAttempt.updated_at >= lease_expired)
+            .group_by(DeliveryAttempt.destination_id)
+        ).all()
+        counts = dict(in_flight)
+        for destination_id, count in busy:
+            counts[destination_id] = max(counts.get(destination_id, 0), count)
+        claimed = []
+        table = DeliveryAttempt.__table__
+        for attempt_id, destination_id, max_concurrency in candidates:
+            if counts.get(destination_id, 0) >= (max_concurrency or app.config['DELIVERY_DEST_CONCURRENCY']):
+                continue
+            # UPDATE condicional: só um processo consegue reivindicar a linha
+            result = db.session.execute(
+                table.update()
+                .where(table.c.id == attempt_id, claimable)
+                .values(status=delivery.IN_PROGRESS, updated_at=now)
+            )
+            if result.rowcount == 1:
+                claimed.append(attempt_id)
+                counts[destination_id] = counts.get(destination_id, 0) + 1
+            if len(claimed) >= limit:
+                break
+        db.session.commit()
+        
+        jobs = []
+        for attempt_id in claimed:
+            attempt = db.session.get(DeliveryAttempt, attempt_id)
+            destination = db.session.get(WebhookDestination, attempt.destination_id)
+            job = build_delivery_job(attempt, destination)
+            if job is None:
+                attempt.status = delivery.DEAD
+                attempt.last_error = 'Log excluído antes da entrega'
+                attempt.updated_at = now
+                continue
+            jobs.append(job)
+        db.session.commit()
+        return jobs
+
+def complete_delivery(job, status_code, error):
+    """Gravar o resultado: entregue, reagendar com backoff ou dead letter"""
+    with app.app_context():
+        attempt = db.session.get(DeliveryAttempt, job['attempt_id'])
+        if attempt is None:
+            return
+        now = datetime.utcnow()
+        attempt.attempts = (attempt.attempts or 0) + 1
+        attempt.last_status_code = status_code
+        attempt.last_error = error[:500] if error else None
+        attempt.updated_at = now
+        
+        # 4xx (exceto 408/429) e destino bloqueado não melhoram com novas tentativas
+        permanent = (status_code is not None and 400 <= status_code < 500 and status_code not in (408, 429)) or \
+            bool(error and error.startswith(delivery.UnsafeDestination.__name__))
+        if status_code is not None and 200 <= status_code < 300:
+            attempt.status = delivery.DELIVERED
+        elif permanent or attempt.attempts >= app.config['DELIVERY_MAX_ATTEMPTS']:
+            attempt.status = delivery.DEAD
+        else:
+            attempt.status = delivery.PENDING
+            attempt.next_attempt_at = now + timedelta(
+                seconds=delivery.backoff_delay(attempt.attempts, base=app.config['DELIVERY_BACKOFF_S'])
+            )
+        db.session.commit()
+        metrics.inc('delivery_attempts_total', status=attempt.status)
+
+# LIMITE DE TAXA E DESCARTE DE CARGA
+def rate_limited_response(retry_after, scope):
+    metrics.inc('rate_limited_total', scope=scope)
+    return {'error': 'Limite de requisições excedido'}, 429, {'Retry-After': str(max(1, math.ceil(retry_after)))}
+
+def payload_too_large_response(limit):
+    metrics.inc('ingest_too_large_total')
+    return {'error': f'Corpo da requisição maior que o limite ({limit} bytes)'}, 413
+
+def read_request_body(max_bytes):
+    """Corpo da requisição lido em blocos: texto ou ``SpilledBody`` (gravado em disco)"""
+    return finish_request_body(payload_store.read_body(
+        request.stream,
+        limit=max_bytes,
+        spill_threshold=app.config['INGEST_SPILL_THRESHOLD'],
+        store=payloads
+    ))
+
+def finish_request_body(body):
+    """Texto do corpo lido (ou o ``SpilledBody``, que segue como referência)"""
+    if isinstance(body, SpilledBody):
+        metrics.inc('ingest_spilled_total')
+        return body
+    return body.decode('utf-8', errors='replace')
+
+def should_shed_load():
+    """Aceitar sem gravar o corpo enquanto a fila ou o banco estiverem saturados"""
+    return load_shedder.should_shed(ingest_queue.depth if ingest_queue is not None else 0)
+
+def save_webhook_log(**fields):
+    """Salvar log de webhook (commit direto ou via fila).
+    
+    Retorna (id, é duplicata); o id é None se a fila responde antes do commit.
+    """
+    fields.setdefault('timestamp', datetime.utcnow())
+
+    if ingest_queue is None:
+        return store_webhook_logs([fields], return_ids=True, with_duplicates=True)[0]
+
+    pending = ingest_queue.submit(fields)
+    return pending.wait(app.config['INGEST_COMMIT_TIMEOUT_S']) or (None, False)
+
+def retention_policy(webhook):
+    """(dias, máximo de linhas) efetivos para o webhook; None = sem limite"""
+    days = webhook.retention_days if webhook.retention_days is not None else app.config['LOG_RETENTION_DAYS']
+    max_rows = webhook.retention_max_rows if webhook.retention_max_rows is not None else app.config['LOG_RETENTION_MAX_ROWS']
+    return (days or None), (max_rows or None)
+
+def enforce_retention(webhooks=None, pause=None):
+    """Aplicar as políticas de retenção; retorna {nome do webhook: linhas excluídas}"""
+    if webhooks is None:
+        webhooks = Webhook.query.all()
+    if pause is None:
+        pause = app.config['LOG_RETENTION_PAUSE_MS'] / 1000.0
+    
+    # Ler as políticas antes: cada lote faz commit e expira os objetos
+    policies = [(webhook.id, webhook.name) + retention_policy(webhook) for webhook in webhooks]
+    
+    now = datetime.utcnow()
+    deleted = {}
+    for webhook_id, name, days, max_rows in policies:
+        if days is None and max_rows is None:
+            continue
+        deleted[name] = retention.prune_logs(
+            db.session, WebhookLog, webhook_id,
+            before=now - timedelta(days=days) if days else None,
+            keep_rows=max_rows,
+            batch_size=app.config['LOG_RETENTION_BATCH'],
+            pause=pause
+        )
+    
+    # Entregas concluídas (entregues ou dead letter) antigas
+    if app.config['DELIVERY_RETENTION_DAYS']:
+        delivery_cutoff = now - timedelta(days=app.config['DELIVERY_RETENTION_DAYS'])
+        DeliveryAttempt.query.filter(
+            DeliveryAttempt.status.in_([delivery.DELIVERED, delivery.DEAD]),
+            DeliveryAttempt.updated_at < delivery_cutoff
+        ).delete(synchronize_session=False)
+        db.session.commit()
+    
+    # Rollups de tráfego antigos
+    if app.config['STATS_RETENTION_DAYS']:
+        stats_cutoff = now - timedelta(days=app.config['STATS_RETENTION_DAYS'])
+        WebhookStat.query.filter(WebhookStat.bucket < stats_cutoff).delete()
+        db.session.commit()
+    
+    # Tabela particionada (MySQL): descartar meses inteiros já expirados
+    if db.engine.dialect.name == 'mysql' and policies:
+        import partitions
+        with db.engine.begin() as conn:
+            if partitions.list_partitions(conn, WebhookLog.__tablename__):
+                partitions.ensure_future_partitions(conn, WebhookLog.__tablename__)
+                if all(days for _, _, days, _ in policies):
+                    cutoff = now - timedelta(days=max(days for _, _, days, _ in policies))
+                    partitions.drop_partitions_before(conn, WebhookLog.__tablename__, cutoff)
+    
+    response_versions.bump(*(f'webhook:{webhook_id}' for webhook_id, name, _, _ in policies if deleted.get(name)))
+    
+    # Índice de busca: tirar os logs excluídos acima
+    for webhook_id, _, days, max_rows in policies:
+        if days is not None or max_rows is not None:
+            prune_search_index(webhook_id)
+    
+    # Corpos em disco que ficaram sem log
+    if any(deleted.values()):
+        gc_payloads()
+    return deleted
+
+def run_retention_job():
+    with app.app_context():
+        enforce_retention()
+
+def index_search_batch():
+    """Indexar o próximo lote de logs para a busca textual"""
+    with app.app_context():
+        return search_index.index_pending(
+            db.session, WebhookLog, WebhookLogSearch, decode_stored_body,
+            batch_size=app.config['SEARCH_INDEX_BATCH'],
+            max_chars=app.config['SEARCH_MAX_CHARS']
+        )
+
+def prune_search_index(webhook_id):
+    """Remover da busca os logs do webhook que a retenção já excluiu"""
+    oldest = db.session.execute(
+        db.select(WebhookLog.id)
+        .where(WebhookLog.webhook_id == webhook_id)
+        .order_by(WebhookLog.timestamp, WebhookLog.id)
+        .limit(1)
+    ).scalar()
+    return search_index.prune(db.session, WebhookLogSearch, webhook_id, before_log_id=oldest)
+
+@app.before_request
+def start_background_workers():
+    if app.config['LOG_RETENTION_WORKER']:
+        retention_worker.start()
+    if app.config['DELIVERY_WORKER']:
+        delivery_engine.start()
+    if app.config['SEARCH_INDEX']:
+        search_indexer.start()
+    if app.config['DATABASE_REPLICA_URL']:
+        replica_monitor.start()
+    metrics.start()
+
+def upsert_stat_rows(rows):
+    """Somar contadores nos rollups existentes (upsert por dialeto)"""
+    table = WebhookStat.__table__
+    dialect = db.engine.dialect.name
+    if dialect == 'mysql':
+        from sqlalchemy.dialects.mysql import insert as dialect_insert
+        stmt = dialect_insert(table)
+        stmt = stmt.on_duplicate_key_update(count=table.c.count + stmt.inserted['count'])
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        stmt = dialect_insert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['webhook_id', 'bucket', 'method', 'status'],
+            set_={'count': table.c.count + stmt.excluded['count']}
+        )
+    else:
+        for row in rows:
+            updated = db.session.execute(
+                table.update()
+                .where(
+                    table.c.webhook_id == row['webhook_id'],
+                    table.c.bucket == row['bucket'],
+                    table.c.method == row['method'],
+                    table.c.status == row['status']
+                )
+                .values(count=table.c.count + row['count'])
+            )
+            if updated.rowcount == 0:
+                db.session.execute(table.insert(), [row])
+        return
+    db.session.execute(stmt, rows)
+
+def flush_traffic_stats(counts, last_seen):
+    """Gravar contadores por minuto e atualizar request_count/last_request.
+    
+    Também incrementa, uma vez por flush, a versão das respostas dos
+    webhooks com tráfego (request_count mudou).
+    """
+    with app.app_context():
+        rows = [
+            {'webhook_id': webhook_id, 'bucket': bucket, 'method': method, 'status': status, 'count': n}
+            for (webhook_id, bucket, method, status), n in counts.items()
+        ]
+        totals = Counter()
+        for row in rows:
+            totals[row['webhook_id']] += row['count']
+        
+        if rows:
+            table = Webhook.__table__
+            try:
+                upsert_stat_rows(rows)
+                db.session.connection().execute(
+                    table.update()
+                    .where(table.c.id == db.bindparam('wid'))
+                    .values(
+                        request_count=db.func.coalesce(table.c.request_count, 0) + db.bindparam('n'),
+                        last_request=db.case(
+                            (table.c.last_request.is_(None), db.bindparam('last')),
+                            (table.c.last_request < db.bindparam('last'), db.bindparam('last')),
+                            else_=table.c.last_request
+                        )
+                    ),
+                    [{'wid': webhook_id, 'n': n, 'last': last_seen[webhook_id]} for webhook_id, n in totals.items()]
+                )
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+        response_versions.bump(*(f'webhook:{webhook_id}' for webhook_id in totals))
+
+@app.after_request
+def record_traffic(response):
+    webhook_id = g.get('webhook_id')
+    if webhook_id is not None and request.endpoint == 'receive_webhook':
+        record_ingest_request(webhook_id, request.method, response.status_code)
+    return response
+
+# MÉTRICAS
+# Gauges sem agregação explícita ficam com o maior valor entre os workers
+METRIC_DEFINITIONS = [
+    ('http_request_duration_seconds', HISTOGRAM, 'Latência das requisições por rota'),
+    ('http_request_db_seconds', HISTOGRAM, 'Tempo gasto no banco por requisição'),
+    ('http_request_db_queries', HISTOGRAM, 'Consultas ao banco por requisição', (1, 2, 5, 10, 25, 50, 100)),
+    ('webhook_ingest_total', COUNTER, 'Requisições recebidas por webhook'),
+    ('app_errors_total', COUNTER, 'Erros por tipo'),
+    ('ingest_queue_depth', GAUGE, 'Logs aguardando gravação na fila de ingestão', None, SUM),
+    ('ingest_queue_events_total', COUNTER, 'Eventos da fila de ingestão'),
+    ('webhook_cache_requests_total', COUNTER, 'Consultas ao cache de resolução de webhooks'),
+    ('live_tail_subscribers', GAUGE, 'Painéis conectados ao stream ao vivo', None, SUM),
+    ('rate_limited_total', COUNTER, 'Requisições recusadas com 429 por escopo'),
+    ('ingest_shed_total', COUNTER, 'Requisições aceitas sem gravar o corpo (descarte de carga)'),
+    ('ingest_duplicates_total', COUNTER, 'Entregas duplicadas reconhecidas e não regravadas'),
+    ('ingest_too_large_total', COUNTER, 'Requisições recusadas com 413 (corpo acima do limite)'),
+    ('ingest_spilled_total', COUNTER, 'Corpos grandes gravados em disco em vez do banco'),
+    ('ingest_db_latency_seconds', GAUGE, 'Média móvel da latência de gravação dos logs'),
+    ('delivery_attempts_total', COUNTER, 'Resultados das tentativas de entrega aos destinos'),
+    ('db_read_route_total', COUNTER, 'Requisições somente leitura por banco consultado'),
+    ('db_replica_healthy', GAUGE, 'Réplica de leitura em uso (1) ou fora (0)', None, MIN),
+    ('db_replica_lag_seconds', GAUGE, 'Atraso medido da réplica de leitura'),
+]
+
+def collect_component_metrics():
+    samples = [
+        (COUNTER, 'webhook_cache_requests_total', {'result': 'hit'}, webhook_cache.hits),
+        (COUNTER, 'webhook_cache_requests_total', {'result': 'miss'}, webhook_cache.misses),
+        (GAUGE, 'live_tail_subscribers', {}, live_tail.subscriber_count),
+        (GAUGE, 'ingest_db_latency_seconds', {}, load_shedder.db_latency)
+    ]
+    if app.config['DATABASE_REPLICA_URL']:
+        samples.append((GAUGE, 'db_replica_healthy', {}, int(replica_monitor.healthy)))
+        if replica_monitor.lag is not None:
+            samples.append((GAUGE, 'db_replica_lag_seconds', {}, replica_monitor.lag))
+    if ingest_queue is not None:
+        samples.append((GAUGE, 'ingest_queue_depth', {}, ingest_queue.depth))
+        for name in ('enqueued', 'flushed', 'dropped', 'rejected', 'retried'):
+            samples.append((COUNTER, 'ingest_queue_events_total', {'event': name}, getattr(ingest_queue, name)))
+    return samples
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _db_timer_start(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _db_timer_stop(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info['query_started'].pop()
+    # Também no app context das chamadas do front-end assíncrono
+    if has_app_context():
+        g.db_time = g.get('db_time', 0.0) + time.perf_counter() - started
+        g.db_queries = g.get('db_queries', 0) + 1
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.get('request_started')
+    if started is None:
+        return response
+    endpoint = request.endpoint or 'not_found'
+    metrics.observe('http_request_duration_seconds', time.perf_counter() - started,
+                    endpoint=endpoint, method=request.method, status=response.status_code)
+    metrics.observe('http_request_db_seconds', g.get('db_time', 0.0), endpoint=endpoint)
+    metrics.observe('http_request_db_queries', g.get('db_queries', 0), endpoint=endpoint)
+    return response
+
+@app.teardown_request
+def record_request_error(exc):
+    if exc is not None:
+        metrics.inc('app_errors_total', type=type(exc).__name__)
+
+STATS_RANGES = {
+    '1h': (timedelta(hours=1), 60),
+    '6h': (timedelta(hours=6), 300),
+    '24h': (timedelta(hours=24), 900),
+    '7d': (timedelta(days=7), 3600),
+    '30d': (timedelta(days=30), 6 * 3600)
+}
+
+def query_stats_series(webhook_id, range_key):
+    """Série temporal dos rollups, reagrupada no passo do intervalo"""
+    span, step = STATS_RANGES[range_key]
+    now = datetime.utcnow()
+    start = now - span
+    rows = db.session.execute(
+        db.select(WebhookStat.bucket, WebhookStat.method, WebhookStat.status, WebhookStat.count)
+        .where(WebhookStat.webhook_id == webhook_id, WebhookStat.bucket >= start)
+    ).all()
+    
+    epoch = datetime(1970, 1, 1)
+    series = {}
+    for bucket, method, status, count in rows:
+        seconds = int((bucket - epoch).total_seconds())
+        point_ts = epoch + timedelta(seconds=seconds - seconds % step)
+        point = series.setdefault(point_ts, {'count': 0, 'by_method': Counter(), 'by_status': Counter()})
+        point['count'] += count
+        point['by_method'][method] += count
+        point['by_status'][str(status)] += count
+    
+    return {
+        'range': range_key,
+        'step_seconds': step,
+        'start': start.isoformat(),
+        'end': now.isoformat(),
+        'total': sum(point['count'] for point in series.values()),
+        'series': [
+            {
+                't': ts.isoformat(),
+                'count': point['count'],
+                'by_method': dict(point['by_method']),
+                'by_status': dict(point['by_status'])
+            }
+            for ts, point in sorted(series.items())
+        ]
+    }
+
+LOGS_PAGE_SIZE = 50
+LOGS_PAGE_MAX = 500
+
+def encode_log_cursor(log):
+    """Cursor opaco com a posição (timestamp, id) do último log da página"""
+    raw = f"{log.timestamp.isoformat()}|{log.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_log_cursor(cursor):
+    """Decodificar cursor; levanta ValueError se for inválido"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        timestamp, log_id = raw.split('|')
+        return datetime.fromisoformat(timestamp), int(log_id)
+    except Exception:
+        raise ValueError('Cursor inválido')
+
+def encode_search_cursor(score, log_id):
+    """Cursor opaco com a posição (score, id) do último resultado da busca"""
+    raw = f"{score!r}|{log_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_search_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        score, log_id = raw.split('|')
+        return float(score), int(log_id)
+    except Exception:
+        raise ValueError('Cursor inválido')
+
+def parse_datetime_arg(value):
+    """Converter parâmetro ISO 8601 (ou None) em datetime"""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f'Data inválida: {value}')
+
+def log_filters(webhook_id, method=None, since=None, until=None, fields=None):
+    """Condições de filtro comuns às consultas de logs"""
+    conditions = [WebhookLog.webhook_id == webhook_id]
+    for name, value in (fields or {}).items():
+        conditions.append(getattr(WebhookLog, name) == value)
+    if method:
+        conditions.append(WebhookLog.method == method.upper())
+    if since:
+        conditions.append(WebhookLog.timestamp >= since)
+    if until:
+        conditions.append(WebhookLog.timestamp < until)
+    return conditions
+
+def query_logs_page(webhook_id, before=None, limit=LOGS_PAGE_SIZE, method=None, since=None, until=None, fields=None):
+    """Buscar uma página de logs (mais novos primeiro) sem OFFSET.
+    
+    Retorna (logs, next_cursor); next_cursor é None na última página.
+    """
+    query = WebhookLog.query.filter(*log_filters(webhook_id, method, since, until, fields))
+    if before:
+        ts, log_id = before
+        query = query.filter(db.or_(
+            WebhookLog.timestamp < ts,
+            db.and_(WebhookLog.timestamp == ts, WebhookLog.id < log_id)
+        ))
+    
+    # Buscar um a mais para saber se existe próxima página
+    logs = query.order_by(WebhookLog.timestamp.desc(), WebhookLog.id.desc()).limit(limit + 1).all()
+    next_cursor = None
+    if len(logs) > limit:
+        logs = logs[:limit]
+        next_cursor = encode_log_cursor(logs[-1])
+    return logs, next_cursor
+
+def serialize_log(log):
+    """Representação JSON de um log"""
+    return {
+        'id': log.id,
+        'timestamp': log.timestamp.isoformat(),
+        'method': log.method,
+        'ip_address': log.ip_address,
+        'user_agent': log.user_agent,
+        'body_size': log.body_size,
+        'fields': {name: getattr(log, name) for name in LOG_FIELD_FILTERS if getattr(log, name) is not None}
+    }
+
+def field_filter_args(args):
+    """Filtros por campo extraído presentes na query string"""
+    return {name: args[name] for name in LOG_FIELD_FILTERS if args.get(name)}
+
+def serialize_log_details(log):
+    """Log completo, com cabeçalhos e corpo decodificados.
+    
+    Corpos em disco vêm só com o início (``body_truncated``); o restante
+    é lido em trechos pela URL ``body_url``.
+    """
+    data = serialize_log(log)
+    headers = load_log_headers(log)
+    data['headers'] = json.loads(headers) if headers else None
+    data['body_url'] = url_for('api_webhook_log_body', webhook_id=log.webhook_id, log_id=log.id)
+    if log.body_codec == log_storage.CODEC_FILE:
+        preview = app.config['PAYLOAD_PREVIEW_BYTES']
+        data['body'] = load_log_body(log, limit=preview)
+        data['body_truncated'] = (log.body_size or 0) > preview
+        data['body_loaded'] = min(preview, log.body_size or 0)
+    else:
+        data['body'] = load_log_body(log)
+        data['body_truncated'] = False
+    return data
+
+def range_response(view, size, etag, close=None):
+    """Resposta com suporte a Range (206/416) sobre bytes ou mmap"""
+    def generate(start, stop):
+        try:
+            yield from payload_store.iter_range(view, start, stop)
+        finally:
+            if close is not None:
+                close()
+    
+    headers = {
+        'Accept-Ranges': 'bytes',
+        'X-Content-Type-Options': 'nosniff',
+        'Cache-Control': 'private, max-age=3600'
+    }
+    mimetype = 'text/plain'
+    if request.args.get('download') in ('1', 'true'):
+        mimetype = 'application/octet-stream'
+        headers['Content-Disposition'] = f'attachment; filename="{etag}.bin"'
+    
+    # If-Range com outro validador: o conteúdo mudou, enviar tudo
+    byte_range = request.range
+    if byte_range is not None and request.if_range.etag not in (None, etag):
+        byte_range = None
+    
+    status = 200
+    start, stop = 0, size
+    if byte_range is not None:
+        bounds = byte_range.range_for_length(size)
+        if bounds is None:
+            if close is not None:
+                close()
+            headers['Content-Range'] = f'bytes */{size}'
+            return Response(status=416, headers=headers)
+        start, stop = bounds
+        status = 206
+        headers['Content-Range'] = f'bytes {start}-{stop - 1}/{size}'
+    
+    headers['Content-Length'] = str(stop - start)
+    response = Response(generate(start, stop), status=status, mimetype=mimetype, headers=headers, direct_passthrough=True)
+    response.set_etag(etag)
+    return response
+
+EXPORT_COLUMNS = ['id', 'timestamp', 'method', 'ip_address', 'user_agent', 'headers', 'body']
+EXPORT_BATCH_SIZE = 1000
+
+def iter_export_rows(conditions):
+    """Iterar logs em lotes usando cursor no servidor (memória constante)"""
+    stmt = (
+        db.select(
+            WebhookLog.id,
+            WebhookLog.timestamp,
+            WebhookLog.method,
+            WebhookLog.ip_address,
+            WebhookLog.user_agent,
+            HeaderSet.headers,
+            WebhookLog.headers,
+            WebhookLog.body,
+            WebhookLog.body_blob,
+            WebhookLog.body_codec,
+            WebhookLog.body_ref
+        )
+        .outerjoin(HeaderSet, HeaderSet.hash == WebhookLog.headers_hash)
+        .where(*conditions)
+        .order_by(WebhookLog.timestamp, WebhookLog.id)
+        .execution_options(yield_per=EXPORT_BATCH_SIZE)
+    )
+    result = db.session.execute(stmt)
+    try:
+        for batch in result.partitions():
+            yield [
+                row[:5] + (log_storage.merge_headers(row[5], row[6]), decode_stored_body(*row[7:]))
+                for row in batch
+            ]
+    finally:
+        result.close()
+
+def export_ndjson_chunks(conditions):
+    for batch in iter_export_rows(conditions):
+        lines = []
+        for row in batch:
+            item = dict(zip(EXPORT_COLUMNS, row))
+            item['timestamp'] = item['timestamp'].isoformat() if item['timestamp'] else None
+            lines.append(json.dumps(item, ensure_ascii=False))
+        yield ('\n'.join(lines) + '\n').encode('utf-8')
+
+def export_csv_chunks(conditions):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    for batch in iter_export_rows(conditions):
+        for row in batch:
+            writer.writerow(['' if value is None else value for value in row])
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+def gzip_chunks(chunks):
+    """Comprimir o fluxo em gzip sob demanda"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+# REPLAY DE TRÁFEGO
+REPLAY_BATCH_SIZE = 500
+# Sem progresso há mais que isso, o replay é considerado interrompido (worker reiniciado)
+REPLAY_STALE_S = 120
+
+def iter_replay_jobs(conditions, limit=None, batch_size=REPLAY_BATCH_SIZE):
+    """Logs selecionados como jobs de replay, em ordem cronológica.
+    
+    Lê em lotes por keyset (timestamp, id): nenhuma conexão fica presa a um
+    cursor durante o replay, que pode durar horas em tempo real.
+    """
+    after = None
+    remaining = limit
+    while remaining is None or remaining > 0:
+        stmt = (
+            db.select(
+                WebhookLog.id,
+                WebhookLog.timestamp,
+                WebhookLog.method,
+                HeaderSet.headers,
+                WebhookLog.headers,
+                WebhookLog.body,
+                WebhookLog.body_blob,
+                WebhookLog.body_codec,
+                WebhookLog.body_ref
+            )
+            .outerjoin(HeaderSet, HeaderSet.hash == WebhookLog.headers_hash)
+            .where(*conditions)
+            .order_by(WebhookLog.timestamp, WebhookLog.id)
+            .limit(batch_size if remaining is None else min(batch_size, remaining))
+        )
+        if after is not None:
+            ts, log_id = after
+            stmt = stmt.where(db.or_(
+                WebhookLog.timestamp > ts,
+                db.and_(WebhookLog.timestamp == ts, WebhookLog.id > log_id)
+            ))
+        rows = db.session.execute(stmt).all()
+        # Liberar a conexão enquanto o lote é reenviado
+        db.session.rollback()
+        if not rows:
+            return
+        for log_id, timestamp, method, stable_headers, inline_headers, body, blob, codec, ref in rows:
+            try:
+                data = stored_body_bytes(body, blob, codec, ref)
+            except OSError:
+                data = None
+            headers_json = log_storage.merge_headers(stable_headers, inline_headers)
+            headers = delivery.forward_headers(json.loads(headers_json) if headers_json else {})
+            headers['X-Webhook-Replay-Of'] = str(log_id)
+            yield {'log_id': log_id, 'timestamp': timestamp, 'method': method, 'headers': headers, 'body': data}
+        after = (rows[-1][1], rows[-1][0])
+        if remaining is not None:
+            remaining -= len(rows)
+
+def replay_conditions(webhook_id, params):
+    """Condições de seleção a partir dos parâmetros salvos do replay"""
+    return log_filters(
+        webhook_id,
+        params.get('method'),
+        parse_datetime_arg(params.get('since')),
+        parse_datetime_arg(params.get('until')),
+        {name: value for name, value in (params.get('fields') or {}).items() if name in LOG_FIELD_FILTERS}
+    )
+
+def save_replay_progress(run_id, report, **values):
+    """Gravar o relatório parcial; retorna False se o cancelamento foi pedido"""
+    table = ReplayRun.__table__
+    db.session.execute(
+        table.update().where(table.c.id == run_id)
+        .values(report=json.dumps(report), updated_at=datetime.utcnow(), **values)
+    )
+    db.session.commit()
+    cancel = db.session.execute(db.select(table.c.cancel_requested).where(table.c.id == run_id)).first()
+    db.session.rollback()
+    # Replay excluído junto com o webhook também interrompe
+    return cancel is not None and not cancel[0]
+
+def run_replay(run_id):
+    """Executar um replay registrado (thread em segundo plano)"""
+    with app.app_context():
+        run = db.session.get(ReplayRun, run_id)
+        params = json.loads(run.params)
+        replayer = replay.Replayer(
+            run.target_url,
+            speed=params['speed'],
+            concurrency=params['concurrency'],
+            timeout=app.config['REPLAY_TIMEOUT_S'],
+            allowlist=destination_allowlist()
+        )
+        jobs = iter_replay_jobs(replay_conditions(run.webhook_id, params), params.get('limit'))
+        db.session.rollback()
+        error = None
+        try:
+            report = replayer.run(jobs, lambda report: save_replay_progress(run_id, report))
+        except Exception as e:
+            db.session.rollback()
+            report = replayer.stats.report()
+            error = str(e)[:500]
+            metrics.inc('app_errors_total', type=type(e).__name__)
+            print(f"Erro no replay {run_id}: {e}")
+        save_replay_progress(run_id, report, status=replayer.status, error=error, finished_at=datetime.utcnow())
+        print(f"🔁 Replay {run_id} {replayer.status}: {report['sent']} enviado(s), {report['failed']} falha(s)")
+
+def start_replay(run):
+    thread = threading.Thread(target=run_replay, args=(run.id,), name=f'replay-{run.id}', daemon=True)
+    thread.start()
+
+def running_replays():
+    """Replays em execução (os sem progresso recente são marcados como falhos)"""
+    stale = datetime.utcnow() - timedelta(seconds=REPLAY_STALE_S)
+    ReplayRun.query.filter(ReplayRun.status == replay.RUNNING, ReplayRun.updated_at < stale).update(
+        {'status': replay.FAILED, 'error': 'Interrompido (sem progresso)', 'finished_at': datetime.utcnow()},
+        synchronize_session=False
+    )
+    db.session.commit()
+    return ReplayRun.query.filter_by(status=replay.RUNNING).count()
+
+def serialize_replay(run):
+    return {
+        'id': run.id,
+        'webhook_id': run.webhook_id,
+        'target_url': run.target_url,
+        'params': json.loads(run.params),
+        'status': run.status,
+        'cancel_requested': bool(run.cancel_requested),
+        'report': json.loads(run.report) if run.report else None,
+        'error': run.error,
+        'created_at': run.created_at.isoformat() if run.created_at else None,
+        'finished_at': run.finished_at.isoformat() if run.finished_at else None
+    }
+
 def generate_token(length=32):
     """Gerar token aleatório"""
     alphabet = string.ascii_letters + string.digits
@@ -144,8 +1842,15 @@ def login():
         
         user = User.query.filter_by(username=username).first()
         
-        if user and user.check_password(password) and user.is_active:
+        try:
+            valid = user is not None and password_hasher.check(user.password_hash, password)
+        except HasherBusy:
+            flash('Muitas tentativas de login no momento. Tente novamente em instantes.', 'error')
+            return render_template('login.html'), 503
+        
+        if valid and user.is_active:
             login_user(user, remember=True)
+            user_session.store_identity(session, user_session.from_user(user), user_version(user.id))
             flash(f'Bem-vindo, {user.username}!', 'success')
             
             # Redirecionar para página solicitada ou dashboard
@@ -194,8 +1899,11 @@ def register():
             return render_template('register.html')
         
         # Criar usuário
-        user = User(username=username, email=email)
-        user.set_password(password)
+        try:
+            user = User(username=username, email=email, password_hash=password_hasher.generate(password))
+        except HasherBusy:
+            flash('Servidor ocupado. Tente novamente em instantes.', 'error')
+            return render_template('register.html'), 503
         
         try:
             db.session.add(user)
@@ -211,10 +1919,16 @@ def register():
 # ROTAS PROTEGIDAS
 @app.route('/')
 @login_required
+@replica_reads
 def index():
-    # Mostrar apenas webhooks do usuário logado
-    webhooks = Webhook.query.filter_by(user_id=current_user.id).all()
-    return render_template('index.html', webhooks=webhooks)
+    etag, last_modified = dashboard_validators(None, dashboard_window_key())
+    response = not_modified(etag, last_modified)
+    if response is not None:
+        return response
+    
+    # Webhooks do usuário logado com as estatísticas (uma consulta)
+    webhooks = load_dashboard(current_user.id)
+    return with_validators(make_response(render_template('index.html', webhooks=webhooks)), etag, last_modified)
 
 @app.route('/create', methods=['GET', 'POST'])
 @login_required
@@ -239,6 +1953,7 @@ def create_webhook():
         try:
             db.session.add(webhook)
             db.session.commit()
+            webhook_cache.invalidate(name)
             flash(f'Webhook "{name}" criado com sucesso!', 'success')
             return redirect(url_for('webhook_details', webhook_id=webhook.id))
         except Exception as e:
@@ -250,41 +1965,115 @@ def create_webhook():
 
 @app.route('/webhook/<int:webhook_id>')
 @login_required
+@replica_reads
 def webhook_details(webhook_id):
+    etag = last_modified = None
+    if webhook_id in user_webhook_ids(current_user.id):
+        etag, last_modified = dashboard_validators([webhook_id], 'details')
+        response = not_modified(etag, last_modified)
+        if response is not None:
+            return response
+    
     # Verificar se o webhook pertence ao usuário
     webhook = Webhook.query.filter_by(id=webhook_id, user_id=current_user.id).first_or_404()
-    logs = WebhookLog.query.filter_by(webhook_id=webhook_id).order_by(WebhookLog.timestamp.desc()).limit(50).all()
-    return render_template('webhook_details.html', webhook=webhook, logs=logs)
+    logs, next_cursor = query_logs_page(webhook_id)
+    destinations = WebhookDestination.query.filter_by(webhook_id=webhook_id).order_by(WebhookDestination.id).all()
+    return with_validators(make_response(render_template(
+        'webhook_details.html', webhook=webhook, logs=logs, next_cursor=next_cursor, destinations=destinations
+    )), etag, last_modified)
 
 # ROTA PÚBLICA PARA RECEBER WEBHOOKS (sem login)
-@app.route('/webhook/<webhook_name>', methods=['GET', 'POST', 'PUT', 'DELETE', 'PATCH'])
-def receive_webhook(webhook_name):
-    # Buscar webhook pelo nome (ativo)
-    webhook = Webhook.query.filter_by(name=webhook_name, is_active=True).first()
+# As etapas abaixo não dependem do objeto request do Flask: o front-end
+# assíncrono (asgi_ingest.py) executa as mesmas funções. Respostas são
+# tuplas (corpo, status[, cabeçalhos]); corpo dict vira JSON.
+def admit_webhook(webhook_name, remote_addr):
+    """Limites de taxa e resolução do webhook: (webhook, resposta de erro ou None)"""
+    # Limite por IP de origem, antes de qualquer consulta
+    retry_after = rate_limiter.check(
+        f'ip:{remote_addr}', app.config['RATE_LIMIT_IP_RPS'], app.config['RATE_LIMIT_IP_BURST']
+    )
+    if retry_after is not None:
+        return None, rate_limited_response(retry_after, 'ip')
+    
+    # Buscar webhook pelo nome (ativo), via cache
+    webhook = webhook_cache.get_active(webhook_name)
     
     if not webhook:
-        return jsonify({'error': 'Webhook não encontrado'}), 404
+        return None, ({'error': 'Webhook não encontrado'}, 404)
+    
+    # Limite por webhook (configuração própria ou padrão global)
+    retry_after = rate_limiter.check(
+        f'webhook:{webhook.id}',
+        webhook.rate_limit if webhook.rate_limit is not None else app.config['RATE_LIMIT_WEBHOOK_RPS'],
+        webhook.rate_limit_burst or app.config['RATE_LIMIT_WEBHOOK_BURST']
+    )
+    if retry_after is not None:
+        return webhook, rate_limited_response(retry_after, 'webhook')
+    return webhook, None
+
+def check_webhook_upload(webhook, headers, content_length):
+    """Token e tamanho declarado, antes de ler o corpo: (limite em bytes, resposta de erro ou None)"""
+    # Verificar token Bearer se fornecido
+    auth_header = headers.get('Authorization', '')
+    if auth_header.startswith('Bearer '):
+        provided_token = auth_header[7:]
+        if provided_token != webhook.token:
+            return None, ({'error': 'Token inválido'}, 401)
     
+    # Limite de tamanho: recusar pelo Content-Length, sem ler nada
+    max_body = webhook.max_body_bytes if webhook.max_body_bytes is not None else app.config['INGEST_MAX_BODY_BYTES']
+    if max_body and content_length is not None and content_length > max_body:
+        return None, payload_too_large_response(max_body)
+    return max_body, None
+
+def skip_body_under_load():
+    """Descarte de carga: True se o corpo não deve ser lido nem gravado"""
+    if should_shed_load():
+        load_shedder.shed += 1
+        metrics.inc('ingest_shed_total')
+        return True
+    return False
+
+def ingest_response(webhook_name, method, log_id, duplicate=False):
+    """Resposta da ingestão; duplicatas (vistas no cache ou no banco) têm o id do original"""
+    response_data = {
+        'status': 'duplicate' if duplicate else 'success',
+        'webhook': webhook_name,
+        'timestamp': datetime.utcnow().isoformat(),
+        'method': method,
+        'log_id': log_id,
+        'duplicate': duplicate
+    }
+    if log_id is None:
+        response_data['queued'] = True
+    return response_data
+
+def record_webhook_request(webhook, webhook_name, method, headers, args, remote_addr, body=None):
+    """Gravar a requisição já admitida e montar a resposta.
+    
+    GET: registra a tentativa e responde o desafio hub.challenge da Meta.
+    Demais métodos: ``body`` é o texto, um ``SpilledBody`` ou None (descarte).
+    """
     # VERIFICAÇÃO DE WEBHOOK (GET) - Para WhatsApp/Meta
-    if request.method == 'GET':
+    if method == 'GET':
         # Verificação do webhook do WhatsApp/Meta
-        hub_mode = request.args.get('hub.mode')
-        hub_challenge = request.args.get('hub.challenge')
-        hub_verify_token = request.args.get('hub.verify_token')
+        hub_mode = args.get('hub.mode')
+        hub_challenge = args.get('hub.challenge')
+        hub_verify_token = args.get('hub.verify_token')
         
         # Log da tentativa de verificação
         try:
-            log = WebhookLog(
+            save_webhook_log(
                 webhook_id=webhook.id,
-                method=request.method,
-                headers=json.dumps(dict(request.headers)),
+                method=method,
+                headers=json.dumps(dict(headers), sort_keys=True),
                 body=f"hub.mode={hub_mode}, hub.challenge={hub_challenge}, hub.verify_token={hub_verify_token}",
-                ip_address=request.remote_addr,
-                user_agent=request.headers.get('User-Agent', '')
+                ip_address=remote_addr,
+                user_agent=headers.get('User-Agent', '')
             )
-            db.session.add(log)
-            db.session.commit()
         except Exception as e:
+            db.session.rollback()
+            metrics.inc('app_errors_total', type=type(e).__name__)
             print(f"Erro ao salvar log de verificação: {e}")
         
         # Verificar se é uma tentativa de verificação válida
@@ -295,53 +2084,107 @@ def receive_webhook(webhook_name):
             return hub_challenge, 200
         
         # Se não é verificação, retorna resposta padrão para GET
-        return jsonify({
+        return {
             'status': 'webhook_active',
             'webhook': webhook_name,
             'timestamp': datetime.utcnow().isoformat()
-        }), 200
+        }, 200
     
     # PROCESSAMENTO DE WEBHOOKS (POST, PUT, etc.)
+    dedup_key = None
     try:
-        # Capturar dados da requisição
-        body_data = request.get_data(as_text=True)
-        headers_data = dict(request.headers)
+        spilled = body if isinstance(body, SpilledBody) else None
+        body_data = None if spilled else body
+        headers_data = dict(headers)
         
-        # Verificar token Bearer se fornecido
-        auth_header = request.headers.get('Authorization', '')
-        if auth_header.startswith('Bearer '):
-            provided_token = auth_header[7:]
-            if provided_token != webhook.token:
-                return jsonify({'error': 'Token inválido'}), 401
+        # Repetição recente do provedor: confirmar com o log original
+        dedup_key = dedup.dedup_key(
+            app.config['INGEST_DEDUP'], headers, body_data, app.config['INGEST_DEDUP_HEADERS'],
+            body_digest=spilled.digest if spilled else None
+        )
+        if dedup_key:
+            duplicate, original_id = recent_dedup_keys.claim(webhook.id, dedup_key)
+            if duplicate:
+                metrics.inc('ingest_duplicates_total')
+                dedup_key = None
+                return ingest_response(webhook_name, method, original_id, duplicate=True), 200
         
         # Criar log
-        log = WebhookLog(
+        log_id, duplicate = save_webhook_log(
             webhook_id=webhook.id,
-            method=request.method,
-            headers=json.dumps(headers_data),
+            method=method,
+            headers=json.dumps(headers_data, sort_keys=True),
             body=body_data,
-            ip_address=request.remote_addr,
-            user_agent=request.headers.get('User-Agent', '')
+            body_ref=spilled.digest if spilled else None,
+            body_size=spilled.size if spilled else None,
+            ip_address=remote_addr,
+            user_agent=headers.get('User-Agent', ''),
+            dedup_key=dedup_key
         )
         
-        db.session.add(log)
-        db.session.commit()
-        
-        # Resposta de sucesso
-        response_data = {
-            'status': 'success',
-            'webhook': webhook_name,
-            'timestamp': datetime.utcnow().isoformat(),
-            'method': request.method,
-            'log_id': log.id
-        }
+        return ingest_response(webhook_name, method, log_id, duplicate), 200
         
-        return jsonify(response_data), 200
+    except (QueueFull, IngestTimeout) as e:
+        if dedup_key:
+            recent_dedup_keys.discard(webhook.id, dedup_key)
+        # Backpressure: pedir ao remetente que tente de novo
+        metrics.inc('app_errors_total', type=type(e).__name__)
+        print(f"Fila de ingestão saturada para {webhook_name}: {e}")
+        return overloaded_response()
         
     except Exception as e:
         db.session.rollback()
+        if dedup_key:
+            recent_dedup_keys.discard(webhook.id, dedup_key)
+        metrics.inc('app_errors_total', type=type(e).__name__)
         print(f"Erro ao processar webhook {webhook_name}: {e}")
-        return jsonify({'error': f'Erro interno: {str(e)}'}), 500
+        return {'error': f'Erro interno: {str(e)}'}, 500
+
+def overloaded_response():
+    return {'error': 'Serviço sobrecarregado, tente novamente'}, 503, {'Retry-After': '1'}
+
+def record_ingest_request(webhook_id, method, status, duration=None, db_time=0.0, db_queries=0):
+    """Rollups de tráfego e métricas de uma requisição ao endpoint público"""
+    if duration is not None:
+        metrics.observe('http_request_duration_seconds', duration,
+                        endpoint='receive_webhook', method=method, status=status)
+        metrics.observe('http_request_db_seconds', db_time, endpoint='receive_webhook')
+        metrics.observe('http_request_db_queries', db_queries, endpoint='receive_webhook')
+    if webhook_id is not None:
+        traffic_stats.record(webhook_id, method, status, datetime.utcnow())
+        # Pelo id: o nome é a única credencial para postar em /webhook/<nome>
+        metrics.inc('webhook_ingest_total', webhook_id=webhook_id, status=status)
+
+@app.route('/webhook/<webhook_name>', methods=['GET', 'POST', 'PUT', 'DELETE', 'PATCH'])
+def receive_webhook(webhook_name):
+    webhook, error = admit_webhook(webhook_name, request.remote_addr)
+    if webhook is not None:
+        g.webhook_id = webhook.id
+    if error is not None:
+        return error
+    
+    if request.method == 'GET':
+        return record_webhook_request(webhook, webhook_name, request.method, request.headers, request.args, request.remote_addr)
+    
+    max_body, error = check_webhook_upload(webhook, request.headers, request.content_length)
+    if error is not None:
+        return error
+    
+    # Capturar o corpo (sem ele sob descarte de carga); corpos grandes vão
+    # direto para o disco durante a leitura
+    try:
+        body = None if skip_body_under_load() else read_request_body(max_body)
+    except PayloadTooLarge as e:
+        # Sem Content-Length (chunked) ou valor falso: limite atingido na leitura
+        return payload_too_large_response(e.limit)
+    except Exception as e:
+        metrics.inc('app_errors_total', type=type(e).__name__)
+        print(f"Erro ao ler corpo do webhook {webhook_name}: {e}")
+        return {'error': f'Erro interno: {str(e)}'}, 500
+    
+    return record_webhook_request(
+        webhook, webhook_name, request.method, request.headers, request.args, request.remote_addr, body
+    )
 
 @app.route('/webhook/<int:webhook_id>/toggle', methods=['POST'])
 @login_required
@@ -351,6 +2194,7 @@ def toggle_webhook(webhook_id):
     
     try:
         db.session.commit()
+        webhook_cache.invalidate(webhook.name)
         status = 'ativado' if webhook.is_active else 'desativado'
         flash(f'Webhook "{webhook.name}" {status} com sucesso!', 'success')
     except Exception as e:
@@ -366,8 +2210,22 @@ def delete_webhook(webhook_id):
     webhook_name = webhook.name
     
     try:
+        # Desativar primeiro para parar a ingestão, depois excluir os logs
+        # em lotes (sem uma transação gigante travando a tabela)
+        webhook.is_active = False
+        db.session.commit()
+        webhook_cache.invalidate(webhook_name)
+        DeliveryAttempt.query.filter_by(webhook_id=webhook.id).delete()
+        WebhookDestination.query.filter_by(webhook_id=webhook.id).delete()
+        ReplayRun.query.filter_by(webhook_id=webhook.id).delete()
+        destinations_cache.invalidate(webhook.id)
+        retention.purge_logs(db.session, WebhookLog, webhook.id, batch_size=app.config['LOG_RETENTION_BATCH'])
+        search_index.prune(db.session, WebhookLogSearch, webhook.id)
+        WebhookStat.query.filter_by(webhook_id=webhook.id).delete()
+        
         db.session.delete(webhook)
         db.session.commit()
+        gc_payloads()
         flash(f'Webhook "{webhook_name}" excluído com sucesso!', 'success')
         return redirect(url_for('index'))
     except Exception as e:
@@ -375,16 +2233,448 @@ def delete_webhook(webhook_id):
         flash(f'Erro ao excluir webhook: {str(e)}', 'error')
         return redirect(url_for('webhook_details', webhook_id=webhook_id))
 
+@app.route('/webhook/<int:webhook_id>/stream')
+@login_required
+def stream_webhook_logs(webhook_id):
+    """Stream SSE dos logs novos; retoma a partir de Last-Event-ID"""
+    webhook = Webhook.query.filter_by(id=webhook_id, user_id=current_user.id).first_or_404()
+    
+    last_id = request.headers.get('Last-Event-ID') or request.args.get('last_id')
+    try:
+        last_id = int(last_id) if last_id else None
+    except ValueError:
+        last_id = None
+    
+    # Maior id global: lido pela chave primária, sem varrer os logs do webhook
+    head_id = db.session.query(db.func.max(WebhookLog.id)).scalar() or 0
+    backlog = []
+    if last_id is not None and last_id < head_id:
+        backlog = catch_up_log_events(webhook.id, last_id, head_id)
+    
+    try:
+        events = live_tail.stream(webhook.id, head_id, last_id=last_id, backlog=backlog)
+    except TooManySubscribers as e:
+        return jsonify({'error': str(e)}), 503, {'Retry-After': '10'}
+    
+    return Response(events, mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+@app.route('/webhook/<int:webhook_id>/destinations', methods=['POST'])
+@login_required
+def add_destination(webhook_id):
+    webhook = Webhook.query.filter_by(id=webhook_id, user_id=current_user.id).first_or_404()
+    url = request.form.get('url', '').strip()
+    
+    try:
+        delivery.check_destination(url, destination_allowlist())
+    except delivery.UnsafeDestination as e:
+        flash(str(e), 'error')
+        return redirect(url_for('webhook_details', webhook_id=webhook_id))
+    
+    max_concurrency = request.form.get('max_concurrency', '').strip()
+    destination = WebhookDestination(
+        webhook_id=webhook.id,
+        url=url,
+        max_concurrency=int(max_concurrency) if max_concurrency.isdigit() and int(max_concurrency) > 0 else None
+    )
+    try:
+        db.session.add(destination)
+        db.session.commit()
+        destinations_cache.invalidate(webhook.id)
+        flash('Destino adicionado!', 'success')
+    except Exception as e:
+        db.session.rollback()
+        flash(f'Erro ao adicionar destino: {str(e)}', 'error')
+    
+    return redirect(url_for('webhook_details', webhook_id=webhook_id))
+
+@app.route('/webhook/<int:webhook_id>/destinations/<int:destination_id>/delete', methods=['POST'])
+@login_required
+def delete_destination(webhook_id, destination_id):
+    webhook = Webhook.query.filter_by(id=webhook_id, user_id=current_user.id).first_or_404()
+    destination = WebhookDestination.query.filter_by(id=destination_id, webhook_id=webhook.id).first_or_404()
+    
+    try:
+        DeliveryAttempt.query.filter_by(destination_id=destination.id).delete()
+        db.session.delete(destination)
+        db.session.commit()
+        destinations_cache.invalidate(webhook.id)
+        flash('Destino removido!', 'success')
+    except Exception as e:
+        db.session.rollback()
+        flash(f'Erro ao remover destino: {str(e)}', 'error')
+    
+    return redirect(url_for('webhook_details', webhook_id=webhook_id))
+
+@app.route('/webhook/<int:webhook_id>/rate-limit', methods=['POST'])
+@login_required
+def update_rate_limit(webhook_id):
+    webhook = Webhook.query.filter_by(id=webhook_id, user_id=current_user.id).first_or_404()
+    
+    try:
+        rate = request.form.get('rate_limit', '').strip().replace(',', '.')
+        burst = request.form.get('rate_limit_burst', '').strip()
+        max_body_kb = request.form.get('max_body_kb', '').strip()
+        webhook.rate_limit = float(rate) if rate else None
+        webhook.rate_limit_burst = int(burst) if burst else None
+        webhook.max_body_bytes = int(max_body_kb) * 1024 if max_body_kb else None
+        if (webhook.rate_limit or 0) < 0 or (webhook.rate_limit_burst or 0) < 0 or (webhook.max_body_bytes or 0) < 0:
+            raise ValueError('valores negativos')
+    except ValueError:
+        db.session.rollback()
+        flash('Valores de limite de taxa inválidos!', 'error')
+        return redirect(url_for('webhook_details', webhook_id=webhook_id))
+    
+    try:
+        db.session.commit()
+        webhook_cache.invalidate(webhook.name)
+        flash('Limite de taxa atualizado!', 'success')
+    except Exception as e:
+        db.session.rollback()
+        flash(f'Erro ao salvar limite de taxa: {str(e)}', 'error')
+    
+    return redirect(url_for('webhook_details', webhook_id=webhook_id))
+
+@app.route('/webhook/<int:webhook_id>/retention', methods=['POST'])
+@login_required
+def update_retention(webhook_id):
+    webhook = Webhook.query.filter_by(id=webhook_id, user_id=current_user.id).first_or_404()
+    
+    try:
+        days = request.form.get('retention_days', '').strip()
+        max_rows = request.form.get('retention_max_rows', '').strip()
+        webhook.retention_days = int(days) if days else None
+        webhook.retention_max_rows = int(max_rows) if max_rows else None
+        if (webhook.retention_days or 0) < 0 or (webhook.retention_max_rows or 0) < 0:
+            raise ValueError('valores negativos')
+    except ValueError:
+        db.session.rollback()
+        flash('Valores de retenção inválidos!', 'error')
+        return redirect(url_for('webhook_details', webhook_id=webhook_id))
+    
+    try:
+        db.session.commit()
+        flash('Política de retenção atualizada!', 'success')
+    except Exception as e:
+        db.session.rollback()
+        flash(f'Erro ao salvar retenção: {str(e)}', 'error')
+    
+    return redirect(url_for('webhook_details', webhook_id=webhook_id))
+
 @app.route('/api/webhooks')
 @login_required
+@replica_reads
 def api_webhooks():
-    webhooks = Webhook.query.filter_by(user_id=current_user.id, is_active=True).all()
+    etag, last_modified = dashboard_validators(None, 'api')
+    response = not_modified(etag, last_modified)
+    if response is not None:
+        return response
+    
+    # JSON já montado para esta versão (evita a consulta e os url_for)
+    def build():
+        webhooks = Webhook.query.filter_by(user_id=current_user.id, is_active=True).all()
+        return [{
+            'id': w.id,
+            'name': w.name,
+            'created_at': w.created_at.isoformat(),
+            'url': url_for('receive_webhook', webhook_name=w.name, _external=True),
+            'request_count': w.request_count or 0,
+            'last_request': w.last_request.isoformat() if w.last_request else None
+        } for w in webhooks]
+    return cached_json(('webhooks', current_user.id, request.host_url), etag, last_modified, build)
+
+@app.route('/api/dashboard/summary')
+@login_required
+@replica_reads
+def api_dashboard_summary():
+    """Todos os webhooks do usuário com totais, última requisição e volume em 24h"""
+    etag, last_modified = dashboard_validators(None, 'summary', dashboard_window_key())
+    response = not_modified(etag, last_modified)
+    if response is not None:
+        return response
+    return cached_json(
+        ('summary', current_user.id, request.host_url), etag, last_modified,
+        lambda: serialize_dashboard(load_dashboard(current_user.id))
+    )
+
+@app.route('/api/webhooks/<int:webhook_id>/deliveries')
+@login_required
+@replica_reads
+def api_webhook_deliveries(webhook_id):
+    """Tentativas de entrega mais recentes: ?status=pending|in_progress|delivered|dead"""
+    webhook = Webhook.query.filter_by(id=webhook_id, user_id=current_user.id).first_or_404()
+    
+    query = DeliveryAttempt.query.filter_by(webhook_id=webhook.id)
+    if request.args.get('status'):
+        query = query.filter_by(status=request.args['status'])
+    attempts = query.order_by(DeliveryAttempt.id.desc()).limit(LOGS_PAGE_SIZE).all()
     return jsonify([{
-        'id': w.id,
-        'name': w.name,
-        'created_at': w.created_at.isoformat(),
-        'url': url_for('receive_webhook', webhook_name=w.name, _external=True)
-    } for w in webhooks])
+        'id': a.id,
+        'log_id': a.log_id,
+        'destination_id': a.destination_id,
+        'status': a.status,
+        'attempts': a.attempts,
+        'next_attempt_at': a.next_attempt_at.isoformat() if a.next_attempt_at else None,
+        'last_status_code': a.last_status_code,
+        'last_error': a.last_error,
+        'updated_at': a.updated_at.isoformat() if a.updated_at else None
+    } for a in attempts])
+
+@app.route('/api/webhooks/<int:webhook_id>/deliveries/<int:attempt_id>/retry', methods=['POST'])
+@login_required
+def retry_delivery(webhook_id, attempt_id):
+    """Reenfileirar uma entrega (por exemplo, do dead letter)"""
+    webhook = Webhook.query.filter_by(id=webhook_id, user_id=current_user.id).first_or_404()
+    attempt = DeliveryAttempt.query.filter_by(id=attempt_id, webhook_id=webhook.id).first_or_404()
+    attempt.status = delivery.PENDING
+    attempt.attempts = 0
+    attempt.next_attempt_at = datetime.utcnow()
+    db.session.commit()
+    delivery_engine.notify()
+    return jsonify({'status': attempt.status, 'id': attempt.id})
+
+def parse_replay_params(data):
+    """Validar o pedido de replay; levanta ValueError com a mensagem"""
+    target = str(data.get('target') or '').strip()
+    # Mesma regra dos destinos: nada de loopback/rede interna fora de DELIVERY_ALLOWED_HOSTS
+    delivery.check_destination(target, destination_allowlist())
+    
+    speed = data.get('speed', 1)
+    speed = 0.0 if speed in ('max', None) else float(speed)
+    concurrency = int(data.get('concurrency', 4))
+    limit = data.get('limit')
+    limit = int(limit) if limit not in (None, '') else None
+    if speed < 0 or not 1 <= concurrency <= app.config['REPLAY_MAX_CONCURRENCY'] or (limit is not None and limit < 1):
+        raise ValueError(f"Parâmetros inválidos (speed >= 0, concurrency entre 1 e {app.config['REPLAY_MAX_CONCURRENCY']}, limit >= 1)")
+    
+    fields = data.get('fields') or {}
+    if not isinstance(fields, dict) or set(fields) - set(LOG_FIELD_FILTERS):
+        raise ValueError(f"Filtros de campo aceitos: {', '.join(LOG_FIELD_FILTERS)}")
+    parse_datetime_arg(data.get('since'))
+    parse_datetime_arg(data.get('until'))
+    return target, {
+        'since': data.get('since'),
+        'until': data.get('until'),
+        'method': data.get('method'),
+        'fields': fields,
+        'speed': speed,
+        'concurrency': concurrency,
+        'limit': limit
+    }
+
+@app.route('/api/webhooks/<int:webhook_id>/replays', methods=['GET', 'POST'])
+@login_required
+def api_replays(webhook_id):
+    """Listar replays ou iniciar um: JSON {target, since, until, method, fields, speed, concurrency, limit}"""
+    webhook = Webhook.query.filter_by(id=webhook_id, user_id=current_user.id).first_or_404()
+    
+    if request.method == 'GET':
+        runs = ReplayRun.query.filter_by(webhook_id=webhook.id).order_by(ReplayRun.id.desc()).limit(20).all()
+        return jsonify({'replays': [serialize_replay(run) for run in runs]})
+    
+    try:
+        target, params = parse_replay_params(request.get_json(silent=True) or {})
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+    
+    if running_replays() >= app.config['REPLAY_MAX_RUNNING']:
+        return jsonify({'error': 'Muitos replays em execução, tente mais tarde'}), 429
+    
+    run = ReplayRun(
+        webhook_id=webhook.id,
+        user_id=current_user.id,
+        target_url=target,
+        params=json.dumps(params),
+        status=replay.RUNNING
+    )
+    db.session.add(run)
+    db.session.commit()
+    start_replay(run)
+    return jsonify(serialize_replay(run)), 202
+
+@app.route('/api/webhooks/<int:webhook_id>/replays/<int:replay_id>')
+@login_required
+def api_replay(webhook_id, replay_id):
+    """Progresso e relatório (vazão, erros, latências) de um replay"""
+    webhook = Webhook.query.filter_by(id=webhook_id, user_id=current_user.id).first_or_404()
+    run = ReplayRun.query.filter_by(id=replay_id, webhook_id=webhook.id).first_or_404()
+    return jsonify(serialize_replay(run))
+
+@app.route('/api/webhooks/<int:webhook_id>/replays/<int:replay_id>/cancel', methods=['POST'])
+@login_required
+def cancel_replay(webhook_id, replay_id):
+    """Pedir a interrupção do replay (atendida no próximo registro de progresso)"""
+    webhook = Webhook.query.filter_by(id=webhook_id, user_id=current_user.id).first_or_404()
+    run = ReplayRun.query.filter_by(id=replay_id, webhook_id=webhook.id).first_or_404()
+    if run.status == replay.RUNNING:
+        run.cancel_requested = True
+        db.session.commit()
+    return jsonify(serialize_replay(run))
+
+@app.route('/api/webhooks/<int:webhook_id>/stats')
+@login_required
+@replica_reads
+def api_webhook_stats(webhook_id):
+    """Série temporal de tráfego a partir dos rollups: ?range=1h|6h|24h|7d|30d"""
+    webhook = Webhook.query.filter_by(id=webhook_id, user_id=current_user.id).first_or_404()
+    
+    range_key = request.args.get('range', '24h')
+    if range_key not in STATS_RANGES:
+        return jsonify({'error': f'Intervalo inválido (use {", ".join(STATS_RANGES)})'}), 400
+    
+    data = query_stats_series(webhook.id, range_key)
+    data['request_count'] = webhook.request_count or 0
+    data['last_request'] = webhook.last_request.isoformat() if webhook.last_request else None
+    return jsonify(data)
+
+@app.route('/api/webhooks/<int:webhook_id>/logs')
+@login_required
+@replica_reads
+def api_webhook_logs(webhook_id):
+    """Logs paginados por keyset: ?before=<cursor>&limit=N&method=POST&since=...&until=...
+    
+    Também filtra pelos campos extraídos: ?event_type=text&sender=5511...&error_code=131047
+    """
+    webhook = Webhook.query.filter_by(id=webhook_id, user_id=current_user.id).first_or_404()
+    
+    try:
+        limit = min(max(int(request.args.get('limit', LOGS_PAGE_SIZE)), 1), LOGS_PAGE_MAX)
+        before = request.args.get('before')
+        before = decode_log_cursor(before) if before else None
+        since = parse_datetime_arg(request.args.get('since'))
+        until = parse_datetime_arg(request.args.get('until'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    logs, next_cursor = query_logs_page(
+        webhook.id,
+        before=before,
+        limit=limit,
+        method=request.args.get('method'),
+        since=since,
+        until=until,
+        fields=field_filter_args(request.args)
+    )
+    return jsonify({
+        'logs': [serialize_log(log) for log in logs],
+        'next_cursor': next_cursor
+    })
+
+@app.route('/api/webhooks/<int:webhook_id>/logs/search')
+@login_required
+@replica_reads
+def api_search_logs(webhook_id):
+    """Busca textual nos payloads: ?q=<termos>&after=<cursor>&limit=N (por relevância)"""
+    webhook = Webhook.query.filter_by(id=webhook_id, user_id=current_user.id).first_or_404()
+    
+    if not app.config['SEARCH_INDEX']:
+        return jsonify({'error': 'Busca textual desativada (SEARCH_INDEX=0)'}), 501
+    
+    q = request.args.get('q', '').strip()
+    if not search_index.query_terms(q):
+        return jsonify({'error': 'Informe os termos da busca em q'}), 400
+    try:
+        limit = min(max(int(request.args.get('limit', LOGS_PAGE_SIZE)), 1), LOGS_PAGE_MAX)
+        after = request.args.get('after')
+        after = decode_search_cursor(after) if after else None
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    # Um a mais para saber se há próxima página
+    hits = search_index.search(db.session, webhook.id, q, limit=limit + 1, after=after)
+    has_more = len(hits) > limit
+    hits = hits[:limit]
+    
+    logs = {
+        log.id: log
+        for log in WebhookLog.query.filter(WebhookLog.id.in_([log_id for log_id, _, _ in hits])).all()
+    } if hits else {}
+    results = []
+    for log_id, score, snippet in hits:
+        log = logs.get(log_id)
+        # Entrada de um log já excluído: ignorar
+        if log is None:
+            continue
+        data = serialize_log(log)
+        data['score'] = round(score, 4)
+        data['highlight'] = snippet
+        results.append(data)
+    
+    return jsonify({
+        'query': q,
+        'results': results,
+        'next_cursor': encode_search_cursor(hits[-1][1], hits[-1][0]) if has_more else None
+    })
+
+@app.route('/api/webhooks/<int:webhook_id>/logs/<int:log_id>')
+@login_required
+@replica_reads
+def api_webhook_log(webhook_id, log_id):
+    """Log individual com cabeçalhos e corpo (descomprimido sob demanda)"""
+    webhook = Webhook.query.filter_by(id=webhook_id, user_id=current_user.id).first_or_404()
+    log = WebhookLog.query.filter_by(id=log_id, webhook_id=webhook.id).first_or_404()
+    return jsonify(serialize_log_details(log))
+
+@app.route('/api/webhooks/<int:webhook_id>/logs/<int:log_id>/body')
+@login_required
+@replica_reads
+def api_webhook_log_body(webhook_id, log_id):
+    """Corpo bruto do log, com Range; corpos em disco são servidos via mmap"""
+    webhook = Webhook.query.filter_by(id=webhook_id, user_id=current_user.id).first_or_404()
+    log = WebhookLog.query.filter_by(id=log_id, webhook_id=webhook.id).first_or_404()
+    
+    if log.body_codec == log_storage.CODEC_FILE:
+        etag = log.body_ref
+        if request.if_none_match.contains(etag):
+            return Response(status=304, headers={'ETag': f'"{etag}"'})
+        try:
+            view, size = payloads.open(log.body_ref)
+        except (OSError, ValueError):
+            return jsonify({'error': 'Corpo não encontrado no armazenamento'}), 404
+        return range_response(view, size, etag, close=getattr(view, 'close', None))
+    
+    data = (load_log_body(log) or '').encode('utf-8')
+    etag = hashlib.sha256(data).hexdigest()
+    if request.if_none_match.contains(etag):
+        return Response(status=304, headers={'ETag': f'"{etag}"'})
+    return range_response(data, len(data), etag)
+
+@app.route('/api/webhooks/<int:webhook_id>/logs/export')
+@login_required
+@replica_reads
+def export_webhook_logs(webhook_id):
+    """Exportar histórico em streaming: ?format=ndjson|csv&gzip=1 (+ filtros da API de logs)"""
+    webhook = Webhook.query.filter_by(id=webhook_id, user_id=current_user.id).first_or_404()
+    
+    export_format = request.args.get('format', 'ndjson')
+    if export_format not in ('ndjson', 'csv'):
+        return jsonify({'error': 'Formato inválido (use ndjson ou csv)'}), 400
+    
+    try:
+        since = parse_datetime_arg(request.args.get('since'))
+        until = parse_datetime_arg(request.args.get('until'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    conditions = log_filters(webhook.id, request.args.get('method'), since, until, field_filter_args(request.args))
+    if export_format == 'csv':
+        chunks = export_csv_chunks(conditions)
+        mimetype = 'text/csv'
+    else:
+        chunks = export_ndjson_chunks(conditions)
+        mimetype = 'application/x-ndjson'
+    
+    filename = f"webhook_{webhook.id}_logs_{datetime.utcnow().strftime('%Y%m%d%H%M%S')}.{export_format}"
+    headers = {'X-Accel-Buffering': 'no'}
+    if request.args.get('gzip') in ('1', 'true'):
+        chunks = gzip_chunks(chunks)
+        mimetype = 'application/gzip'
+        filename += '.gz'
+    headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    
+    return Response(stream_with_context(chunks), mimetype=mimetype, headers=headers)
 
 @app.route('/profile')
 @login_required
@@ -399,44 +2689,282 @@ def change_password():
         new_password = request.form.get('new_password')
         confirm_password = request.form.get('confirm_password')
         
-        if not current_user.check_password(current_password):
-            flash('Senha atual incorreta!', 'error')
-            return render_template('change_password.html')
-        
-        if new_password != confirm_password:
-            flash('As senhas não coincidem!', 'error')
-            return render_template('change_password.html')
-        
-        if len(new_password) < 6:
-            flash('A nova senha deve ter pelo menos 6 caracteres!', 'error')
-            return render_template('change_password.html')
-        
-        current_user.set_password(new_password)
+        # current_user vem do cache; a troca de senha usa o registro do banco
+        user = db.session.get(User, current_user.id)
+        try:
+            if not password_hasher.check(user.password_hash, current_password or ''):
+                flash('Senha atual incorreta!', 'error')
+                return render_template('change_password.html')
+            
+            if new_password != confirm_password:
+                flash('As senhas não coincidem!', 'error')
+                return render_template('change_password.html')
+            
+            if len(new_password) < 6:
+                flash('A nova senha deve ter pelo menos 6 caracteres!', 'error')
+                return render_template('change_password.html')
+            
+            user.password_hash = password_hasher.generate(new_password)
+        except HasherBusy:
+            flash('Servidor ocupado. Tente novamente em instantes.', 'error')
+            return render_template('change_password.html'), 503
         db.session.commit()
+        # Outras sessões deste usuário revalidam no próximo acesso
+        user_session.store_identity(session, user_session.from_user(user), user_version(user.id))
         flash('Senha alterada com sucesso!', 'success')
         return redirect(url_for('profile'))
     
     return render_template('change_password.html')
 
+@app.route('/metrics')
+def prometheus_metrics():
+    """Métricas de todos os workers no formato texto do Prometheus"""
+    token = app.config['METRICS_TOKEN']
+    if token:
+        if not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+            return jsonify({'error': 'Token inválido'}), 401
+    elif request.remote_addr not in ('127.0.0.1', '::1'):
+        return jsonify({'error': 'Defina METRICS_TOKEN para acesso remoto'}), 403
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
 # Rota para testar se o webhook está funcionando
 @app.route('/test-webhook/<webhook_name>')
 def test_webhook(webhook_name):
     """Rota para testar se o webhook está acessível"""
-    webhook = Webhook.query.filter_by(name=webhook_name, is_active=True).first()
+    return webhook_status(webhook_name)
+
+def webhook_status(webhook_name):
+    """Resposta de /test-webhook (também usada pelo front-end assíncrono)"""
+    webhook = webhook_cache.get_active(webhook_name)
     
     if not webhook:
-        return jsonify({'error': 'Webhook não encontrado'}), 404
+        return {'error': 'Webhook não encontrado'}, 404
     
-    return jsonify({
+    return {
         'status': 'online',
         'webhook': webhook_name,
         'message': 'Webhook está funcionando corretamente',
         'timestamp': datetime.utcnow().isoformat()
-    }), 200
+    }, 200
+
+# COMPONENTES
+# Caches, fila, limites, métricas, workers... são criados por
+# init_components() a partir de app.config (chamado por create_app)
+user_cache = None
+password_hasher = None
+replica_monitor = None
+response_versions = None
+api_response_cache = None
+user_webhook_ids_cache = None
+field_extractor = None
+recent_dedup_keys = None
+live_tail = None
+payloads = None
+ingest_queue = None
+webhook_cache = None
+destinations_cache = None
+delivery_engine = None
+rate_limit_store = None
+rate_limiter = None
+load_shedder = None
+retention_worker = None
+search_indexer = None
+traffic_stats = None
+metrics = None
+response_salt = None
+
+def init_components():
+    """(Re)criar os componentes do processo a partir de app.config"""
+    global user_cache, password_hasher, replica_monitor, response_versions, api_response_cache
+    global user_webhook_ids_cache, field_extractor, recent_dedup_keys, live_tail
+    global payloads, ingest_queue, webhook_cache, destinations_cache, delivery_engine, rate_limit_store
+    global rate_limiter, load_shedder, retention_worker, search_indexer, traffic_stats, metrics
+    global response_salt
+    config = app.config
+
+    user_cache = WebhookCache(
+        load_cached_user,
+        ttl=config['USER_CACHE_TTL'],
+        negative_ttl=config['USER_CACHE_NEGATIVE_TTL'],
+        maxsize=config['USER_CACHE_SIZE'],
+        stamp_path=instance_file('user_cache.stamp'),
+        stamp_interval=config['USER_CACHE_STAMP_INTERVAL']
+    )
+    password_hasher = PasswordHasher(
+        workers=config['AUTH_HASH_WORKERS'],
+        max_pending=config['AUTH_HASH_MAX_PENDING']
+    )
+    replica_monitor = ReplicaMonitor(
+        probe_replica,
+        interval=config['DB_REPLICA_CHECK_S'],
+        max_lag=config['DB_REPLICA_MAX_LAG_S']
+    )
+
+    if config['RESPONSE_VERSION_STORE'] == 'memory':
+        response_versions = Versions(MemoryVersionStore())
+    else:
+        response_versions = Versions(SQLiteVersionStore(instance_file('response_versions.sqlite')))
+    api_response_cache = ResponseCache()
+    user_webhook_ids_cache = ResponseCache()
+    response_salt = build_response_salt()
+
+    field_extractor = FieldExtractor(config['LOG_FIELD_PATHS'], max_bytes=config['LOG_EXTRACT_MAX_BYTES'])
+    recent_dedup_keys = dedup.RecentKeys(config['INGEST_DEDUP_CACHE_SIZE'])
+    live_tail = LogBroadcaster(
+        buffer_size=config['LIVE_TAIL_BUFFER'],
+        max_subscribers=config['LIVE_TAIL_MAX_SUBSCRIBERS'],
+        heartbeat=config['LIVE_TAIL_HEARTBEAT_S'],
+        poll_fn=poll_new_log_events,
+        poll_interval=config['LIVE_TAIL_POLL_S']
+    )
+    payloads = PayloadStore(config['PAYLOAD_DIR'] or instance_file('payloads'))
+
+    ingest_queue = None
+    if config['INGEST_MODE'] == 'queue':
+        ingest_queue = IngestQueue(
+            flush_webhook_logs,
+            batch_size=config['INGEST_BATCH_SIZE'],
+            flush_interval=config['INGEST_FLUSH_MS'] / 1000.0,
+            maxsize=config['INGEST_QUEUE_MAX'],
+            put_timeout=config['INGEST_ENQUEUE_TIMEOUT_MS'] / 1000.0,
+            durability=config['INGEST_DURABILITY'],
+            dead_letter=write_dead_letter
+        )
+    webhook_cache = WebhookCache(
+        load_cached_webhook,
+        ttl=config['WEBHOOK_CACHE_TTL'],
+        negative_ttl=config['WEBHOOK_CACHE_NEGATIVE_TTL'],
+        maxsize=config['WEBHOOK_CACHE_SIZE'],
+        stamp_path=instance_file('webhook_cache.stamp'),
+        stamp_interval=config['WEBHOOK_CACHE_STAMP_INTERVAL']
+    )
+    destinations_cache = WebhookCache(
+        load_destination_ids,
+        ttl=config['WEBHOOK_CACHE_TTL'],
+        negative_ttl=config['WEBHOOK_CACHE_TTL'],
+        maxsize=config['WEBHOOK_CACHE_SIZE'],
+        stamp_path=instance_file('destinations_cache.stamp'),
+        stamp_interval=config['WEBHOOK_CACHE_STAMP_INTERVAL']
+    )
+    delivery_engine = delivery.DeliveryEngine(
+        claim_deliveries,
+        complete_delivery,
+        workers=config['DELIVERY_WORKERS'],
+        poll_interval=config['DELIVERY_POLL_S'],
+        timeout=config['DELIVERY_TIMEOUT_S'],
+        allowlist=destination_allowlist()
+    )
+
+    if config['RATE_LIMIT_STORE'] == 'memory':
+        rate_limit_store = MemoryBucketStore()
+    else:
+        rate_limit_store = SQLiteBucketStore(instance_file('rate_limit.sqlite'))
+    rate_limiter = RateLimiter(rate_limit_store)
+    load_shedder = LoadShedder(
+        max_queue_depth=config['SHED_QUEUE_DEPTH'],
+        max_db_latency=config['SHED_DB_LATENCY_MS'] / 1000.0
+    )
+
+    retention_worker = retention.RetentionWorker(
+        run_retention_job,
+        interval=config['LOG_RETENTION_INTERVAL_S'],
+        lock_path=instance_file('retention.lock')
+    )
+    search_indexer = search_index.SearchIndexer(
+        index_search_batch,
+        interval=config['SEARCH_INDEX_INTERVAL_S'],
+        lock_path=instance_file('search_index.lock')
+    )
+    traffic_stats = StatsCollector(flush_traffic_stats, interval=config['STATS_FLUSH_S'])
+
+    metrics = MetricsRegistry(config['METRICS_DIR'] or instance_file('metrics'), sync_interval=config['METRICS_SYNC_S'])
+    for definition in METRIC_DEFINITIONS:
+        metrics.describe(*definition)
+    metrics.add_collector(collect_component_metrics)
+
+def stop_components():
+    """Parar as threads dos componentes atuais, gravando o que estiver pendente"""
+    if metrics is None:
+        return
+    if ingest_queue is not None:
+        ingest_queue.stop()
+    traffic_stats.stop()
+    for worker in (delivery_engine, retention_worker, search_indexer, replica_monitor, live_tail, metrics):
+        worker.stop()
+    password_hasher.close()
 
 # INICIALIZAÇÃO
+def engine_options(database_url):
+    """Opções do pool de conexões a partir de DB_POOL_*"""
+    options = {
+        'pool_pre_ping': app.config['DB_POOL_PRE_PING'],
+        'pool_recycle': app.config['DB_POOL_RECYCLE'],
+    }
+    if not (database_url or '').startswith('sqlite'):
+        options['pool_size'] = app.config['DB_POOL_SIZE']
+        options['max_overflow'] = app.config['DB_MAX_OVERFLOW']
+        options['pool_timeout'] = app.config['DB_POOL_TIMEOUT']
+    return options
+
+def create_app(config=None):
+    """Preparar a aplicação para servir: pasta instance, engine, login e componentes.
+    
+    Importar este módulo não cria pastas, conexões nem threads; todo ponto
+    de entrada (wsgi.py, asgi_ingest.py, scripts) chama create_app() antes
+    de usar o banco. Não é uma fábrica de várias instâncias: as rotas estão
+    no ``app`` deste módulo, e toda chamada devolve essa mesma aplicação.
+    ``config`` sobrescreve valores de app.config; numa aplicação
+    já inicializada os componentes (caches, fila, limites, métricas...) são
+    parados e recriados com a configuração nova, mas o banco não pode mudar.
+    O esquema não é criado aqui: use ``flask --app app init-db`` ou
+    create_tables.py no deploy.
+    """
+    if 'sqlalchemy' in app.extensions:
+        if not config:
+            return app
+        for key in ('SQLALCHEMY_DATABASE_URI', 'SQLALCHEMY_BINDS', 'DATABASE_REPLICA_URL'):
+            if key in config and config[key] != app.config.get(key):
+                raise RuntimeError(f'{key} não pode mudar depois da aplicação inicializada')
+        stop_components()
+        app.config.update(config)
+        ensure_instance_folder()
+        init_components()
+        return app
+    if config:
+        app.config.update(config)
+    app.instance_path = ensure_instance_folder()
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(app.config['SQLALCHEMY_DATABASE_URI']))
+    replica_url = app.config['DATABASE_REPLICA_URL']
+    if replica_url:
+        app.config.setdefault('SQLALCHEMY_BINDS', {REPLICA_BIND: {'url': replica_url, **engine_options(replica_url)}})
+    db.init_app(app)
+    login_manager.init_app(app)
+    init_components()
+    print(f"🗄️ Banco configurado via variável .env")
+    if replica_url:
+        print(f"📖 Leituras do painel na réplica (DATABASE_REPLICA_URL)")
+    return app
+
+@app.cli.command('init-db')
+def init_db_command():
+    """Criar/atualizar as tabelas e o usuário admin padrão"""
+    create_app()
+    create_tables()
+
+@app.cli.command('sync-replica')
+def sync_replica_command():
+    """Copiar o banco primário para a réplica (desenvolvimento com dois SQLite)"""
+    create_app()
+    if not app.config['DATABASE_REPLICA_URL']:
+        print("❌ DATABASE_REPLICA_URL não configurada")
+        return
+    with app.app_context():
+        sync_replica()
+    print("✅ Réplica sincronizada com o primário")
+
 if __name__ == '__main__':
     print("🚀 Iniciando aplicação...")
+    create_app()
     
     # Criar tabelas
     create_tables()
@@ -0,0 +1,286 @@
+"""Front-end assíncrono (ASGI) só para a ingestão pública.
+
+Serve ``/webhook/<nome>`` e ``/test-webhook/<nome>`` com o mesmo
+comportamento e as mesmas respostas das rotas Flask (inclusive o desafio
+``hub.challenge``), executando as mesmas funções de app.py. Conexões lentas
+ou keep-alive ficam no loop asyncio, e o corpo é lido de forma assíncrona,
+com limite e transbordo para disco. Só as etapas que tocam o banco vão para
+um pool limitado de threads (``ASGI_DB_THREADS``). Essas threads usam o pool
+de conexões do SQLAlchemy, então o pool deve ter pelo menos esse tamanho.
+Acima de ``ASGI_MAX_PENDING`` etapas aguardando thread, a resposta é 503.
+
+Executar ao lado do painel Flask (que continua em ``wsgi:application``):
+
+    uvicorn asgi_ingest:application --host 0.0.0.0 --port 8001 --workers 4
+    gunicorn asgi_ingest:application -k uvicorn.workers.UvicornWorker -w 4 -b 0.0.0.0:8001
+
+e encaminhar só a ingestão para ele no proxy (nginx, por exemplo):
+
+    location ~ ^/(webhook/[^/]*[^0-9/][^/]*|test-webhook/[^/]+)$ {
+        proxy_pass http://127.0.0.1:8001;
+    }
+
+``/webhook/<número>`` é a página de detalhes do painel e fica no Flask.
+"""
+import asyncio
+import json
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qsl
+
+from flask import g
+from werkzeug.datastructures import Headers, MultiDict
+from werkzeug.exceptions import MethodNotAllowed, NotFound
+
+from app import (
+    app, create_app, admit_webhook, check_webhook_upload, skip_body_under_load, record_webhook_request,
+    record_ingest_request, finish_request_body, payload_too_large_response, overloaded_response,
+    webhook_status, start_background_workers
+)
+# Componentes (métricas, payloads) são recriados por create_app(): ler do módulo
+import app as app_module
+from payload_store import BodyReader, PayloadTooLarge
+
+# Mesmas regras das rotas Flask (<int:webhook_id> tem prioridade em /webhook/)
+ROUTES = [
+    (re.compile(r'^/webhook/(?!\d+$)([^/]+)$'), 'receive_webhook', ('GET', 'POST', 'PUT', 'DELETE', 'PATCH')),
+    (re.compile(r'^/test-webhook/([^/]+)$'), 'test_webhook', ('GET',)),
+]
+
+
+class Overloaded(Exception):
+    """Etapas aguardando thread acima do limite"""
+
+
+class DatabaseBridge:
+    """Executa funções síncronas (com app context) num pool limitado de threads"""
+
+    def __init__(self, threads, max_pending):
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='asgi-db')
+        self.max_pending = max_pending
+        self.pending = 0
+
+    @staticmethod
+    def _run(fn, args):
+        with app.app_context():
+            result = fn(*args)
+            return result, g.get('db_time', 0.0), g.get('db_queries', 0)
+
+    async def call(self, fn, *args):
+        """(resultado, tempo no banco, consultas); levanta ``Overloaded``"""
+        if self.pending >= self.max_pending:
+            raise Overloaded()
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, self._run, fn, args)
+        finally:
+            self.pending -= 1
+
+
+def request_headers(scope):
+    """Cabeçalhos no mesmo formato do WSGI (nomes capitalizados, repetidos unidos por vírgula)"""
+    merged = {}
+    for raw_name, raw_value in scope['headers']:
+        name = raw_name.decode('latin-1').title()
+        value = raw_value.decode('latin-1')
+        merged[name] = f'{merged[name]}, {value}' if name in merged else value
+    return Headers(list(merged.items()))
+
+
+def content_length(headers):
+    try:
+        value = int(headers.get('Content-Length', ''))
+    except ValueError:
+        return None
+    return value if value >= 0 else None
+
+
+def encode_result(result):
+    """(status, cabeçalhos, corpo) de uma tupla (corpo, status[, cabeçalhos]) no formato do Flask"""
+    body, status = result[0], result[1]
+    headers = dict(result[2]) if len(result) > 2 else {}
+    if isinstance(body, dict):
+        # Igual ao jsonify fora do modo debug
+        payload = (json.dumps(body, sort_keys=True, separators=(',', ':')) + '\n').encode('utf-8')
+        headers['Content-Type'] = 'application/json'
+    else:
+        payload = str(body).encode('utf-8')
+        headers['Content-Type'] = 'text/html; charset=utf-8'
+    return status, headers, payload
+
+
+def encode_http_exception(error):
+    """Página de erro do werkzeug (404/405), a mesma servida pelo Flask"""
+    headers = dict(error.get_headers())
+    return error.code, headers, error.get_body().encode('utf-8')
+
+
+async def send_response(send, status, headers, payload, head_only=False):
+    headers['Content-Length'] = str(len(payload))
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(name.lower().encode('latin-1'), str(value).encode('latin-1')) for name, value in headers.items()]
+    })
+    await send({'type': 'http.response.body', 'body': b'' if head_only else payload})
+
+
+class IngestApplication:
+    """Aplicação ASGI das rotas públicas de ingestão"""
+
+    def __init__(self):
+        # Nada é criado na importação: create_app() e os pools só na primeira chamada
+        self.bridge = None
+        self.io_executor = None
+        self._started = False
+        self._setup_lock = threading.Lock()
+
+    def setup(self):
+        """Inicializar a aplicação Flask e os pools de threads (uma vez)"""
+        if self.bridge is not None:
+            return self
+        with self._setup_lock:
+            if self.bridge is None:
+                create_app()
+                self.io_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='asgi-io')
+                self.bridge = DatabaseBridge(app.config['ASGI_DB_THREADS'], app.config['ASGI_MAX_PENDING'])
+        return self
+
+    async def __call__(self, scope, receive, send):
+        self.setup()
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self.http(scope, receive, send)
+
+    async def startup(self):
+        if not self._started:
+            self._started = True
+            await self.bridge.call(start_background_workers)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await self.startup()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await asyncio.get_running_loop().run_in_executor(None, self.shutdown)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    def shutdown(self):
+        self.bridge.executor.shutdown(wait=True)
+        self.io_executor.shutdown(wait=True)
+
+    async def http(self, scope, receive, send):
+        started = time.perf_counter()
+        method = scope['method']
+        head_only = method == 'HEAD'
+
+        for pattern, endpoint, methods in ROUTES:
+            match = pattern.match(scope['path'])
+            if match:
+                break
+        else:
+            await send_response(send, *encode_http_exception(NotFound()))
+            return
+
+        # HEAD e OPTIONS automáticos, como no Flask
+        allowed = sorted(set(methods) | {'HEAD', 'OPTIONS'})
+        if method == 'OPTIONS':
+            await send_response(send, 200, {'Allow': ', '.join(allowed), 'Content-Type': 'text/html; charset=utf-8'}, b'')
+            return
+        if method not in allowed:
+            await send_response(send, *encode_http_exception(MethodNotAllowed(valid_methods=allowed)), head_only)
+            return
+
+        await self.startup()
+        webhook_name = match.group(1)
+        try:
+            if endpoint == 'test_webhook':
+                result, _, _ = await self.bridge.call(webhook_status, webhook_name)
+                await send_response(send, *encode_result(result), head_only)
+                app_module.metrics.observe('http_request_duration_seconds', time.perf_counter() - started,
+                                endpoint=endpoint, method=method, status=result[1])
+                return
+
+            webhook_id, result, db_time, db_queries = await self.receive_webhook(scope, receive, webhook_name)
+        except Overloaded:
+            app_module.metrics.inc('app_errors_total', type='Overloaded')
+            webhook_id, result, db_time, db_queries = None, overloaded_response(), 0.0, 0
+
+        if result is None:
+            # Remetente desconectou antes de enviar o corpo inteiro
+            return
+        await send_response(send, *encode_result(result), head_only)
+        record_ingest_request(webhook_id, method, result[1], time.perf_counter() - started, db_time, db_queries)
+
+    async def receive_webhook(self, scope, receive, webhook_name):
+        """Mesmo fluxo de app.receive_webhook; retorna (webhook_id, resposta, tempo no banco, consultas)"""
+        method = scope['method']
+        headers = request_headers(scope)
+        args = MultiDict(parse_qsl(scope.get('query_string', b'').decode('latin-1'), keep_blank_values=True))
+        remote_addr = scope['client'][0] if scope.get('client') else None
+
+        (webhook, error), db_time, db_queries = await self.bridge.call(admit_webhook, webhook_name, remote_addr)
+        webhook_id = webhook.id if webhook is not None else None
+        if error is not None:
+            return webhook_id, error, db_time, db_queries
+
+        if method == 'GET':
+            result, more_time, more_queries = await self.bridge.call(
+                record_webhook_request, webhook, webhook_name, method, headers, args, remote_addr
+            )
+            return webhook_id, result, db_time + more_time, db_queries + more_queries
+
+        max_body, error = check_webhook_upload(webhook, headers, content_length(headers))
+        if error is not None:
+            return webhook_id, error, db_time, db_queries
+
+        body = None
+        if not skip_body_under_load():
+            try:
+                body = await self.read_body(receive, max_body)
+            except PayloadTooLarge as e:
+                return webhook_id, payload_too_large_response(e.limit), db_time, db_queries
+            if body is None:
+                return webhook_id, None, db_time, db_queries
+
+        result, more_time, more_queries = await self.bridge.call(
+            record_webhook_request, webhook, webhook_name, method, headers, args, remote_addr, body
+        )
+        return webhook_id, result, db_time + more_time, db_queries + more_queries
+
+    async def read_body(self, receive, max_body):
+        """Corpo lido das mensagens ASGI (texto ou ``SpilledBody``); None se o cliente desconectou"""
+        loop = asyncio.get_running_loop()
+        reader = BodyReader(max_body, app.config['INGEST_SPILL_THRESHOLD'], app_module.payloads)
+        try:
+            while True:
+                message = await receive()
+                if message['type'] == 'http.disconnect':
+                    reader.abort()
+                    return None
+                chunk = message.get('body', b'')
+                if chunk:
+                    # Depois do transbordo, a escrita em disco sai do loop
+                    if reader.spilling:
+                        await loop.run_in_executor(self.io_executor, reader.feed, chunk)
+                    else:
+                        reader.feed(chunk)
+                if not message.get('more_body', False):
+                    break
+            if reader.spilling:
+                body = await loop.run_in_executor(self.io_executor, reader.finish)
+            else:
+                body = reader.finish()
+        except BaseException:
+            reader.abort()
+            raise
+        return finish_request_body(body)
+
+
+application = IngestApplication()
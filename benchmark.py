@@ -0,0 +1,364 @@
+"""Benchmark reproduzível do caminho de ingestão e das rotas do painel.
+
+Sobe a aplicação num servidor local (threaded) com um banco SQLite
+temporário, dispara requisições concorrentes com payloads no formato do
+WhatsApp/Meta e mede vazão e latência (p50/p95/p99) por cenário.
+
+Exemplos:
+    python benchmark.py
+    python benchmark.py --requests 5000 --concurrency 32 --output bench.json
+    INGEST_MODE=queue python benchmark.py --output queue.json --compare bench.json
+
+Com --compare, termina com código 1 se algum cenário regredir mais que
+--max-regression (fração) em vazão ou p95, para uso em CI. O tempo de
+``import app`` num interpretador novo também é medido (import_ms); com
+--import-budget-ms, passar do orçamento termina com código 1.
+"""
+import argparse
+import hashlib
+import http.client
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import string
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from urllib.parse import urlencode
+
+WEBHOOK_NAME = 'bench_whatsapp'
+ADMIN_USER = 'admin'
+ADMIN_PASSWORD = 'admin123'
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Benchmark do Webhook Manager')
+    parser.add_argument('--requests', type=int, default=2000, help='Requisições por cenário')
+    parser.add_argument('--concurrency', type=int, default=16, help='Clientes simultâneos')
+    parser.add_argument('--scenarios', default='ingest,verify,details,api_webhooks',
+                        help='Cenários separados por vírgula')
+    parser.add_argument('--database-url', help='Banco a usar (padrão: SQLite temporário)')
+    parser.add_argument('--seed', type=int, default=42, help='Semente dos payloads sintéticos')
+    parser.add_argument('--output', help='Arquivo JSON com os resultados')
+    parser.add_argument('--compare', help='Resultados anteriores (JSON) para detectar regressões')
+    parser.add_argument('--max-regression', type=float, default=0.2,
+                        help='Regressão máxima tolerada em vazão/p95 (fração)')
+    parser.add_argument('--import-budget-ms', type=float, default=0,
+                        help='Tempo máximo de "import app" (ms; 0 = só medir)')
+    return parser.parse_args()
+
+
+# PAYLOADS SINTÉTICOS
+def whatsapp_payload(rng):
+    """Corpo no formato de notificação da WhatsApp Cloud API"""
+    phone = '55' + ''.join(rng.choice(string.digits) for _ in range(11))
+    message_id = 'wamid.' + ''.join(rng.choice(string.ascii_letters + string.digits) for _ in range(48))
+    if rng.random() < 0.7:
+        value = {
+            'messaging_product': 'whatsapp',
+            'metadata': {'display_phone_number': '5511999990000', 'phone_number_id': '109876543210'},
+            'contacts': [{'profile': {'name': 'Cliente ' + phone[-4:]}, 'wa_id': phone}],
+            'messages': [{
+                'from': phone,
+                'id': message_id,
+                'timestamp': str(int(time.time())),
+                'type': 'text',
+                'text': {'body': ' '.join(rng.choice(['olá', 'pedido', 'status', 'obrigado', 'ajuda', 'entrega'])
+                                          for _ in range(rng.randint(3, 40)))}
+            }]
+        }
+    else:
+        value = {
+            'messaging_product': 'whatsapp',
+            'metadata': {'display_phone_number': '5511999990000', 'phone_number_id': '109876543210'},
+            'statuses': [{
+                'id': message_id,
+                'status': rng.choice(['sent', 'delivered', 'read', 'failed']),
+                'timestamp': str(int(time.time())),
+                'recipient_id': phone
+            }]
+        }
+    return json.dumps({
+        'object': 'whatsapp_business_account',
+        'entry': [{'id': '102290129340398', 'changes': [{'value': value, 'field': 'messages'}]}]
+    })
+
+
+def whatsapp_headers(body, token):
+    return {
+        'Content-Type': 'application/json',
+        'User-Agent': 'facebookexternalua',
+        'X-Hub-Signature-256': 'sha256=' + hashlib.sha256(body.encode('utf-8')).hexdigest(),
+        'Authorization': f'Bearer {token}'
+    }
+
+
+# TEMPO DE IMPORTAÇÃO
+def measure_import(runs=5):
+    """Mediana (ms) de ``import app`` num interpretador novo, sem criar a aplicação"""
+    code = 'import time; t = time.perf_counter(); import app; print(time.perf_counter() - t)'
+    root = os.path.dirname(os.path.abspath(__file__))
+    samples = []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, '-c', code], cwd=root, env=os.environ.copy(),
+                                capture_output=True, text=True, check=True).stdout
+        samples.append(float(output.strip().splitlines()[-1]) * 1000)
+    return round(statistics.median(samples), 1)
+
+
+# SERVIDOR
+def start_server(app):
+    from werkzeug.serving import make_server
+
+    # Sem log por requisição do servidor de desenvolvimento
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+def prepare_data(module):
+    """Garantir usuário admin e o webhook de benchmark; retorna o token"""
+    module.create_tables()
+    with module.app.app_context():
+        user = module.User.query.filter_by(username=ADMIN_USER).first()
+        webhook = module.Webhook.query.filter_by(name=WEBHOOK_NAME).first()
+        if not webhook:
+            webhook = module.Webhook(name=WEBHOOK_NAME, token=module.generate_token(), user_id=user.id)
+            module.db.session.add(webhook)
+            module.db.session.commit()
+        return webhook.id, webhook.token
+
+
+def header_dedup(module, webhook_id):
+    """Logs gravados x conjuntos de cabeçalhos distintos que eles usam"""
+    WebhookLog = module.WebhookLog
+    with module.app.app_context():
+        logs, header_sets = module.db.session.execute(
+            module.db.select(module.db.func.count(WebhookLog.id), module.db.func.count(WebhookLog.headers_hash.distinct()))
+            .where(WebhookLog.webhook_id == webhook_id)
+        ).one()
+    return {
+        'logs': logs,
+        'header_sets': header_sets,
+        'ratio': round(logs / header_sets, 1) if header_sets else None
+    }
+
+
+def login(port):
+    conn = http.client.HTTPConnection('127.0.0.1', port)
+    body = urlencode({'username': ADMIN_USER, 'password': ADMIN_PASSWORD})
+    conn.request('POST', '/login', body, {'Content-Type': 'application/x-www-form-urlencoded'})
+    response = conn.getresponse()
+    response.read()
+    cookies = response.msg.get_all('Set-Cookie') or []
+    conn.close()
+    return '; '.join(cookie.split(';')[0] for cookie in cookies)
+
+
+# EXECUÇÃO
+class Client:
+    """Conexão HTTP por thread, reaberta se o servidor a fechar"""
+
+    def __init__(self, port):
+        self.port = port
+        self.conn = None
+
+    def request(self, method, path, body=None, headers=None):
+        for attempt in range(2):
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection('127.0.0.1', self.port, timeout=30)
+            try:
+                self.conn.request(method, path, body, headers or {})
+                response = self.conn.getresponse()
+                response.read()
+                if response.getheader('Connection', '').lower() == 'close' or response.version == 10:
+                    self.conn.close()
+                    self.conn = None
+                return response.status
+            except (http.client.HTTPException, OSError):
+                self.conn.close()
+                self.conn = None
+                if attempt:
+                    raise
+
+
+def run_scenario(name, make_request, port, total, concurrency):
+    latencies = []
+    statuses = {}
+    errors = 0
+    lock = threading.Lock()
+    local = threading.local()
+
+    def worker(index):
+        nonlocal errors
+        if not hasattr(local, 'client'):
+            local.client = Client(port)
+        method, path, body, headers = make_request(index)
+        start = time.perf_counter()
+        try:
+            status = local.client.request(method, path, body, headers)
+        except Exception:
+            status = None
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+            if status is None or status >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(worker, range(total)))
+    duration = time.perf_counter() - started
+
+    latencies.sort()
+
+    def percentile(p):
+        index = min(len(latencies) - 1, int(round(p / 100.0 * (len(latencies) - 1))))
+        return round(latencies[index] * 1000, 3)
+
+    result = {
+        'requests': total,
+        'concurrency': concurrency,
+        'duration_s': round(duration, 3),
+        'throughput_rps': round(total / duration, 1),
+        'p50_ms': percentile(50),
+        'p95_ms': percentile(95),
+        'p99_ms': percentile(99),
+        'max_ms': round(latencies[-1] * 1000, 3),
+        'errors': errors,
+        'statuses': statuses
+    }
+    print(f"📈 {name:<13} {result['throughput_rps']:>9} req/s  "
+          f"p50 {result['p50_ms']:>8} ms  p95 {result['p95_ms']:>8} ms  p99 {result['p99_ms']:>8} ms  "
+          f"erros {errors}")
+    return result
+
+
+def build_scenarios(webhook_id, token, cookie, seed):
+    rng = random.Random(seed)
+    payloads = [whatsapp_payload(rng) for _ in range(256)]
+    auth = {'Cookie': cookie}
+
+    def ingest(index):
+        body = payloads[index % len(payloads)]
+        return 'POST', f'/webhook/{WEBHOOK_NAME}', body, whatsapp_headers(body, token)
+
+    def verify(index):
+        query = urlencode({'hub.mode': 'subscribe', 'hub.challenge': str(index), 'hub.verify_token': 'bench'})
+        return 'GET', f'/webhook/{WEBHOOK_NAME}?{query}', None, {'User-Agent': 'facebookexternalua'}
+
+    def details(index):
+        return 'GET', f'/webhook/{webhook_id}', None, auth
+
+    def api_webhooks(index):
+        return 'GET', '/api/webhooks', None, auth
+
+    return {'ingest': ingest, 'verify': verify, 'details': details, 'api_webhooks': api_webhooks}
+
+
+def compare(results, baseline_path, max_regression):
+    """Lista de regressões em relação a um resultado anterior"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    regressions = []
+    if results.get('import_ms') and baseline.get('import_ms'):
+        if results['import_ms'] > baseline['import_ms'] * (1 + max_regression):
+            regressions.append(f"import app: {baseline['import_ms']} -> {results['import_ms']} ms")
+    for name, current in results['scenarios'].items():
+        previous = baseline.get('scenarios', {}).get(name)
+        if not previous:
+            continue
+        if current['throughput_rps'] < previous['throughput_rps'] * (1 - max_regression):
+            regressions.append(f"{name}: vazão {previous['throughput_rps']} -> {current['throughput_rps']} req/s")
+        if current['p95_ms'] > previous['p95_ms'] * (1 + max_regression):
+            regressions.append(f"{name}: p95 {previous['p95_ms']} -> {current['p95_ms']} ms")
+    return regressions
+
+
+def main():
+    args = parse_args()
+
+    # Estado de execução (métricas, rate limit, versões, payloads) fica no
+    # diretório temporário, nunca na pasta instance do projeto
+    tmpdir = tempfile.mkdtemp(prefix='webhook-bench-')
+    os.environ['INSTANCE_DIR'] = os.path.join(tmpdir, 'instance')
+    if args.database_url:
+        os.environ['DATABASE_URL'] = args.database_url
+    else:
+        os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tmpdir, 'bench.db')
+
+    import_ms = measure_import()
+    print(f"📦 import app: {import_ms} ms")
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import app as module
+    module.create_app()
+
+    webhook_id, token = prepare_data(module)
+    with module.app.app_context():
+        database_name = module.db.engine.dialect.name
+    server = start_server(module.app)
+    port = server.server_port
+    cookie = login(port)
+    scenarios = build_scenarios(webhook_id, token, cookie, args.seed)
+
+    print(f"🚀 Benchmark em http://127.0.0.1:{port} ({args.requests} req/cenário, {args.concurrency} clientes)")
+    results = {
+        'timestamp': datetime.utcnow().isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'database': database_name,
+        'config': {
+            key: module.app.config.get(key)
+            for key in ('INGEST_MODE', 'INGEST_DURABILITY', 'INGEST_BATCH_SIZE', 'INGEST_FLUSH_MS')
+        },
+        'requests': args.requests,
+        'concurrency': args.concurrency,
+        'seed': args.seed,
+        'import_ms': import_ms,
+        'scenarios': {}
+    }
+    for name in [name.strip() for name in args.scenarios.split(',') if name.strip()]:
+        if name not in scenarios:
+            print(f"❌ Cenário desconhecido: {name}")
+            sys.exit(2)
+        results['scenarios'][name] = run_scenario(name, scenarios[name], port, args.requests, args.concurrency)
+
+    server.shutdown()
+    if module.ingest_queue is not None:
+        module.ingest_queue.stop()
+
+    results['header_dedup'] = header_dedup(module, webhook_id)
+    dedup = results['header_dedup']
+    print(f"🗜️  Cabeçalhos: {dedup['logs']} logs -> {dedup['header_sets']} conjunto(s) (razão {dedup['ratio']})")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"💾 Resultados salvos em {args.output}")
+
+    if args.import_budget_ms and import_ms > args.import_budget_ms:
+        print(f"❌ import app levou {import_ms} ms (orçamento: {args.import_budget_ms} ms)")
+        sys.exit(1)
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.max_regression)
+        if regressions:
+            print("❌ Regressões detectadas:")
+            for regression in regressions:
+                print(f"   - {regression}")
+            sys.exit(1)
+        print("✅ Sem regressões em relação a", args.compare)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,156 @@
+"""Compactação dos logs sob demanda.
+
+Exemplos:
+    python compact_logs.py                      # aplica as políticas de retenção
+    python compact_logs.py --webhook meu_bot --days 30 --max-rows 100000
+    python compact_logs.py --gc-headers         # remove cabeçalhos órfãos
+    python compact_logs.py --partition          # MySQL: particionar por mês
+    python compact_logs.py --rebuild-counters   # recalcular request_count/last_request
+    python compact_logs.py --extract-fields     # preencher os campos extraídos de logs antigos
+    python compact_logs.py --gc-payloads        # remove corpos em disco sem log
+"""
+import argparse
+from datetime import datetime, timedelta
+
+import retention
+from app import app, create_app, db, Webhook, WebhookLog, HeaderSet, enforce_retention, gc_payloads
+# Componentes são recriados por create_app(): ler do módulo
+import app as app_module
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Retenção e compactação dos logs de webhook')
+    parser.add_argument('--webhook', help='Nome do webhook (padrão: todos)')
+    parser.add_argument('--days', type=int, help='Excluir logs mais antigos que N dias (ignora a política salva)')
+    parser.add_argument('--max-rows', type=int, help='Manter apenas os N logs mais recentes (ignora a política salva)')
+    parser.add_argument('--no-pause', action='store_true', help='Não pausar entre lotes')
+    parser.add_argument('--gc-headers', action='store_true', help='Remover conjuntos de cabeçalhos sem logs')
+    parser.add_argument('--partition', action='store_true', help='Converter webhook_log para partições mensais (MySQL)')
+    parser.add_argument('--rebuild-counters', action='store_true', help='Recalcular request_count/last_request a partir dos logs')
+    parser.add_argument('--gc-payloads', action='store_true', help='Remover corpos gravados em disco sem logs')
+    parser.add_argument('--extract-fields', action='store_true', help='Reextrair os campos estruturados dos corpos já gravados')
+    return parser.parse_args()
+
+
+def gc_header_sets():
+    """Excluir conjuntos de cabeçalhos que nenhum log referencia.
+    
+    A ingestão regrava o conjunto (INSERT ignorando duplicatas) na mesma
+    transação de cada log, então um conjunto excluído aqui volta na próxima
+    entrega que o usar. O DELETE confere de novo que não há log apontando
+    para o hash, para não apagar um conjunto que ganhou log depois da busca.
+    """
+    unreferenced = ~db.exists().where(WebhookLog.headers_hash == HeaderSet.hash)
+    hashes = db.session.execute(db.select(HeaderSet.hash).where(unreferenced)).scalars().all()
+    deleted = 0
+    for start in range(0, len(hashes), 1000):
+        chunk = hashes[start:start + 1000]
+        deleted += db.session.execute(
+            HeaderSet.__table__.delete().where(HeaderSet.hash.in_(chunk), unreferenced)
+        ).rowcount
+        db.session.commit()
+    return deleted
+
+
+def rebuild_counters(webhooks):
+    """Recalcular os contadores dos webhooks (uma consulta agregada por webhook)"""
+    for webhook in webhooks:
+        count, last = db.session.query(
+            db.func.count(WebhookLog.id), db.func.max(WebhookLog.timestamp)
+        ).filter(WebhookLog.webhook_id == webhook.id).one()
+        webhook.request_count = count
+        webhook.last_request = last
+        db.session.commit()
+        print(f"🔢 {webhook.name}: {count} requisição(ões)")
+
+
+def extract_fields(webhooks, batch_size=1000):
+    """Reprocessar os corpos gravados e atualizar as colunas extraídas"""
+    table = WebhookLog.__table__
+    for webhook in webhooks:
+        last_id = 0
+        updated = 0
+        while True:
+            rows = db.session.execute(
+                db.select(
+                    WebhookLog.id, WebhookLog.body, WebhookLog.body_blob, WebhookLog.body_codec,
+                    WebhookLog.body_ref, WebhookLog.body_size
+                )
+                .where(WebhookLog.webhook_id == webhook.id, WebhookLog.id > last_id)
+                .order_by(WebhookLog.id)
+                .limit(batch_size)
+            ).all()
+            if not rows:
+                break
+            for log_id, body, blob, codec, ref, size in rows:
+                # Corpos em disco passam pela mesma leitura limitada da ingestão
+                text = app_module.extractable_body_text(body, blob, codec, ref, size)
+                values = app_module.field_extractor.extract(text)
+                db.session.execute(table.update().where(table.c.id == log_id).values(**values))
+            db.session.commit()
+            last_id = rows[-1][0]
+            updated += len(rows)
+        print(f"🏷️  {webhook.name}: {updated} log(s) reprocessado(s)")
+
+
+def main():
+    args = parse_args()
+
+    create_app()
+    with app.app_context():
+        if args.partition:
+            if db.engine.dialect.name != 'mysql':
+                print("❌ Particionamento só é suportado no MySQL")
+                return
+            import partitions
+            with db.engine.begin() as conn:
+                if partitions.partition_table(conn, WebhookLog.__tablename__):
+                    print("✅ Tabela webhook_log particionada por mês")
+                else:
+                    created = partitions.ensure_future_partitions(conn, WebhookLog.__tablename__)
+                    print(f"ℹ️  Tabela já particionada ({created} partição(ões) nova(s))")
+
+        query = Webhook.query
+        if args.webhook:
+            query = query.filter_by(name=args.webhook)
+        webhooks = query.all()
+        if args.webhook and not webhooks:
+            print(f"❌ Webhook não encontrado: {args.webhook}")
+            return
+
+        pause = 0 if args.no_pause else app.config['LOG_RETENTION_PAUSE_MS'] / 1000.0
+        if args.days is not None or args.max_rows is not None:
+            before = datetime.utcnow() - timedelta(days=args.days) if args.days else None
+            targets = [(webhook.id, webhook.name) for webhook in webhooks]
+            deleted = {
+                name: retention.prune_logs(
+                    db.session, WebhookLog, webhook_id,
+                    before=before,
+                    keep_rows=args.max_rows,
+                    batch_size=app.config['LOG_RETENTION_BATCH'],
+                    pause=pause
+                )
+                for webhook_id, name in targets
+            }
+        else:
+            deleted = enforce_retention(webhooks, pause=pause)
+
+        for name, count in deleted.items():
+            print(f"🧹 {name}: {count} log(s) excluído(s)")
+        print(f"✅ Total excluído: {sum(deleted.values())}")
+
+        if args.rebuild_counters:
+            rebuild_counters(webhooks)
+
+        if args.extract_fields:
+            extract_fields(webhooks)
+
+        if args.gc_headers:
+            print(f"🧹 Cabeçalhos órfãos removidos: {gc_header_sets()}")
+
+        if args.gc_payloads:
+            print(f"🧹 Corpos em disco removidos: {gc_payloads()}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +0,0 @@
-import os
-from dotenv import load_dotenv
-
-load_dotenv()
-
-SQLALCHEMY_DATABASE_URI = os.getenv("DATABASE_URL")
-SQLALCHEMY_TRACK_MODIFICATIONS = False
-SECRET_KEY = os.getenv("SECRET_KEY")
-print("USANDO DATABASE:", os.getenv("DATABASE_URL"))
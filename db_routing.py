@@ -0,0 +1,141 @@
+"""Leituras do painel numa réplica do banco, escritas sempre no primário.
+
+- ``RoutingSession``: sessão do Flask-SQLAlchemy que envia as consultas ao
+  bind ``replica`` quando a requisição foi marcada para isso (``g.db_replica``).
+  Flush e INSERT/UPDATE/DELETE explícitos continuam no primário. Se a réplica
+  falhar (``OperationalError``) a consulta é repetida no primário e o resto
+  da requisição também lê dele (``g.db_replica_error`` guarda o erro).
+- ``ReplicaMonitor``: grava periodicamente um batimento (timestamp) no
+  primário e lê o último que chegou à réplica. Réplica fora do ar, sem
+  batimento ou com atraso acima de ``max_lag`` fica fora de uso até voltar.
+  ``position`` diz até que instante a réplica tem tudo o que foi gravado no
+  primário (usado para não cachear respostas com dados mais novos que ela).
+- ``sync_sqlite``: desenvolvimento local com dois arquivos SQLite, onde não
+  há replicação: copia o primário inteiro para a réplica (API de backup).
+"""
+import os
+import threading
+import time
+
+from flask import g, has_app_context
+from flask_sqlalchemy.session import Session
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.sql.dml import UpdateBase
+
+REPLICA_BIND = 'replica'
+
+
+def use_replica():
+    """A requisição atual lê da réplica"""
+    return has_app_context() and g.get('db_replica', False)
+
+
+class RoutingSession(Session):
+    """Sessão que lê da réplica nas requisições marcadas"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (bind is None and not self._flushing and not isinstance(clause, UpdateBase)
+                and use_replica()):
+            engine = self._db.engines.get(REPLICA_BIND)
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def execute(self, statement, *args, **kwargs):
+        routed = (use_replica() and not isinstance(statement, UpdateBase)
+                  and not (kwargs.get('bind_arguments') or {}).get('bind'))
+        if not routed:
+            return super().execute(statement, *args, **kwargs)
+        try:
+            return super().execute(statement, *args, **kwargs)
+        except OperationalError as e:
+            # Réplica fora do ar ou incompleta: repetir a leitura no primário
+            g.db_replica = False
+            g.db_replica_error = e
+            self.rollback()
+            return super().execute(statement, *args, **kwargs)
+
+
+class ReplicaMonitor:
+    """Saúde e atraso da réplica.
+
+    ``probe()`` grava o batimento no primário e retorna o timestamp mais
+    recente visto na réplica (None se ela ainda não tem nenhum). ``max_lag``
+    em segundos; 0 verifica só a disponibilidade.
+    """
+
+    def __init__(self, probe, interval=2.0, max_lag=5.0):
+        self.probe = probe
+        self.interval = interval
+        self.max_lag = max_lag
+        self.healthy = False
+        self.position = None
+        self.lag = None
+        self.error = None
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+
+    def start(self):
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._stopping = threading.Event()
+            self._thread = threading.Thread(target=self._run, name='replica-monitor', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stopping.set()
+
+    def fail(self, error):
+        """Consulta falhou na réplica: tirá-la de uso até a próxima verificação boa"""
+        if self.healthy:
+            print(f"⚠️ Réplica falhou numa consulta, leituras no primário: {error}")
+        self.error = error
+        self.healthy = False
+
+    def check(self):
+        """Medir a réplica uma vez; retorna se ela pode ser usada"""
+        try:
+            position = self.probe()
+            error = None if position is not None else 'sem batimento'
+        except Exception as e:
+            # Só a primeira linha (o SQLAlchemy anexa a URL da documentação)
+            position, error = None, f'{type(e).__name__}: ' + (str(e).splitlines() or [''])[0]
+        lag = max(0.0, time.time() - position) if position is not None else None
+        healthy = error is None and (not self.max_lag or lag <= self.max_lag)
+
+        if healthy != self.healthy:
+            if healthy:
+                print(f"✅ Réplica em uso (atraso {lag:.1f}s)")
+            elif error:
+                print(f"⚠️ Réplica indisponível, leituras no primário: {error}")
+            else:
+                print(f"⚠️ Réplica atrasada {lag:.1f}s, leituras no primário")
+        self.position = position
+        self.lag = lag
+        self.error = error
+        self.healthy = healthy
+        return healthy
+
+    def _run(self):
+        while not self._stopping.is_set():
+            self.check()
+            self._stopping.wait(self.interval)
+
+
+def sync_sqlite(primary, replica):
+    """Copiar o banco SQLite ``primary`` para ``replica`` (engines SQLAlchemy)"""
+    source = primary.raw_connection()
+    try:
+        target = replica.raw_connection()
+        try:
+            source.driver_connection.backup(target.driver_connection)
+        finally:
+            target.close()
+    finally:
+        source.close()
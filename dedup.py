@@ -0,0 +1,82 @@
+"""Supressão de entregas duplicadas na ingestão.
+
+Cada requisição recebe uma chave de deduplicação: o id de entrega enviado
+pelo provedor num cabeçalho conhecido ou, na falta dele (caso da Meta), o
+hash do corpo. Um LRU em memória responde rápido às repetições recentes;
+o índice único (webhook_id, dedup_key) em webhook_log é a verificação
+definitiva entre processos.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+
+DEDUP_OFF = 'off'
+DEDUP_HEADER = 'header'
+DEDUP_BODY = 'body'
+
+DEFAULT_HEADERS = (
+    'Idempotency-Key',
+    'X-Idempotency-Key',
+    'X-GitHub-Delivery',
+    'X-Shopify-Webhook-Id',
+    'X-Delivery-Id',
+    'X-Webhook-Id'
+)
+
+_MISSING = object()
+
+
+def dedup_key(mode, headers, body, header_names=DEFAULT_HEADERS, body_digest=None):
+    """Chave de deduplicação (hex) ou None.
+
+    ``header``: só ids de entrega em cabeçalho; ``body``: id em cabeçalho
+    ou, se não houver, o SHA-256 do corpo. Corpos gravados em disco já
+    chegam com o hash calculado na leitura (``body_digest``).
+    """
+    if mode not in (DEDUP_HEADER, DEDUP_BODY):
+        return None
+    for name in header_names:
+        value = headers.get(name)
+        if value:
+            return hashlib.sha256(f'{name.lower()}:{value}'.encode('utf-8')).hexdigest()
+    if mode == DEDUP_BODY and body_digest:
+        return hashlib.sha256(f'file:{body_digest}'.encode('utf-8')).hexdigest()
+    if mode == DEDUP_BODY and body:
+        return hashlib.sha256(b'body:' + body.encode('utf-8')).hexdigest()
+    return None
+
+
+class RecentKeys:
+    """LRU limitado (webhook_id, chave) -> log_id (None = ainda na fila)"""
+
+    def __init__(self, maxsize=100000):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def claim(self, webhook_id, key):
+        """Registrar a chave como pendente; retorna (duplicada?, log_id original)"""
+        with self._lock:
+            value = self._entries.get((webhook_id, key), _MISSING)
+            if value is not _MISSING:
+                self._entries.move_to_end((webhook_id, key))
+                return True, value
+            self._entries[(webhook_id, key)] = None
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+            return False, None
+
+    def add(self, webhook_id, key, log_id=None):
+        with self._lock:
+            current = self._entries.get((webhook_id, key))
+            self._entries[(webhook_id, key)] = log_id if log_id is not None else current
+            self._entries.move_to_end((webhook_id, key))
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def discard(self, webhook_id, key):
+        with self._lock:
+            self._entries.pop((webhook_id, key), None)
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,303 @@
+"""Reenvio (fan-out) dos payloads recebidos para URLs de destino.
+
+A ingestão só grava uma linha de tentativa por destino; um despachante em
+segundo plano reivindica as tentativas vencidas e as entrega num pool de
+threads, reaproveitando conexões keep-alive por host. Falhas são
+reagendadas com backoff exponencial até o limite de tentativas, quando a
+entrega vai para o estado "dead" (dead letter).
+
+URLs de destino só podem apontar para endereços públicos: ``check_destination``
+resolve o host e recusa loopback, redes privadas, link-local (metadados de
+nuvem) etc., salvo o que estiver na lista liberada (``parse_allowlist``). O
+pool repete a verificação ao abrir cada conexão e conecta no endereço
+validado, para um DNS trocado depois do cadastro não desviar a entrega.
+
+Uma requisição nunca é reenviada pelo pool: se a conexão cair depois do
+envio, a tentativa volta para a fila com backoff e o destino pode recebê-la
+de novo — use o cabeçalho ``X-Webhook-Delivery-Id`` para descartar repetidas.
+"""
+import atexit
+import http.client
+import ipaddress
+import os
+import random
+import select
+import socket
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+PENDING = 'pending'
+IN_PROGRESS = 'in_progress'
+DELIVERED = 'delivered'
+DEAD = 'dead'
+
+# Cabeçalhos originais que não são repassados ao destino
+SKIP_HEADERS = {
+    'host', 'content-length', 'connection', 'keep-alive', 'transfer-encoding',
+    'authorization', 'cookie', 'proxy-authorization', 'te', 'upgrade'
+}
+
+
+def backoff_delay(attempts, base=5.0, cap=3600.0):
+    """Atraso até a próxima tentativa (exponencial com jitter)"""
+    delay = min(cap, base * (2 ** max(0, attempts - 1)))
+    return delay * random.uniform(0.8, 1.2)
+
+
+def forward_headers(headers):
+    return {key: value for key, value in (headers or {}).items() if key.lower() not in SKIP_HEADERS}
+
+
+class UnsafeDestination(ValueError):
+    """URL de destino inválida ou apontando para um endereço interno"""
+
+
+def parse_allowlist(raw):
+    """Lista liberada "host1,10.0.0.0/8,::1" -> (nomes, redes)"""
+    hosts = set()
+    networks = []
+    for item in (raw or '').split(','):
+        item = item.strip().lower()
+        if not item:
+            continue
+        try:
+            networks.append(ipaddress.ip_network(item, strict=False))
+        except ValueError:
+            hosts.add(item)
+    return frozenset(hosts), tuple(networks)
+
+
+def is_internal_address(address):
+    """Loopback, privado, link-local, multicast, reservado ou não roteável"""
+    if address.version == 6 and address.ipv4_mapped is not None:
+        address = address.ipv4_mapped
+    return not address.is_global or address.is_multicast
+
+
+def check_destination(url, allowlist=None):
+    """Validar a URL e resolver o host; retorna os endereços permitidos.
+
+    Levanta ``UnsafeDestination`` se o esquema não for http(s), o host não
+    resolver ou algum endereço for interno e não estiver liberado.
+    """
+    hosts, networks = allowlist or (frozenset(), ())
+    parts = urlsplit(url)
+    if parts.scheme not in ('http', 'https') or not parts.hostname:
+        raise UnsafeDestination('URL de destino inválida (use http:// ou https://)')
+    try:
+        port = parts.port or (443 if parts.scheme == 'https' else 80)
+    except ValueError:
+        raise UnsafeDestination('Porta de destino inválida')
+
+    host = parts.hostname.lower()
+    try:
+        infos = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    except (socket.gaierror, UnicodeError):
+        raise UnsafeDestination(f'Host de destino não encontrado: {host}')
+
+    addresses = []
+    for info in infos:
+        address = ipaddress.ip_address(info[4][0].split('%')[0])
+        if (is_internal_address(address) and host not in hosts
+                and not any(address in network for network in networks)):
+            raise UnsafeDestination(f'Destino em endereço interno não permitido: {host} ({address})')
+        if address not in addresses:
+            addresses.append(address)
+    return addresses
+
+
+class PinnedHTTPConnection(http.client.HTTPConnection):
+    """HTTPConnection que abre o socket em ``pinned_address`` (IP já validado)"""
+
+    pinned_address = None
+
+    def connect(self):
+        if self.pinned_address is None:
+            return super().connect()
+        self.sock = socket.create_connection((self.pinned_address, self.port), self.timeout, self.source_address)
+        try:
+            self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        except OSError:
+            pass
+
+
+class PinnedHTTPSConnection(http.client.HTTPSConnection, PinnedHTTPConnection):
+    """Idem para HTTPS: o TLS (SNI e certificado) continua usando o nome do host"""
+
+
+class HostConnectionPool:
+    """Conexões HTTP keep-alive reaproveitadas por (esquema, host, porta).
+
+    Com ``allowlist`` (ver ``parse_allowlist``) cada conexão nova passa por
+    ``check_destination`` e é aberta no endereço validado.
+    """
+
+    def __init__(self, max_idle_per_host=10, timeout=10.0, allowlist=None):
+        self.max_idle_per_host = max_idle_per_host
+        self.timeout = timeout
+        self.allowlist = allowlist
+        self._idle = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def _connect(self, key, url):
+        scheme, host, port = key
+        if scheme == 'https':
+            conn = PinnedHTTPSConnection(host, port, timeout=self.timeout)
+        else:
+            conn = PinnedHTTPConnection(host, port, timeout=self.timeout)
+        if self.allowlist is not None:
+            conn.pinned_address = str(check_destination(url, self.allowlist)[0])
+        return conn
+
+    @staticmethod
+    def _is_stale(conn):
+        """Conexão ociosa já fechada pelo servidor (EOF pendente no socket)"""
+        if conn.sock is None:
+            return True
+        try:
+            return bool(select.select([conn.sock], [], [], 0)[0])
+        except (OSError, ValueError):
+            return True
+
+    def _checkout(self, key):
+        with self._lock:
+            idle = self._idle[key]
+            while idle:
+                conn = idle.pop()
+                if not self._is_stale(conn):
+                    return conn
+                conn.close()
+        return None
+
+    def request(self, method, url, body=None, headers=None):
+        """Enviar requisição e retornar o status HTTP (levanta em erro de rede)"""
+        parts = urlsplit(url)
+        scheme = parts.scheme or 'http'
+        key = (scheme, parts.hostname, parts.port or (443 if scheme == 'https' else 80))
+        path = parts.path or '/'
+        if parts.query:
+            path += '?' + parts.query
+
+        # Sem reenvio aqui: o destino pode ter recebido o corpo antes da falha
+        conn = self._checkout(key) or self._connect(key, url)
+        try:
+            conn.request(method, path, body=body, headers=headers or {})
+            response = conn.getresponse()
+            response.read()
+        except (http.client.HTTPException, OSError):
+            conn.close()
+            raise
+
+        if response.will_close:
+            conn.close()
+        else:
+            with self._lock:
+                if len(self._idle[key]) < self.max_idle_per_host:
+                    self._idle[key].append(conn)
+                    conn = None
+            if conn is not None:
+                conn.close()
+        return response.status
+
+    def close(self):
+        with self._lock:
+            for conns in self._idle.values():
+                for conn in conns:
+                    conn.close()
+            self._idle.clear()
+
+
+class DeliveryEngine:
+    """Despachante + pool de workers para as tentativas de entrega.
+
+    ``claim_fn(limit, in_flight)`` reivindica até ``limit`` tentativas
+    vencidas respeitando o limite de concorrência de cada destino
+    (``in_flight`` = {destination_id: entregas em andamento}) e retorna
+    jobs (dicts com ``attempt_id``, ``destination_id``, ``url``,
+    ``method``, ``headers``, ``body``). ``complete_fn(job, status, error)``
+    grava o resultado.
+    """
+
+    def __init__(self, claim_fn, complete_fn, workers=8, poll_interval=1.0, timeout=10.0, allowlist=None):
+        self.claim_fn = claim_fn
+        self.complete_fn = complete_fn
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.pool = HostConnectionPool(timeout=timeout, allowlist=allowlist)
+
+        self._in_flight = defaultdict(int)
+        self._busy = 0
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._executor = None
+        self._thread = None
+        self._pid = None
+
+    def start(self):
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._stopping = threading.Event()
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='delivery')
+            self._thread = threading.Thread(target=self._run, name='delivery-dispatcher', daemon=True)
+            self._thread.start()
+            atexit.register(self.stop)
+
+    def notify(self):
+        """Acordar o despachante (novas tentativas gravadas)"""
+        self._wake.set()
+
+    def stop(self, timeout=10.0):
+        self._stopping.set()
+        self._wake.set()
+        if self._executor is not None and self._pid == os.getpid():
+            self._executor.shutdown(wait=True)
+        self.pool.close()
+
+    def _run(self):
+        while not self._stopping.is_set():
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+            try:
+                self._dispatch()
+            except Exception as e:
+                print(f"Erro no despachante de entregas: {e}")
+
+    def _dispatch(self):
+        with self._lock:
+            free = self.workers - self._busy
+            in_flight = dict(self._in_flight)
+        if free <= 0:
+            return
+
+        for job in self.claim_fn(free, in_flight):
+            with self._lock:
+                self._busy += 1
+                self._in_flight[job['destination_id']] += 1
+            self._executor.submit(self._deliver, job)
+
+    def _deliver(self, job):
+        status = None
+        error = None
+        try:
+            status = self.pool.request(job['method'], job['url'], job['body'], job['headers'])
+        except Exception as e:
+            error = f'{type(e).__name__}: {e}'
+        try:
+            self.complete_fn(job, status, error)
+        except Exception as e:
+            print(f"Erro ao gravar resultado da entrega {job['attempt_id']}: {e}")
+        finally:
+            with self._lock:
+                self._busy -= 1
+                self._in_flight[job['destination_id']] -= 1
+                if self._in_flight[job['destination_id']] <= 0:
+                    del self._in_flight[job['destination_id']]
+            # Vaga liberada: buscar mais trabalho sem esperar o intervalo
+            self._wake.set()
@@ -0,0 +1,144 @@
+"""Extração de campos estruturados dos payloads na ingestão.
+
+O corpo JSON é interpretado uma única vez, antes de ser comprimido, e os
+campos configurados vão para colunas indexadas de WebhookLog. Assim os
+filtros da API de logs não precisam reabrir o corpo.
+
+Os caminhos usam ponto para chaves e ``[]`` para percorrer listas, por
+exemplo ``entry[].changes[].value.messages[].from``. Cada campo aceita uma
+lista de caminhos; vale o primeiro valor encontrado. Extratores extras
+(funções ``fn(dados) -> {campo: valor}``) podem ser registrados com
+``FieldExtractor.register``.
+"""
+import json
+
+# Campos padrão: notificações da WhatsApp Cloud API / Meta
+DEFAULT_PATHS = {
+    'event_object': ['object'],
+    'event_field': ['entry[].changes[].field'],
+    'event_type': [
+        'entry[].changes[].value.messages[].type',
+        'entry[].changes[].value.statuses[].status'
+    ],
+    'message_id': [
+        'entry[].changes[].value.messages[].id',
+        'entry[].changes[].value.statuses[].id'
+    ],
+    'sender': [
+        'entry[].changes[].value.messages[].from',
+        'entry[].changes[].value.statuses[].recipient_id'
+    ],
+    'error_code': [
+        'entry[].changes[].value.statuses[].errors[].code',
+        'entry[].changes[].value.errors[].code'
+    ]
+}
+
+# Tamanho máximo das colunas extraídas
+MAX_LENGTHS = {
+    'event_object': 50,
+    'event_field': 50,
+    'event_type': 50,
+    'message_id': 128,
+    'sender': 64,
+    'error_code': 20
+}
+
+
+def parse_path(path):
+    """'a.b[].c' -> [('a', False), ('b', True), ('c', False)]"""
+    steps = []
+    for part in path.split('.'):
+        is_list = part.endswith('[]')
+        steps.append((part[:-2] if is_list else part, is_list))
+    return steps
+
+
+def first_value(data, steps):
+    """Primeiro valor escalar encontrado seguindo ``steps`` (ou None)"""
+    if not steps:
+        if isinstance(data, (dict, list)) or data is None:
+            return None
+        return data
+
+    key, is_list = steps[0]
+    if not isinstance(data, dict) or key not in data:
+        return None
+    value = data[key]
+    if not is_list:
+        return first_value(value, steps[1:])
+    if not isinstance(value, list):
+        return None
+    for item in value:
+        found = first_value(item, steps[1:])
+        if found is not None:
+            return found
+    return None
+
+
+class FieldExtractor:
+    """Extrai os campos configurados de um corpo JSON.
+
+    ``paths`` mapeia nome da coluna -> lista de caminhos; ``max_bytes``
+    limita o tamanho dos corpos interpretados.
+    """
+
+    def __init__(self, paths=None, max_bytes=1024 * 1024):
+        self.paths = {name: [parse_path(path) for path in paths_] for name, paths_ in (paths or DEFAULT_PATHS).items()}
+        self.max_bytes = max_bytes
+        self._extra = []
+
+    @property
+    def fields(self):
+        return tuple(self.paths)
+
+    def register(self, fn):
+        """Adicionar um extrator ``fn(dados) -> {campo: valor}``"""
+        self._extra.append(fn)
+        return fn
+
+    def extract(self, body):
+        """Campos do corpo (todos os configurados, None quando ausentes)"""
+        values = dict.fromkeys(self.paths)
+        if not body or len(body) > self.max_bytes or body.lstrip()[:1] not in ('{', '['):
+            return values
+        try:
+            data = json.loads(body)
+        except ValueError:
+            return values
+
+        for name, paths in self.paths.items():
+            for steps in paths:
+                value = first_value(data, steps)
+                if value is not None:
+                    values[name] = value
+                    break
+        for fn in self._extra:
+            try:
+                values.update({k: v for k, v in (fn(data) or {}).items() if k in values and v is not None})
+            except Exception as e:
+                print(f"Erro no extrator de campos {fn.__name__}: {e}")
+
+        for name, value in values.items():
+            if value is not None:
+                value = str(value).lower() if isinstance(value, bool) else str(value)
+                values[name] = value[:MAX_LENGTHS.get(name, 255)]
+        return values
+
+
+def load_paths(raw):
+    """Caminhos padrão atualizados com LOG_FIELD_PATHS (JSON {campo: caminho ou [caminhos]})"""
+    paths = dict(DEFAULT_PATHS)
+    if not raw:
+        return paths
+    try:
+        overrides = json.loads(raw)
+    except ValueError as e:
+        print(f"⚠️  LOG_FIELD_PATHS inválido, usando o padrão: {e}")
+        return paths
+    for name, value in overrides.items():
+        if name not in DEFAULT_PATHS:
+            print(f"⚠️  LOG_FIELD_PATHS: campo desconhecido ignorado: {name}")
+            continue
+        paths[name] = [value] if isinstance(value, str) else list(value or [])
+    return paths
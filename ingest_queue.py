@@ -0,0 +1,199 @@
+"""Fila de ingestão write-behind para os logs de webhook.
+
+Em vez de fazer um commit por requisição, o endpoint público enfileira o log
+numa fila limitada em memória e uma thread de fundo grava os registros em
+lotes (por tamanho ou por tempo), com um único commit por lote.
+
+Modos de durabilidade:
+- ack_before_commit: responde assim que o log entra na fila (mais rápido,
+  logs ainda não gravados podem ser perdidos se o processo morrer).
+- ack_after_commit: a requisição espera o commit do lote que contém o seu
+  log (group commit) e recebe o log_id real. Um ``IngestTimeout`` nesse
+  modo não significa que o log foi descartado: o lote ainda pode ser
+  gravado depois da resposta, então o remetente deve reenviar com a mesma
+  chave de deduplicação.
+
+Se a gravação do lote falhar, cada log é regravado sozinho: só as linhas
+que falharem de novo são descartadas (e entregues a ``dead_letter``).
+"""
+import atexit
+import os
+import queue
+import threading
+import time
+
+ACK_BEFORE_COMMIT = 'ack_before_commit'
+ACK_AFTER_COMMIT = 'ack_after_commit'
+
+
+class QueueFull(Exception):
+    """A fila de ingestão está cheia (backpressure)"""
+
+
+class IngestTimeout(Exception):
+    """O lote não foi gravado dentro do tempo de espera (mas ainda pode ser)"""
+
+
+class PendingLog:
+    """Log enfileirado aguardando gravação"""
+
+    __slots__ = ('row', 'log_id', 'error', '_done')
+
+    def __init__(self, row, wait_for_commit):
+        self.row = row
+        self.log_id = None
+        self.error = None
+        self._done = threading.Event() if wait_for_commit else None
+
+    def resolve(self, log_id=None, error=None):
+        self.log_id = log_id
+        self.error = error
+        if self._done is not None:
+            self._done.set()
+
+    def wait(self, timeout):
+        """Esperar o commit do lote; retorna o log_id gravado"""
+        if self._done is None:
+            return None
+        if not self._done.wait(timeout):
+            raise IngestTimeout('Tempo esgotado aguardando gravação do log')
+        if self.error is not None:
+            raise self.error
+        return self.log_id
+
+
+class IngestQueue:
+    """Fila limitada com flusher em lote numa thread de fundo.
+
+    ``flush_fn(rows, return_ids)`` recebe a lista de dicts do lote e deve
+    gravá-los numa única transação, retornando a lista de ids quando
+    ``return_ids`` for verdadeiro. ``dead_letter(row, error)`` (opcional)
+    recebe cada log que não pôde ser gravado.
+    """
+
+    def __init__(self, flush_fn, batch_size=500, flush_interval=0.05,
+                 maxsize=10000, put_timeout=0.1, durability=ACK_BEFORE_COMMIT, dead_letter=None):
+        if durability not in (ACK_BEFORE_COMMIT, ACK_AFTER_COMMIT):
+            raise ValueError(f'Durabilidade inválida: {durability}')
+        self.flush_fn = flush_fn
+        self.dead_letter = dead_letter
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self.durability = durability
+        self.wait_for_commit = durability == ACK_AFTER_COMMIT
+
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._lock = threading.Lock()
+        # Serializa submit/stop: nada entra na fila depois da drenagem final
+        self._submit_lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._stopping = threading.Event()
+
+        # Contadores simples para diagnóstico
+        self.enqueued = 0
+        self.flushed = 0
+        self.dropped = 0
+        self.rejected = 0
+        self.retried = 0
+
+        atexit.register(self.stop)
+
+    @property
+    def depth(self):
+        return self._queue.qsize()
+
+    def _ensure_worker(self):
+        # Inicia a thread sob demanda (e de novo após fork do gunicorn)
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            if self._pid != os.getpid():
+                # Fila herdada do processo pai: descartar estado copiado no fork
+                self._queue = queue.Queue(maxsize=self._queue.maxsize)
+                self._stopping = threading.Event()
+                self._submit_lock = threading.Lock()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='ingest-flusher', daemon=True)
+            self._thread.start()
+
+    def submit(self, row):
+        """Enfileirar um log; levanta QueueFull se a fila continuar cheia ou estiver encerrando"""
+        self._ensure_worker()
+        pending = PendingLog(row, self.wait_for_commit)
+        with self._submit_lock:
+            if self._stopping.is_set():
+                self.rejected += 1
+                raise QueueFull('Fila de ingestão encerrando')
+            try:
+                self._queue.put(pending, timeout=self.put_timeout)
+            except queue.Full:
+                self.rejected += 1
+                raise QueueFull('Fila de ingestão cheia')
+            self.enqueued += 1
+        return pending
+
+    def _next_batch(self):
+        try:
+            first = self._queue.get(timeout=self.flush_interval)
+        except queue.Empty:
+            return []
+
+        batch = [first]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _flush(self, batch):
+        rows = [p.row for p in batch]
+        try:
+            ids = self.flush_fn(rows, self.wait_for_commit)
+        except Exception as e:
+            if len(batch) == 1:
+                self._drop(batch[0], e)
+                return
+            # Uma linha ruim não pode levar junto logs já confirmados com 2xx
+            print(f"Erro ao gravar lote de {len(batch)} logs, gravando um a um: {e}")
+            self.retried += len(batch)
+            for p in batch:
+                self._flush([p])
+            return
+
+        self.flushed += len(batch)
+        ids = ids or [None] * len(batch)
+        for p, log_id in zip(batch, ids):
+            p.resolve(log_id=log_id)
+
+    def _drop(self, pending, error):
+        self.dropped += 1
+        print(f"Erro ao gravar log do webhook {pending.row.get('webhook_id')}, descartado: {error}")
+        if self.dead_letter is not None:
+            try:
+                self.dead_letter(pending.row, error)
+            except Exception as e:
+                print(f"Erro ao guardar log descartado: {e}")
+        pending.resolve(error=error)
+
+    def _run(self):
+        while not (self._stopping.is_set() and self._queue.empty()):
+            batch = self._next_batch()
+            if batch:
+                self._flush(batch)
+
+    def stop(self, timeout=10.0):
+        """Drenar a fila e parar o flusher (chamado no desligamento do worker)"""
+        with self._submit_lock:
+            self._stopping.set()
+        thread = self._thread
+        if thread is not None and thread.is_alive() and self._pid == os.getpid():
+            thread.join(timeout)
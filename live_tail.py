@@ -0,0 +1,207 @@
+"""Acompanhamento ao vivo dos logs via Server-Sent Events.
+
+O caminho de ingestão publica cada log gravado num ``LogBroadcaster`` em
+memória, que repassa o evento a todos os painéis conectados ao mesmo
+processo, sem que cada cliente consulte o banco. Um buffer circular por
+webhook permite retomar a partir do último id recebido (Last-Event-ID)
+quando o navegador reconecta.
+
+Com vários workers do gunicorn, um log pode ser gravado num processo
+diferente daquele em que o painel está conectado. Para esses casos o
+broadcaster pode rodar um único poller por processo (não por cliente),
+que busca no banco os logs novos dos webhooks observados.
+
+Os logs do poller podem chegar depois de um log local com id maior, então
+cada painel acompanha a ordem de chegada no canal (número de sequência
+atribuído no append), não o id do log.
+
+O stream segura a conexão aberta: use workers com threads (gthread) ou
+assíncronos (gevent/eventlet) no gunicorn.
+"""
+import json
+import os
+import threading
+from collections import deque
+
+
+class TooManySubscribers(Exception):
+    """Limite de conexões de acompanhamento ao vivo atingido"""
+
+
+class _Channel:
+    __slots__ = ('events', 'ids', 'seq', 'subscribers', 'last_polled_id')
+
+    def __init__(self, buffer_size):
+        # (sequência, evento) em ordem de chegada
+        self.events = deque(maxlen=buffer_size)
+        self.ids = set()
+        self.seq = 0
+        self.subscribers = 0
+        self.last_polled_id = None
+
+
+class LogBroadcaster:
+    """Fan-out em processo dos logs recém-gravados, por webhook.
+
+    ``poll_fn(webhook_id, after_id)`` (opcional) retorna a lista de eventos
+    (dicts com ``id``) gravados por outros processos depois de ``after_id``.
+    """
+
+    def __init__(self, buffer_size=200, max_subscribers=100, heartbeat=15.0,
+                 poll_fn=None, poll_interval=2.0):
+        self.buffer_size = buffer_size
+        self.max_subscribers = max_subscribers
+        self.heartbeat = heartbeat
+        self.poll_fn = poll_fn
+        self.poll_interval = poll_interval
+
+        self._channels = {}
+        self._subscribers = 0
+        self._cond = threading.Condition()
+        self._poller = None
+        self._pid = None
+        self._stopping = threading.Event()
+
+    @property
+    def subscriber_count(self):
+        return self._subscribers
+
+    def has_subscribers(self, webhook_id):
+        channel = self._channels.get(webhook_id)
+        return channel is not None and channel.subscribers > 0
+
+    def _channel(self, webhook_id):
+        channel = self._channels.get(webhook_id)
+        if channel is None:
+            channel = self._channels[webhook_id] = _Channel(self.buffer_size)
+        return channel
+
+    def publish(self, webhook_id, event):
+        """Publicar um log gravado (dict com ``id``) para os inscritos"""
+        with self._cond:
+            channel = self._channels.get(webhook_id)
+            if channel is None or channel.subscribers == 0:
+                return
+            self._append(channel, event)
+            self._cond.notify_all()
+
+    def _append(self, channel, event):
+        if event['id'] in channel.ids:
+            return
+        if len(channel.events) == channel.events.maxlen:
+            channel.ids.discard(channel.events[0][1]['id'])
+        channel.seq += 1
+        channel.events.append((channel.seq, event))
+        channel.ids.add(event['id'])
+
+    def _ensure_poller(self):
+        if self.poll_fn is None or not self.poll_interval:
+            return
+        if self._poller is not None and self._pid == os.getpid() and self._poller.is_alive():
+            return
+        self._pid = os.getpid()
+        self._stopping = threading.Event()
+        self._poller = threading.Thread(target=self._poll_loop, name='live-tail-poller', daemon=True)
+        self._poller.start()
+
+    def stop(self):
+        self._stopping.set()
+
+    def _poll_loop(self):
+        while not self._stopping.wait(self.poll_interval):
+            with self._cond:
+                watched = [
+                    (webhook_id, channel.last_polled_id)
+                    for webhook_id, channel in self._channels.items()
+                    if channel.subscribers > 0
+                ]
+            for webhook_id, after_id in watched:
+                try:
+                    events = self.poll_fn(webhook_id, after_id)
+                except Exception as e:
+                    print(f"Erro ao buscar logs novos para o stream: {e}")
+                    continue
+                if not events:
+                    continue
+                with self._cond:
+                    channel = self._channel(webhook_id)
+                    for event in events:
+                        self._append(channel, event)
+                    channel.last_polled_id = max(event['id'] for event in events)
+                    self._cond.notify_all()
+
+    def stream(self, webhook_id, head_id, last_id=None, backlog=None):
+        """Gerador de mensagens SSE para um painel.
+
+        ``head_id`` é o id do log mais recente já gravado no banco; só
+        eventos posteriores a ele (ou a ``last_id`` na retomada) são
+        enviados. ``backlog`` é um iterável (consumido sob demanda, depois
+        da inscrição) com os eventos do banco entre ``last_id`` e
+        ``head_id``. Levanta TooManySubscribers na inscrição.
+        """
+        with self._cond:
+            if self._subscribers >= self.max_subscribers:
+                raise TooManySubscribers('Limite de conexões ao vivo atingido')
+            self._subscribers += 1
+            channel = self._channel(webhook_id)
+            channel.subscribers += 1
+            if channel.last_polled_id is None or channel.last_polled_id < head_id:
+                channel.last_polled_id = head_id
+        self._ensure_poller()
+        # Até ``floor`` o painel já tem tudo (página carregada + backlog)
+        floor = max(head_id, last_id or 0)
+        return _Stream(self._generate(channel, floor, backlog or []))
+
+    def _generate(self, channel, floor, backlog):
+        try:
+            yield "retry: 3000\n\n"
+            for event in backlog:
+                yield _format_event(event)
+
+            cursor = 0
+            while True:
+                with self._cond:
+                    pending = self._pending(channel, cursor, floor)
+                    if not pending:
+                        self._cond.wait(self.heartbeat)
+                        pending = self._pending(channel, cursor, floor)
+                if not pending:
+                    yield ": keepalive\n\n"
+                    continue
+                for seq, event in pending:
+                    cursor = seq
+                    yield _format_event(event)
+        finally:
+            with self._cond:
+                channel.subscribers -= 1
+                self._subscribers -= 1
+
+
+    @staticmethod
+    def _pending(channel, cursor, floor):
+        return [(seq, event) for seq, event in channel.events if seq > cursor and event['id'] > floor]
+
+
+class _Stream:
+    """Iterável com close(), para o servidor WSGI encerrar o gerador.
+
+    O gerador é iniciado já na criação para que o ``finally`` libere a vaga
+    mesmo se o cliente desconectar antes do primeiro evento.
+    """
+
+    def __init__(self, generator):
+        self._generator = generator
+        self._first = next(generator)
+
+    def __iter__(self):
+        if self._first is not None:
+            first, self._first = self._first, None
+            yield first
+        yield from self._generator
+
+    def close(self):
+        self._generator.close()
+
+
+def _format_event(event):
+    return f"id: {event['id']}\nevent: log\ndata: {json.dumps(event)}\n\n"
@@ -0,0 +1,119 @@
+"""Formato de armazenamento compacto dos logs de webhook.
+
+- Corpos acima de um limite são comprimidos (zlib, ou zstd se o pacote
+  ``zstandard`` estiver instalado) e o codec fica gravado em cada linha.
+- Conjuntos de cabeçalhos são internados numa tabela endereçada pelo hash
+  SHA-256 do JSON, já que quase não mudam entre entregas do mesmo provedor.
+  Só os cabeçalhos estáveis entram no conjunto: os que mudam a cada entrega
+  (Content-Length, assinaturas, cookies, ids de requisição/trace...) ficam
+  na própria linha do log, senão cada entrega criaria um conjunto novo.
+- Corpos muito grandes ficam em disco (codec ``file``, ver payload_store.py);
+  a linha guarda só a referência em ``body_ref``.
+"""
+import functools
+import hashlib
+import json
+import zlib
+
+CODEC_ZLIB = 'zlib'
+CODEC_ZSTD = 'zstd'
+CODEC_FILE = 'file'
+
+
+@functools.lru_cache(maxsize=None)
+def _zstandard():
+    """Módulo zstandard, importado só quando o codec zstd é usado (None se ausente)"""
+    try:
+        import zstandard
+    except ImportError:
+        return None
+    return zstandard
+
+
+def available_codec(preferred):
+    """Codec efetivo: zstd só se o pacote estiver disponível"""
+    if preferred == CODEC_ZSTD and _zstandard() is not None:
+        return CODEC_ZSTD
+    return CODEC_ZLIB
+
+
+def compress(data, codec):
+    if codec == CODEC_ZSTD:
+        return _zstandard().ZstdCompressor(level=3).compress(data)
+    return zlib.compress(data, 6)
+
+
+def decompress(data, codec):
+    if codec == CODEC_ZSTD:
+        zstandard = _zstandard()
+        if zstandard is None:
+            raise RuntimeError('Pacote zstandard necessário para ler este log')
+        return zstandard.ZstdDecompressor().decompress(data)
+    if codec == CODEC_ZLIB:
+        return zlib.decompress(data)
+    raise ValueError(f'Codec desconhecido: {codec}')
+
+
+def encode_body(body, threshold, codec):
+    """Retorna (body, body_blob, body_codec, body_size) para gravar na linha"""
+    if body is None:
+        return None, None, None, 0
+
+    raw = body.encode('utf-8')
+    if threshold is None or len(raw) < threshold:
+        return body, None, None, len(raw)
+
+    compressed = compress(raw, codec)
+    if len(compressed) >= len(raw):
+        # Não compensa (dados já comprimidos/aleatórios)
+        return body, None, None, len(raw)
+    return None, compressed, codec, len(raw)
+
+
+def decode_body(body, body_blob, body_codec):
+    """Texto original do corpo, descomprimindo se necessário.
+
+    Corpos em disco (``CODEC_FILE``) não passam por aqui: retorna None.
+    """
+    if body_codec and body_blob is not None:
+        return decompress(body_blob, body_codec).decode('utf-8')
+    return body
+
+
+# Cabeçalhos que mudam a cada entrega (nomes em minúsculas)
+VOLATILE_HEADERS = frozenset({
+    'authorization', 'baggage', 'cf-ray', 'content-length', 'cookie', 'date',
+    'sentry-trace', 'traceparent', 'tracestate', 'x-amzn-trace-id',
+    'x-cloud-trace-context', 'x-correlation-id', 'x-forwarded-for',
+    'x-forwarded-port', 'x-real-ip'
+})
+# ...e os que contêm estes trechos (X-Hub-Signature-256, X-GitHub-Delivery,
+# X-Request-Id, X-Slack-Request-Timestamp, Idempotency-Key...)
+VOLATILE_MARKERS = ('signature', 'delivery', 'request-id', 'timestamp', 'nonce', 'idempotency', 'trace-id')
+
+
+def is_volatile_header(name):
+    name = name.lower()
+    return name in VOLATILE_HEADERS or any(marker in name for marker in VOLATILE_MARKERS)
+
+
+def split_headers(headers):
+    """(estáveis, voláteis): dicts com os cabeçalhos internáveis e os da linha"""
+    stable = {}
+    volatile = {}
+    for name, value in headers.items():
+        (volatile if is_volatile_header(name) else stable)[name] = value
+    return stable, volatile
+
+
+def merge_headers(stable_json, inline_json):
+    """JSON dos cabeçalhos completos a partir do conjunto internado e da linha"""
+    if stable_json is None or inline_json is None:
+        return stable_json if inline_json is None else inline_json
+    headers = json.loads(stable_json)
+    headers.update(json.loads(inline_json))
+    return json.dumps(headers, sort_keys=True)
+
+
+def header_hash(headers_json):
+    return hashlib.sha256(headers_json.encode('utf-8')).hexdigest()
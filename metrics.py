@@ -0,0 +1,314 @@
+"""Métricas no formato texto do Prometheus, seguras com vários processos.
+
+Cada processo acumula contadores, histogramas e gauges em memória e grava
+periodicamente um instantâneo em ``<diretório>/<pid>.json``. O endpoint
+/metrics soma os contadores e histogramas de todos os workers do gunicorn;
+gauges são combinados conforme o ``aggregate`` de cada um (máximo por
+padrão, ``SUM`` só para valores que somam entre processos, como a
+profundidade da fila).
+
+Contadores e histogramas de workers encerrados são somados a
+``<diretório>/archive.json`` e o arquivo do PID é apagado (gauges deles são
+descartados). O mesmo vale quando um PID é reutilizado: o worker novo
+arquiva o arquivo do antigo antes de gravar o seu, então os totais nunca
+diminuem.
+"""
+import atexit
+import fcntl
+import json
+import os
+import threading
+from collections import defaultdict
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+ARCHIVE_FILE = 'archive.json'
+
+COUNTER = 'counter'
+GAUGE = 'gauge'
+HISTOGRAM = 'histogram'
+
+# Combinação de gauges entre processos
+SUM = 'sum'
+MAX = 'max'
+MIN = 'min'
+GAUGE_AGGREGATES = {SUM: sum, MAX: max, MIN: min}
+
+
+def _key(name, labels):
+    return (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class MetricsRegistry:
+    """Registro de métricas do processo.
+
+    ``add_collector(fn)`` registra uma função chamada a cada instantâneo que
+    retorna [(tipo, nome, labels, valor)] para valores mantidos por outros
+    componentes (profundidade da fila, acertos de cache...).
+    """
+
+    def __init__(self, directory=None, sync_interval=5.0):
+        self.directory = directory
+        self.sync_interval = sync_interval
+        self._meta = {}
+        self._counters = defaultdict(float)
+        self._histograms = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._synced_pid = None
+        self._stopping = threading.Event()
+
+    def describe(self, name, kind, help_text, buckets=DEFAULT_BUCKETS, aggregate=MAX):
+        if aggregate not in GAUGE_AGGREGATES:
+            raise ValueError(f'Agregação inválida: {aggregate}')
+        self._meta[name] = {
+            'type': kind, 'help': help_text,
+            'buckets': list(buckets) if kind == HISTOGRAM else None,
+            'aggregate': aggregate if kind == GAUGE else None
+        }
+
+    def add_collector(self, fn):
+        self._collectors.append(fn)
+
+    def inc(self, name, value=1.0, **labels):
+        with self._lock:
+            self._counters[_key(name, labels)] += value
+
+    def observe(self, name, value, **labels):
+        buckets = self._meta[name]['buckets']
+        key = _key(name, labels)
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = self._histograms[key] = [0] * len(buckets) + [0.0, 0]
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    hist[i] += 1
+                    break
+            hist[-2] += value
+            hist[-1] += 1
+
+    # INSTANTÂNEOS
+    def snapshot(self):
+        counters = []
+        gauges = []
+        with self._lock:
+            for (name, labels), value in self._counters.items():
+                counters.append([name, dict(labels), value])
+            histograms = [[name, dict(labels), list(hist)] for (name, labels), hist in self._histograms.items()]
+
+        for collector in self._collectors:
+            try:
+                for kind, name, labels, value in collector():
+                    target = counters if kind == COUNTER else gauges
+                    target.append([name, {k: str(v) for k, v in labels.items()}, value])
+            except Exception as e:
+                print(f"Erro ao coletar métricas: {e}")
+
+        return {'pid': os.getpid(), 'counters': counters, 'gauges': gauges, 'histograms': histograms}
+
+    def sync(self):
+        """Gravar o instantâneo deste processo no diretório compartilhado"""
+        if not self.directory:
+            return
+        path = os.path.join(self.directory, f'{os.getpid()}.json')
+        tmp_path = path + '.tmp'
+        try:
+            if self._synced_pid != os.getpid():
+                # Arquivo com o nosso PID só pode ser de um processo que já morreu
+                os.makedirs(self.directory, exist_ok=True)
+                self._archive(os.getpid())
+                self._synced_pid = os.getpid()
+            with open(tmp_path, 'w') as f:
+                json.dump(self.snapshot(), f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Erro ao gravar métricas: {e}")
+
+    def start(self):
+        """Iniciar a gravação periódica (uma thread por processo)"""
+        if not self.directory:
+            return
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            os.makedirs(self.directory, exist_ok=True)
+            self._pid = os.getpid()
+            self._stopping = threading.Event()
+            self._thread = threading.Thread(target=self._run, name='metrics-sync', daemon=True)
+            self._thread.start()
+            atexit.register(self.sync)
+
+    def stop(self):
+        self._stopping.set()
+        atexit.unregister(self.sync)
+
+    def _run(self):
+        while not self._stopping.wait(self.sync_interval):
+            self.sync()
+
+    # ARQUIVO DE PROCESSOS ENCERRADOS
+    def _archive(self, pid):
+        """Somar contadores e histogramas de ``<pid>.json`` ao arquivo e apagá-lo"""
+        path = os.path.join(self.directory, f'{pid}.json')
+        archive_path = os.path.join(self.directory, ARCHIVE_FILE)
+        with open(os.path.join(self.directory, 'archive.lock'), 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                # Outro processo pode ter arquivado enquanto esperávamos o lock
+                try:
+                    with open(path) as f:
+                        snapshot = json.load(f)
+                except FileNotFoundError:
+                    return
+                except ValueError:
+                    os.remove(path)
+                    return
+                archive = _read_json(archive_path) or {'pid': None, 'counters': [], 'gauges': [], 'histograms': []}
+                archive = _merge_snapshots([archive, snapshot])
+                tmp_path = archive_path + '.tmp'
+                with open(tmp_path, 'w') as f:
+                    json.dump(archive, f)
+                os.replace(tmp_path, archive_path)
+                os.remove(path)
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _load_snapshots(self):
+        snapshots = [self.snapshot()]
+        if not self.directory or not os.path.isdir(self.directory):
+            return snapshots
+        for filename in os.listdir(self.directory):
+            if not filename.endswith('.json'):
+                continue
+            try:
+                pid = int(filename[:-5])
+            except ValueError:
+                continue
+            if pid == os.getpid():
+                continue
+            if not _pid_alive(pid):
+                try:
+                    self._archive(pid)
+                except OSError as e:
+                    print(f"Erro ao arquivar métricas do processo {pid}: {e}")
+                continue
+            snapshot = _read_json(os.path.join(self.directory, filename))
+            if snapshot is not None:
+                snapshots.append(snapshot)
+        # Lido por último: um arquivo arquivado neste meio-tempo aparece aqui
+        archive = _read_json(os.path.join(self.directory, ARCHIVE_FILE))
+        if archive is not None:
+            snapshots.append(archive)
+        return snapshots
+
+    # EXPOSIÇÃO
+    def render(self):
+        """Texto no formato de exposição do Prometheus (todos os processos)"""
+        values = defaultdict(float)
+        gauges = defaultdict(list)
+        histograms = {}
+        for snapshot in self._load_snapshots():
+            for name, labels, value in snapshot['counters']:
+                values[_key(name, labels)] += value
+            for name, labels, value in snapshot['gauges']:
+                gauges[_key(name, labels)].append(value)
+            for name, labels, hist in snapshot['histograms']:
+                key = _key(name, labels)
+                if key not in histograms:
+                    histograms[key] = list(hist)
+                elif len(histograms[key]) == len(hist):
+                    histograms[key] = [a + b for a, b in zip(histograms[key], hist)]
+
+        for key, samples in gauges.items():
+            aggregate = self._meta.get(key[0], {}).get('aggregate') or MAX
+            values[key] = GAUGE_AGGREGATES[aggregate](samples)
+
+        by_name = defaultdict(list)
+        for (name, labels), value in values.items():
+            by_name[name].append((labels, value))
+        for (name, labels), hist in histograms.items():
+            by_name[name].append((labels, hist))
+
+        lines = []
+        for name in sorted(by_name):
+            meta = self._meta.get(name, {'type': 'untyped', 'help': name, 'buckets': None})
+            lines.append(f"# HELP {name} {meta['help']}")
+            lines.append(f"# TYPE {name} {meta['type']}")
+            for labels, value in sorted(by_name[name]):
+                if meta['type'] == HISTOGRAM:
+                    lines.extend(_render_histogram(name, labels, value, meta['buckets']))
+                else:
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+
+def _read_json(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _merge_snapshots(snapshots):
+    """Somar contadores e histogramas de vários instantâneos (sem gauges)"""
+    counters = defaultdict(float)
+    histograms = {}
+    for snapshot in snapshots:
+        for name, labels, value in snapshot['counters']:
+            counters[_key(name, labels)] += value
+        for name, labels, hist in snapshot['histograms']:
+            key = _key(name, labels)
+            if key not in histograms:
+                histograms[key] = list(hist)
+            elif len(histograms[key]) == len(hist):
+                histograms[key] = [a + b for a, b in zip(histograms[key], hist)]
+    return {
+        'pid': None,
+        'counters': [[name, dict(labels), value] for (name, labels), value in counters.items()],
+        'gauges': [],
+        'histograms': [[name, dict(labels), hist] for (name, labels), hist in histograms.items()],
+    }
+
+
+def _render_histogram(name, labels, hist, buckets):
+    lines = []
+    cumulative = 0
+    for bound, count in zip(buckets, hist):
+        cumulative += count
+        lines.append(f"{name}_bucket{_format_labels(labels + (('le', _format_value(bound)),))} {cumulative}")
+    lines.append(f"{name}_bucket{_format_labels(labels + (('le', '+Inf'),))} {hist[-1]}")
+    lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(hist[-2])}")
+    lines.append(f"{name}_count{_format_labels(labels)} {hist[-1]}")
+    return lines
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    parts = []
+    for key, value in labels:
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        parts.append(f'{key}="{value}"')
+    return '{' + ','.join(parts) + '}'
+
+
+def _format_value(value):
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
@@ -0,0 +1,112 @@
+"""Particionamento mensal da tabela de logs (MySQL).
+
+A tabela é particionada por RANGE em TO_DAYS(timestamp), uma partição por
+mês mais ``pmax``; a retenção descarta meses inteiros com DROP PARTITION.
+Só é importado quando o banco é MySQL (ver app.py e compact_logs.py).
+"""
+from datetime import datetime
+
+from sqlalchemy import text
+
+
+def _month_start(dt, offset=0):
+    month = dt.month - 1 + offset
+    return datetime(dt.year + month // 12, month % 12 + 1, 1)
+
+
+def _partition_name(month_start):
+    return f"p{month_start.strftime('%Y%m')}"
+
+
+def list_partitions(conn, table):
+    """Partições existentes como [(nome, descrição)], vazio se não particionada"""
+    rows = conn.execute(text(
+        "SELECT PARTITION_NAME, PARTITION_DESCRIPTION FROM information_schema.PARTITIONS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table AND PARTITION_NAME IS NOT NULL "
+        "ORDER BY PARTITION_ORDINAL_POSITION"
+    ), {'table': table}).all()
+    return [(row[0], row[1]) for row in rows]
+
+
+def is_partitioned(engine, table):
+    with engine.connect() as conn:
+        return bool(list_partitions(conn, table))
+
+
+def partition_table(conn, table, months_back=12, months_ahead=3):
+    """Converter a tabela de logs para partições mensais.
+
+    Partições MySQL exigem que a chave de partição esteja na chave primária
+    e não suportam chaves estrangeiras, por isso a FK para webhook é removida
+    e a PK passa a ser (id, timestamp). Índices únicos (deduplicação) também
+    são removidos; a deduplicação passa a depender só da consulta prévia.
+    Operação pesada: rodar em janela de manutenção.
+    """
+    if list_partitions(conn, table):
+        return False
+
+    fks = conn.execute(text(
+        "SELECT CONSTRAINT_NAME FROM information_schema.TABLE_CONSTRAINTS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table AND CONSTRAINT_TYPE = 'FOREIGN KEY'"
+    ), {'table': table}).scalars().all()
+    for fk in fks:
+        conn.execute(text(f"ALTER TABLE {table} DROP FOREIGN KEY {fk}"))
+
+    unique_indexes = conn.execute(text(
+        "SELECT DISTINCT INDEX_NAME FROM information_schema.STATISTICS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table AND NON_UNIQUE = 0 AND INDEX_NAME <> 'PRIMARY'"
+    ), {'table': table}).scalars().all()
+    for index in unique_indexes:
+        conn.execute(text(f"ALTER TABLE {table} DROP INDEX {index}"))
+
+    now = datetime.utcnow()
+    parts = []
+    for offset in range(-months_back, months_ahead + 1):
+        start = _month_start(now, offset)
+        end = _month_start(start, 1)
+        parts.append(f"PARTITION {_partition_name(start)} VALUES LESS THAN (TO_DAYS('{end:%Y-%m-%d}'))")
+    parts.append("PARTITION pmax VALUES LESS THAN MAXVALUE")
+
+    conn.execute(text(f"ALTER TABLE {table} MODIFY timestamp DATETIME NOT NULL"))
+    conn.execute(text(f"ALTER TABLE {table} DROP PRIMARY KEY, ADD PRIMARY KEY (id, timestamp)"))
+    conn.execute(text(
+        f"ALTER TABLE {table} PARTITION BY RANGE (TO_DAYS(timestamp)) ({', '.join(parts)})"
+    ))
+    return True
+
+
+def ensure_future_partitions(conn, table, months_ahead=3):
+    """Criar partições para os próximos meses dividindo pmax"""
+    existing = {name for name, _ in list_partitions(conn, table)}
+    if 'pmax' not in existing:
+        return 0
+
+    now = datetime.utcnow()
+    created = 0
+    for offset in range(0, months_ahead + 1):
+        start = _month_start(now, offset)
+        name = _partition_name(start)
+        if name in existing:
+            continue
+        end = _month_start(start, 1)
+        conn.execute(text(
+            f"ALTER TABLE {table} REORGANIZE PARTITION pmax INTO ("
+            f"PARTITION {name} VALUES LESS THAN (TO_DAYS('{end:%Y-%m-%d}')), "
+            f"PARTITION pmax VALUES LESS THAN MAXVALUE)"
+        ))
+        created += 1
+    return created
+
+
+def drop_partitions_before(conn, table, cutoff):
+    """Descartar partições mensais inteiramente anteriores a ``cutoff``"""
+    dropped = []
+    for name, _ in list_partitions(conn, table):
+        if name == 'pmax':
+            continue
+        month_end = _month_start(datetime.strptime(name[1:], '%Y%m'), 1)
+        if month_end <= cutoff:
+            dropped.append(name)
+    if dropped:
+        conn.execute(text(f"ALTER TABLE {table} DROP PARTITION {', '.join(dropped)}"))
+    return dropped
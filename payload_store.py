@@ -0,0 +1,225 @@
+"""Leitura incremental dos corpos recebidos e armazenamento dos grandes em disco.
+
+- ``BodyReader``/``read_body``: lê o corpo da requisição em blocos, recusando
+  (413) assim que o limite é ultrapassado. Corpos até o limiar de transbordo
+  ficam em memória; acima dele seguem direto para um arquivo temporário.
+  ``BodyReader`` recebe os blocos um a um (servidor assíncrono) e
+  ``read_body`` o alimenta a partir de um fluxo WSGI.
+- ``PayloadStore``: arquivos endereçados pelo SHA-256 do conteúdo
+  (``<raiz>/ab/abcdef...``), de modo que reenvios do mesmo payload ocupam um
+  único arquivo. O log guarda só o hash (``body_ref``).
+- Leitura por ``mmap``: os trechos pedidos via Range são servidos direto das
+  páginas do arquivo, sem carregar o corpo inteiro na memória do worker.
+"""
+import hashlib
+import mmap
+import os
+import tempfile
+import time
+from collections import namedtuple
+
+CHUNK_SIZE = 64 * 1024
+
+# Corpo gravado em disco: hash (nome do arquivo) e tamanho em bytes
+SpilledBody = namedtuple('SpilledBody', ['digest', 'size'])
+
+
+class PayloadTooLarge(Exception):
+    """Corpo acima do limite configurado"""
+
+    def __init__(self, limit):
+        super().__init__(f'Corpo maior que o limite de {limit} bytes')
+        self.limit = limit
+
+
+class PayloadStore:
+    """Corpos grandes em arquivos endereçados pelo conteúdo"""
+
+    def __init__(self, root):
+        self.root = root
+        self.tmp_dir = os.path.join(root, 'tmp')
+
+    def path(self, digest):
+        if len(digest) != 64 or not all(c in '0123456789abcdef' for c in digest):
+            raise ValueError(f'Referência de corpo inválida: {digest!r}')
+        return os.path.join(self.root, digest[:2], digest)
+
+    def exists(self, digest):
+        return os.path.exists(self.path(digest))
+
+    def open_temp(self):
+        """(arquivo, caminho) temporário para um corpo em transbordo"""
+        os.makedirs(self.tmp_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.tmp_dir, suffix='.part')
+        return os.fdopen(fd, 'wb'), tmp_path
+
+    def commit(self, tmp_path, digest):
+        """Mover o temporário para o endereço do conteúdo"""
+        final_path = self.path(digest)
+        if os.path.exists(final_path):
+            # Mesmo conteúdo já gravado: renovar a data para o GC
+            os.utime(final_path)
+            os.unlink(tmp_path)
+        else:
+            os.makedirs(os.path.dirname(final_path), exist_ok=True)
+            os.replace(tmp_path, final_path)
+
+    def open(self, digest):
+        """(mmap, tamanho) do corpo; o chamador fecha o mmap"""
+        with open(self.path(digest), 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            if size == 0:
+                return b'', 0
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ), size
+
+    def read(self, digest, limit=None):
+        """Conteúdo (ou os primeiros ``limit`` bytes) do corpo"""
+        with open(self.path(digest), 'rb') as f:
+            return f.read() if limit is None else f.read(limit)
+
+    def iter_files(self):
+        """(hash, caminho, mtime) de todos os corpos gravados"""
+        if not os.path.isdir(self.root):
+            return
+        for name in os.listdir(self.root):
+            directory = os.path.join(self.root, name)
+            if len(name) != 2 or not os.path.isdir(directory):
+                continue
+            for digest in os.listdir(directory):
+                file_path = os.path.join(directory, digest)
+                try:
+                    yield digest, file_path, os.path.getmtime(file_path)
+                except OSError:
+                    continue
+
+    def gc(self, referenced_fn, grace=3600.0):
+        """Excluir arquivos que nenhum log referencia; retorna quantos.
+
+        ``referenced_fn(digests)`` devolve o subconjunto ainda em uso. Arquivos
+        recentes (``grace`` segundos) são mantidos: o log pode estar na fila.
+        """
+        cutoff = time.time() - grace
+        candidates = {}
+        removed = 0
+        for digest, file_path, mtime in self.iter_files():
+            if mtime < cutoff:
+                candidates[digest] = file_path
+            if len(candidates) >= 500:
+                removed += self._remove_unreferenced(candidates, referenced_fn)
+                candidates = {}
+        if candidates:
+            removed += self._remove_unreferenced(candidates, referenced_fn)
+        # Temporários abandonados (worker interrompido no meio da leitura)
+        for name in os.listdir(self.tmp_dir) if os.path.isdir(self.tmp_dir) else ():
+            file_path = os.path.join(self.tmp_dir, name)
+            try:
+                if os.path.getmtime(file_path) < cutoff:
+                    os.unlink(file_path)
+            except OSError:
+                continue
+        return removed
+
+    def _remove_unreferenced(self, candidates, referenced_fn):
+        in_use = set(referenced_fn(list(candidates)))
+        removed = 0
+        for digest, file_path in candidates.items():
+            if digest in in_use:
+                continue
+            try:
+                os.unlink(file_path)
+                removed += 1
+            except OSError:
+                continue
+        return removed
+
+
+class BodyReader:
+    """Acumula os blocos de um corpo: ``bytes`` ou ``SpilledBody`` no fim.
+
+    ``limit`` e ``spill_threshold`` em bytes (0 = desligado); ``feed`` levanta
+    ``PayloadTooLarge`` assim que o limite é ultrapassado (e descarta o
+    temporário). Quem desistir no meio deve chamar ``abort``.
+    """
+
+    def __init__(self, limit=0, spill_threshold=0, store=None):
+        self.limit = limit
+        self.spill_threshold = spill_threshold
+        self.store = store
+        self.size = 0
+        self._chunks = []
+        self._digest = hashlib.sha256()
+        self._file = None
+        self._tmp_path = None
+
+    @property
+    def spilling(self):
+        return self._file is not None
+
+    def feed(self, chunk):
+        self.size += len(chunk)
+        if self.limit and self.size > self.limit:
+            self.abort()
+            raise PayloadTooLarge(self.limit)
+        self._digest.update(chunk)
+        if self._file is not None:
+            self._file.write(chunk)
+            return
+        self._chunks.append(chunk)
+        if self.store is not None and self.spill_threshold and self.size > self.spill_threshold:
+            self._file, self._tmp_path = self.store.open_temp()
+            try:
+                for buffered in self._chunks:
+                    self._file.write(buffered)
+            except BaseException:
+                self.abort()
+                raise
+            self._chunks = []
+
+    def finish(self):
+        if self._file is None:
+            return b''.join(self._chunks)
+        try:
+            self._file.close()
+            self._file = None
+            digest = self._digest.hexdigest()
+            self.store.commit(self._tmp_path, digest)
+            self._tmp_path = None
+            return SpilledBody(digest, self.size)
+        except BaseException:
+            self.abort()
+            raise
+
+    def abort(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self._tmp_path is not None:
+            try:
+                os.unlink(self._tmp_path)
+            except OSError:
+                pass
+            self._tmp_path = None
+        self._chunks = []
+
+
+def read_body(stream, limit=0, spill_threshold=0, store=None, chunk_size=CHUNK_SIZE):
+    """Ler o corpo de um fluxo em blocos: ``bytes`` ou ``SpilledBody`` se passar do limiar"""
+    reader = BodyReader(limit, spill_threshold, store)
+    try:
+        while True:
+            chunk = stream.read(chunk_size)
+            if not chunk:
+                return reader.finish()
+            reader.feed(chunk)
+    except BaseException:
+        reader.abort()
+        raise
+
+
+def iter_range(view, start, stop, chunk_size=CHUNK_SIZE):
+    """Blocos de ``view[start:stop]`` (bytes ou mmap) sem copiar o todo"""
+    position = start
+    while position < stop:
+        end = min(position + chunk_size, stop)
+        yield bytes(view[position:end])
+        position = end
@@ -0,0 +1,132 @@
+"""Limite de taxa (token bucket) e descarte de carga no endpoint público.
+
+Os baldes ficam num armazenamento compartilhado entre os workers do
+gunicorn: por padrão um arquivo SQLite local em instance/ (sem fsync, já
+que o estado é descartável); ``MemoryBucketStore`` serve para um único
+processo.
+"""
+import os
+import sqlite3
+import threading
+import time
+
+
+def refill(tokens, updated, rate, burst, now):
+    """Aplicar o token bucket; retorna (tokens restantes, espera em segundos ou None)"""
+    tokens = min(float(burst), tokens + max(0.0, now - updated) * rate)
+    if tokens >= 1.0:
+        return tokens - 1.0, None
+    return tokens, (1.0 - tokens) / rate
+
+
+class MemoryBucketStore:
+    """Baldes em memória do processo (não compartilhados)"""
+
+    def __init__(self, maxsize=100000):
+        self.maxsize = maxsize
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def take(self, key, rate, burst, now):
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (float(burst), now))
+            tokens, retry_after = refill(tokens, updated, rate, burst, now)
+            if len(self._buckets) >= self.maxsize and key not in self._buckets:
+                self._buckets.clear()
+            self._buckets[key] = (tokens, now)
+        return retry_after
+
+
+class SQLiteBucketStore:
+    """Baldes num arquivo SQLite compartilhado entre processos"""
+
+    PRUNE_EVERY = 10000
+    IDLE_SECONDS = 3600
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._calls = 0
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        conn = sqlite3.connect(self.path, timeout=1.0, isolation_level=None, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=OFF')
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS buckets ('
+            'key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)'
+        )
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    def take(self, key, rate, burst, now):
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute('SELECT tokens, updated FROM buckets WHERE key = ?', (key,)).fetchone()
+            tokens, updated = row if row else (float(burst), now)
+            tokens, retry_after = refill(tokens, updated, rate, burst, now)
+            conn.execute(
+                'INSERT INTO buckets (key, tokens, updated) VALUES (?, ?, ?) '
+                'ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated',
+                (key, tokens, now)
+            )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+        self._calls += 1
+        if self._calls % self.PRUNE_EVERY == 0:
+            conn.execute('DELETE FROM buckets WHERE updated < ?', (now - self.IDLE_SECONDS,))
+        return retry_after
+
+
+class RateLimiter:
+    """Verificação de limites; ``check`` retorna a espera em segundos ou None"""
+
+    def __init__(self, store):
+        self.store = store
+        self.limited = 0
+
+    def check(self, key, rate, burst):
+        if not rate or rate <= 0:
+            return None
+        try:
+            retry_after = self.store.take(key, rate, max(1, burst or 1), time.time())
+        except Exception as e:
+            # Falha do armazenamento não pode derrubar a ingestão
+            print(f"Erro no limitador de taxa: {e}")
+            return None
+        if retry_after is not None:
+            self.limited += 1
+        return retry_after
+
+
+class LoadShedder:
+    """Decide quando passar a aceitar requisições sem gravar o corpo.
+
+    Ativa quando a fila de ingestão passa de ``max_queue_depth`` ou quando a
+    média móvel (EWMA) da latência de gravação passa de ``max_db_latency``.
+    """
+
+    def __init__(self, max_queue_depth=0, max_db_latency=0.0, alpha=0.2):
+        self.max_queue_depth = max_queue_depth
+        self.max_db_latency = max_db_latency
+        self.alpha = alpha
+        self.db_latency = 0.0
+        self.shed = 0
+
+    def observe_db_latency(self, seconds):
+        self.db_latency += self.alpha * (seconds - self.db_latency)
+
+    def should_shed(self, queue_depth=0):
+        if self.max_queue_depth and queue_depth >= self.max_queue_depth:
+            return True
+        if self.max_db_latency and self.db_latency >= self.max_db_latency:
+            return True
+        return False
@@ -0,0 +1,255 @@
+"""Reenvio de tráfego histórico (replay) para uma URL de teste.
+
+Os logs selecionados são lidos em streaming e reenviados com método,
+cabeçalhos e corpo originais. O ritmo segue os intervalos originais
+divididos por ``speed`` (1 = tempo real, N = N vezes mais rápido, 0 = o mais
+rápido possível), com no máximo ``concurrency`` requisições em andamento.
+Ao final, ``ReplayStats.report()`` resume vazão, erros e latências.
+
+``StubServer`` é um servidor HTTP local mínimo para ensaiar um replay sem
+atingir um consumidor real.
+"""
+import random
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import delivery
+
+RUNNING = 'running'
+FINISHED = 'finished'
+CANCELLED = 'cancelled'
+FAILED = 'failed'
+
+# Amostra máxima de latências guardadas para os percentis
+LATENCY_SAMPLE = 100000
+
+
+def percentile(values, fraction):
+    """Percentil por posição numa lista já ordenada"""
+    if not values:
+        return None
+    index = min(len(values) - 1, max(0, int(round(fraction * (len(values) - 1)))))
+    return values[index]
+
+
+class ReplayStats:
+    """Contadores e latências do replay (seguro entre threads)"""
+
+    def __init__(self):
+        self.started = time.time()
+        self.finished = None
+        self.sent = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.statuses = Counter()
+        self.errors = Counter()
+        self.max_lag = 0.0
+        self._latencies = []
+        self._seen = 0
+        self._lock = threading.Lock()
+
+    def record(self, status, latency, error=None):
+        with self._lock:
+            self.sent += 1
+            if error is not None:
+                self.failed += 1
+                self.errors[error] += 1
+            else:
+                self.statuses[f'{status // 100}xx'] += 1
+                if 200 <= status < 300:
+                    self.succeeded += 1
+                else:
+                    self.failed += 1
+            # Amostragem reservatório: memória constante em replays longos
+            self._seen += 1
+            if len(self._latencies) < LATENCY_SAMPLE:
+                self._latencies.append(latency)
+            else:
+                slot = random.randrange(self._seen)
+                if slot < LATENCY_SAMPLE:
+                    self._latencies[slot] = latency
+
+    def lag(self, seconds):
+        with self._lock:
+            self.max_lag = max(self.max_lag, seconds)
+
+    def report(self):
+        with self._lock:
+            latencies = sorted(self._latencies)
+            elapsed = (self.finished or time.time()) - self.started
+            return {
+                'sent': self.sent,
+                'succeeded': self.succeeded,
+                'failed': self.failed,
+                'error_rate': round(self.failed / self.sent, 4) if self.sent else 0.0,
+                'statuses': dict(self.statuses),
+                'errors': dict(self.errors),
+                'duration_s': round(elapsed, 3),
+                'throughput_rps': round(self.sent / elapsed, 2) if elapsed > 0 else 0.0,
+                'max_lag_s': round(self.max_lag, 3),
+                'latency_ms': {
+                    'min': _ms(latencies[0] if latencies else None),
+                    'p50': _ms(percentile(latencies, 0.50)),
+                    'p90': _ms(percentile(latencies, 0.90)),
+                    'p99': _ms(percentile(latencies, 0.99)),
+                    'max': _ms(latencies[-1] if latencies else None),
+                    'mean': _ms(sum(latencies) / len(latencies) if latencies else None)
+                }
+            }
+
+
+def _ms(seconds):
+    return round(seconds * 1000.0, 2) if seconds is not None else None
+
+
+class Replayer:
+    """Reenviar jobs (timestamp, method, headers, body) para ``target_url``.
+
+    ``run(jobs, on_progress)`` bloqueia até o fim; ``on_progress(report)`` é
+    chamado a cada ``progress_interval`` segundos e pode devolver False
+    para interromper. Com ``allowlist`` o alvo passa pela mesma verificação
+    de endereços internos das entregas (``delivery.check_destination``).
+    """
+
+    def __init__(self, target_url, speed=1.0, concurrency=4, timeout=10.0, progress_interval=1.0, allowlist=None):
+        self.target_url = target_url
+        self.speed = max(0.0, float(speed))
+        self.concurrency = max(1, int(concurrency))
+        self.progress_interval = progress_interval
+        self.pool = delivery.HostConnectionPool(max_idle_per_host=self.concurrency, timeout=timeout, allowlist=allowlist)
+        self.stats = ReplayStats()
+        self.status = RUNNING
+        self._stop = threading.Event()
+        self._on_progress = None
+        self._last_progress = 0.0
+
+    def cancel(self):
+        self._stop.set()
+
+    def _send(self, job):
+        started = time.perf_counter()
+        try:
+            status = self.pool.request(job['method'], self.target_url, job['body'], job['headers'])
+        except Exception as e:
+            self.stats.record(None, time.perf_counter() - started, error=type(e).__name__)
+            return
+        self.stats.record(status, time.perf_counter() - started)
+
+    def _progress(self):
+        now = time.monotonic()
+        if self._on_progress is None or now - self._last_progress < self.progress_interval:
+            return
+        self._last_progress = now
+        if self._on_progress(self.stats.report()) is False:
+            self.cancel()
+
+    def _wait_until(self, due):
+        """Esperar o horário do próximo envio (interrompível, com progresso)"""
+        delay = due - time.monotonic()
+        if delay <= 0:
+            self.stats.lag(-delay)
+            return
+        while delay > 0 and not self._stop.is_set():
+            self._stop.wait(min(delay, self.progress_interval))
+            self._progress()
+            delay = due - time.monotonic()
+
+    def run(self, jobs, on_progress=None):
+        slots = threading.BoundedSemaphore(self.concurrency)
+        executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='replay')
+        first_ts = None
+        wall_start = time.monotonic()
+        self._on_progress = on_progress
+        self._last_progress = wall_start
+        try:
+            for job in jobs:
+                if self._stop.is_set():
+                    break
+                # Ritmo original (intervalos entre os logs divididos por speed)
+                if self.speed and job.get('timestamp') is not None:
+                    ts = job['timestamp'].timestamp()
+                    if first_ts is None:
+                        first_ts = ts
+                    self._wait_until(wall_start + (ts - first_ts) / self.speed)
+                    if self._stop.is_set():
+                        break
+                # Limite de requisições em andamento
+                acquired = False
+                while not self._stop.is_set():
+                    if slots.acquire(timeout=self.progress_interval):
+                        acquired = True
+                        break
+                    self._progress()
+                if not acquired:
+                    break
+                future = executor.submit(self._send, job)
+                future.add_done_callback(lambda _: slots.release())
+                self._progress()
+            executor.shutdown(wait=True)
+            self.status = CANCELLED if self._stop.is_set() else FINISHED
+        except Exception:
+            self.status = FAILED
+            executor.shutdown(wait=True)
+            raise
+        finally:
+            self.stats.finished = time.time()
+            self.pool.close()
+        return self.stats.report()
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def _handle(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            self.rfile.read(length)
+        server = self.server
+        with server.lock:
+            server.received += 1
+            server.methods[self.command] += 1
+        if server.delay:
+            time.sleep(server.delay)
+        self.send_response(server.status)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = _handle
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubServer:
+    """Servidor HTTP local que aceita tudo (status e atraso configuráveis)"""
+
+    def __init__(self, host='127.0.0.1', port=0, status=200, delay=0.0):
+        self.server = ThreadingHTTPServer((host, port), _StubHandler)
+        self.server.daemon_threads = True
+        self.server.status = status
+        self.server.delay = delay
+        self.server.received = 0
+        self.server.methods = Counter()
+        self.server.lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}/'
+
+    @property
+    def received(self):
+        return self.server.received
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, name='replay-stub', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,99 @@
+"""Replay de tráfego histórico pela linha de comando.
+
+Exemplos:
+    python replay_logs.py --webhook meu_bot --target http://localhost:9000/hook
+    python replay_logs.py --webhook meu_bot --target http://staging/hook --speed 10 --concurrency 8
+    python replay_logs.py --webhook meu_bot --since 2024-05-01T00:00 --until 2024-05-02T00:00 --speed max
+    python replay_logs.py --webhook meu_bot --field event_type=messages --limit 100 --stub
+"""
+import argparse
+import json
+import sys
+
+import replay
+from app import app, create_app, Webhook, LOG_FIELD_FILTERS, iter_replay_jobs, replay_conditions
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Reenviar logs gravados para uma URL de teste')
+    parser.add_argument('--webhook', required=True, help='Nome do webhook de origem')
+    parser.add_argument('--target', help='URL que recebe o replay')
+    parser.add_argument('--stub', action='store_true', help='Reenviar para um servidor local que só responde 200')
+    parser.add_argument('--since', help='Início (ISO 8601)')
+    parser.add_argument('--until', help='Fim (ISO 8601, exclusivo)')
+    parser.add_argument('--method', help='Somente este método HTTP')
+    parser.add_argument('--field', action='append', default=[], metavar='NOME=VALOR',
+                        help=f"Filtro por campo extraído ({', '.join(LOG_FIELD_FILTERS)})")
+    parser.add_argument('--speed', default='1', help='1 = tempo real, N = N vezes mais rápido, max = sem espera')
+    parser.add_argument('--concurrency', type=int, default=4, help='Requisições simultâneas')
+    parser.add_argument('--limit', type=int, help='Reenviar no máximo N logs')
+    parser.add_argument('--json', action='store_true', help='Imprimir o relatório final em JSON')
+    return parser.parse_args()
+
+
+def print_progress(report):
+    print(f"🔁 {report['sent']} enviado(s) | {report['failed']} falha(s) | {report['throughput_rps']} req/s", file=sys.stderr)
+
+
+def print_report(report):
+    latency = report['latency_ms']
+    print(f"✅ Enviados: {report['sent']} em {report['duration_s']}s ({report['throughput_rps']} req/s)")
+    print(f"   Sucesso: {report['succeeded']} | Falhas: {report['failed']} (taxa de erro {report['error_rate']:.2%})")
+    if report['statuses']:
+        print(f"   Status: {', '.join(f'{key}={value}' for key, value in sorted(report['statuses'].items()))}")
+    if report['errors']:
+        print(f"   Erros: {', '.join(f'{key}={value}' for key, value in sorted(report['errors'].items()))}")
+    print(f"   Latência (ms): min {latency['min']} | p50 {latency['p50']} | p90 {latency['p90']} | "
+          f"p99 {latency['p99']} | max {latency['max']}")
+    if report['max_lag_s']:
+        print(f"   Atraso máximo em relação ao ritmo original: {report['max_lag_s']}s")
+
+
+def main():
+    args = parse_args()
+    if not args.target and not args.stub:
+        print("❌ Informe --target ou --stub")
+        return 1
+
+    fields = {}
+    for item in args.field:
+        name, _, value = item.partition('=')
+        if name not in LOG_FIELD_FILTERS or not value:
+            print(f"❌ Filtro inválido: {item}")
+            return 1
+        fields[name] = value
+
+    stub = replay.StubServer().start() if args.stub else None
+    target = stub.url if stub else args.target
+    speed = 0.0 if args.speed == 'max' else float(args.speed.rstrip('x'))
+
+    create_app()
+    try:
+        with app.app_context():
+            webhook = Webhook.query.filter_by(name=args.webhook).first()
+            if not webhook:
+                print(f"❌ Webhook não encontrado: {args.webhook}")
+                return 1
+            params = {'since': args.since, 'until': args.until, 'method': args.method, 'fields': fields}
+            replayer = replay.Replayer(target, speed=speed, concurrency=args.concurrency)
+            print(f"🔁 Replay de {webhook.name} para {target} (speed={args.speed}, concurrency={args.concurrency})",
+                  file=sys.stderr)
+            try:
+                report = replayer.run(iter_replay_jobs(replay_conditions(webhook.id, params), args.limit), print_progress)
+            except KeyboardInterrupt:
+                replayer.cancel()
+                report = replayer.stats.report()
+    finally:
+        if stub:
+            print(f"🧪 Servidor local recebeu {stub.received} requisição(ões)", file=sys.stderr)
+            stub.stop()
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+    return 0 if report['failed'] == 0 else 2
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,160 @@
+"""Validadores (ETag/Last-Modified) e cache das respostas do painel.
+
+Cada alteração relevante incrementa um contador num armazenamento
+compartilhado entre os workers: ``user:<id>`` quando o conjunto de webhooks
+do usuário muda (criar, ativar/desativar, excluir, configurar) e
+``webhook:<id>`` quando chegam logs ou os contadores são atualizados
+(``account:<id>`` versiona o próprio usuário, ver user_session.py). O ETag
+de uma página é derivado só desses contadores, então um 304 é respondido
+sem consultar o banco. Por padrão os contadores ficam num SQLite local em
+instance/; ``MemoryVersionStore`` serve para um único processo.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class MemoryVersionStore:
+    """Contadores em memória do processo (não compartilhados)"""
+
+    def __init__(self):
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def bump(self, keys):
+        now = time.time()
+        with self._lock:
+            for key in keys:
+                version, _ = self._versions.get(key, (0, now))
+                self._versions[key] = (version + 1, now)
+
+    def get_many(self, keys):
+        with self._lock:
+            return {key: self._versions[key] for key in keys if key in self._versions}
+
+
+class SQLiteVersionStore:
+    """Contadores num arquivo SQLite compartilhado entre processos"""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        conn = sqlite3.connect(self.path, timeout=1.0, isolation_level=None, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=OFF')
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS versions ('
+            'key TEXT PRIMARY KEY, version INTEGER NOT NULL, updated REAL NOT NULL)'
+        )
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    def bump(self, keys):
+        now = time.time()
+        self._connection().executemany(
+            'INSERT INTO versions (key, version, updated) VALUES (?, 1, ?) '
+            'ON CONFLICT(key) DO UPDATE SET version = version + 1, updated = excluded.updated',
+            [(key, now) for key in keys]
+        )
+
+    def get_many(self, keys):
+        keys = list(keys)
+        found = {}
+        # Limite de parâmetros do SQLite
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            rows = self._connection().execute(
+                f"SELECT key, version, updated FROM versions WHERE key IN ({','.join('?' * len(chunk))})", chunk
+            ).fetchall()
+            found.update({key: (version, updated) for key, version, updated in rows})
+        return found
+
+
+class Versions:
+    """Fachada tolerante a falhas: sem o armazenamento, nada é cacheado"""
+
+    def __init__(self, store):
+        self.store = store
+
+    def bump(self, *keys):
+        if not keys:
+            return
+        try:
+            self.store.bump(keys)
+        except Exception as e:
+            print(f"Erro ao atualizar versões das respostas: {e}")
+
+    def version(self, key):
+        """Contador atual da chave (0 se nunca alterada; None em caso de erro)"""
+        try:
+            return self.store.get_many([key]).get(key, (0, 0))[0]
+        except Exception as e:
+            print(f"Erro ao ler versões das respostas: {e}")
+            return None
+
+    def validators(self, keys, *extra):
+        """(etag, last_modified) das chaves; (None, None) em caso de erro"""
+        keys = sorted(keys)
+        try:
+            versions = self.store.get_many(keys)
+        except Exception as e:
+            print(f"Erro ao ler versões das respostas: {e}")
+            return None, None
+        parts = [str(part) for part in extra]
+        parts.extend(f'{key}={versions.get(key, (0, 0))[0]}' for key in keys)
+        etag = hashlib.sha1('|'.join(parts).encode('utf-8')).hexdigest()[:20]
+        updated = [updated for _, updated in versions.values()]
+        return etag, (max(updated) if updated else None)
+
+
+class ResponseCache:
+    """LRU pequeno de respostas prontas: chave -> (etag, corpo)"""
+
+    def __init__(self, maxsize=1000):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, etag):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == etag:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+        self.misses += 1
+        return None
+
+    def put(self, key, etag, body):
+        with self._lock:
+            self._entries[key] = (etag, body)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+
+def build_salt(*paths):
+    """Identifica a versão do código/templates (muda a cada deploy)"""
+    digest = hashlib.sha1()
+    for path in paths:
+        if os.path.isdir(path):
+            files = sorted(os.path.join(root, name) for root, _, names in os.walk(path) for name in names)
+        else:
+            files = [path]
+        for file_path in files:
+            try:
+                digest.update(f'{file_path}:{os.path.getmtime(file_path)}'.encode('utf-8'))
+            except OSError:
+                continue
+    return digest.hexdigest()[:12]
@@ -0,0 +1,137 @@
+"""Retenção e compactação dos logs de webhook.
+
+As exclusões são feitas em lotes pequenos guiados pelo índice
+(webhook_id, timestamp, id), cada lote na sua própria transação e com uma
+pausa entre lotes, para nunca segurar locks longos na tabela de logs.
+
+No MySQL a tabela de logs pode opcionalmente ser particionada por mês
+(ver partitions.py, importado só quando o banco é MySQL); nesse caso dados
+antigos são descartados com DROP PARTITION, em tempo constante.
+"""
+import fcntl
+import os
+import threading
+import time
+
+from sqlalchemy import and_, or_, select
+
+
+def _delete_batches(session, log_model, conditions, batch_size, pause, max_batches=None):
+    """Excluir em lotes as linhas que satisfazem ``conditions``"""
+    deleted = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        ids = session.execute(
+            select(log_model.id)
+            .where(*conditions)
+            .order_by(log_model.timestamp, log_model.id)
+            .limit(batch_size)
+        ).scalars().all()
+        if not ids:
+            break
+
+        session.execute(log_model.__table__.delete().where(log_model.id.in_(ids)))
+        session.commit()
+        deleted += len(ids)
+        batches += 1
+
+        if len(ids) < batch_size:
+            break
+        if pause:
+            time.sleep(pause)
+    return deleted
+
+
+def prune_logs(session, log_model, webhook_id, before=None, keep_rows=None,
+               batch_size=1000, pause=0.05, max_batches=None):
+    """Aplicar retenção a um webhook: idade (``before``) e/ou quantidade.
+
+    Retorna o número de linhas excluídas.
+    """
+    deleted = 0
+    if before is not None:
+        deleted += _delete_batches(
+            session, log_model,
+            [log_model.webhook_id == webhook_id, log_model.timestamp < before],
+            batch_size, pause, max_batches
+        )
+
+    if keep_rows is not None:
+        # Linha mais nova que NÃO deve ser mantida: tudo dela para trás sai
+        boundary = session.execute(
+            select(log_model.timestamp, log_model.id)
+            .where(log_model.webhook_id == webhook_id)
+            .order_by(log_model.timestamp.desc(), log_model.id.desc())
+            .offset(keep_rows)
+            .limit(1)
+        ).first()
+        if boundary is not None:
+            ts, log_id = boundary
+            deleted += _delete_batches(
+                session, log_model,
+                [
+                    log_model.webhook_id == webhook_id,
+                    or_(log_model.timestamp < ts, and_(log_model.timestamp == ts, log_model.id <= log_id))
+                ],
+                batch_size, pause, max_batches
+            )
+    return deleted
+
+
+def purge_logs(session, log_model, webhook_id, batch_size=1000, pause=0.0):
+    """Excluir todos os logs de um webhook em lotes"""
+    return _delete_batches(session, log_model, [log_model.webhook_id == webhook_id], batch_size, pause)
+
+
+# EXECUÇÃO EM SEGUNDO PLANO
+class RetentionWorker:
+    """Executa ``job()`` periodicamente numa thread de fundo.
+
+    Um lock de arquivo garante que só um processo (entre os workers do
+    gunicorn) aplique a retenção por vez.
+    """
+
+    def __init__(self, job, interval=300.0, lock_path=None):
+        self.job = job
+        self.interval = interval
+        self.lock_path = lock_path
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._stopping = threading.Event()
+            self._thread = threading.Thread(target=self._run, name='retention-pruner', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stopping.set()
+
+    def run_once(self):
+        """Rodar o job se nenhum outro processo estiver rodando"""
+        if not self.lock_path:
+            self.job()
+            return True
+
+        with open(self.lock_path, 'a') as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                return False
+            try:
+                self.job()
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+        return True
+
+    def _run(self):
+        while not self._stopping.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"Erro ao aplicar retenção de logs: {e}")
@@ -0,0 +1,279 @@
+"""Busca textual nos payloads recebidos.
+
+O texto de cada log (corpo já descomprimido) fica numa tabela própria,
+``webhook_log_search`` (log_id, webhook_id, content). Sobre ela:
+
+- SQLite: tabela virtual FTS5 de conteúdo externo, mantida por gatilhos;
+  ranking por bm25() e trechos por snippet().
+- MySQL: índice FULLTEXT (InnoDB) em ``content``; ranking por MATCH ...
+  AGAINST e trechos montados aqui.
+- Outros bancos: LIKE em ``content`` (todos os termos), do log mais novo
+  para o mais antigo, sem ranking.
+
+A paginação é por keyset: ``search`` recebe a posição (score, log_id) do
+último resultado da página anterior, nunca OFFSET.
+
+A indexação é incremental e fora do caminho da ingestão: ``index_pending``
+pega os logs que ainda não têm entrada na tabela de busca (LEFT JOIN), então
+um id confirmado fora de ordem é indexado no lote seguinte, e
+``SearchIndexer`` roda isso numa thread de fundo, acordada a cada lote
+gravado. Um corpo que não pode ser decodificado é indexado vazio (e
+registrado no log) para não travar a fila.
+"""
+import fcntl
+import html
+import os
+import re
+import threading
+
+from sqlalchemy import column, select, table, text
+
+SEARCH_TABLE = 'webhook_log_search'
+FTS_TABLE = 'webhook_log_fts'
+
+# Marcadores internos do trecho; viram <mark> depois do escape HTML
+_OPEN = '\x02'
+_CLOSE = '\x03'
+MARK_OPEN = '<mark>'
+MARK_CLOSE = '</mark>'
+
+_WORD = re.compile(r'\w+', re.UNICODE)
+
+
+def has_fulltext(dialect_name):
+    """Banco com índice de texto completo (senão a busca usa LIKE)"""
+    return dialect_name in ('sqlite', 'mysql')
+
+
+def ensure_schema(conn):
+    """Criar a tabela FTS5 e os gatilhos (SQLite); no MySQL o índice FULLTEXT
+    vem do modelo. Retorna False se o banco não tiver índice de texto."""
+    dialect = conn.dialect.name
+    if dialect != 'sqlite':
+        return has_fulltext(dialect)
+
+    conn.execute(text(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+        f"content, content='{SEARCH_TABLE}', content_rowid='log_id', tokenize='unicode61')"
+    ))
+    conn.execute(text(
+        f"CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_ai AFTER INSERT ON {SEARCH_TABLE} BEGIN "
+        f"INSERT INTO {FTS_TABLE}(rowid, content) VALUES (new.log_id, new.content); END"
+    ))
+    conn.execute(text(
+        f"CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_ad AFTER DELETE ON {SEARCH_TABLE} BEGIN "
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, content) VALUES ('delete', old.log_id, old.content); END"
+    ))
+    return True
+
+
+# INDEXAÇÃO
+def index_pending(session, log_model, search_model, decode_fn, batch_size=500, max_chars=65536):
+    """Indexar o próximo lote de logs ainda sem entrada; retorna quantos.
+
+    ``decode_fn(body, body_blob, body_codec, body_ref, limit)`` devolve o
+    corpo em texto (corpos em disco lidos só até ``limit`` bytes).
+    """
+    rows = session.execute(
+        select(
+            log_model.id, log_model.webhook_id,
+            log_model.body, log_model.body_blob, log_model.body_codec, log_model.body_ref
+        )
+        .outerjoin(search_model, search_model.log_id == log_model.id)
+        .where(search_model.log_id.is_(None))
+        .order_by(log_model.id)
+        .limit(batch_size)
+    ).all()
+    if not rows:
+        return 0
+
+    # Logs sem corpo (ou com corpo ilegível) entram vazios para não voltarem no próximo lote
+    entries = []
+    for log_id, webhook_id, body, blob, codec, ref in rows:
+        try:
+            content = (decode_fn(body, blob, codec, ref, max_chars) or '')[:max_chars]
+        except Exception as e:
+            print(f"Erro ao decodificar o log {log_id} para a busca, indexado sem conteúdo: {e}")
+            content = ''
+        entries.append({'log_id': log_id, 'webhook_id': webhook_id, 'content': content})
+    stmt = (
+        search_model.__table__.insert()
+        .prefix_with('IGNORE', dialect='mysql')
+        .prefix_with('OR IGNORE', dialect='sqlite')
+    )
+    session.execute(stmt, entries)
+    session.commit()
+    return len(entries)
+
+
+def prune(session, search_model, webhook_id, before_log_id=None):
+    """Remover entradas de logs já excluídos (todas, ou abaixo de ``before_log_id``)"""
+    conditions = [search_model.webhook_id == webhook_id]
+    if before_log_id is not None:
+        conditions.append(search_model.log_id < before_log_id)
+    result = session.execute(search_model.__table__.delete().where(*conditions))
+    session.commit()
+    return result.rowcount
+
+
+# CONSULTA
+def query_terms(q):
+    """Trechos da busca separados por espaço; cada um vira uma frase exata"""
+    return [chunk for chunk in q.split() if _WORD.search(chunk)]
+
+
+def _fts5_query(chunks):
+    return ' '.join('"' + chunk.replace('"', '""') + '"' for chunk in chunks)
+
+
+def _mysql_query(chunks):
+    return ' '.join('+"' + chunk.replace('"', ' ') + '"' for chunk in chunks)
+
+
+def _finish_snippet(snippet):
+    return html.escape(snippet).replace(_OPEN, MARK_OPEN).replace(_CLOSE, MARK_CLOSE)
+
+
+def highlight(content, chunks, width=160):
+    """Trecho de ``content`` em volta da primeira ocorrência, com <mark>"""
+    words = sorted({word.lower() for chunk in chunks for word in _WORD.findall(chunk)}, key=len, reverse=True)
+    if not words or not content:
+        return html.escape((content or '')[:width])
+    pattern = re.compile('|'.join(re.escape(word) for word in words), re.IGNORECASE)
+
+    match = pattern.search(content)
+    start = max(0, match.start() - width // 2) if match else 0
+    end = min(len(content), start + width)
+    window = content[start:end]
+    marked = pattern.sub(lambda m: _OPEN + m.group(0) + _CLOSE, window)
+    return ('…' if start > 0 else '') + _finish_snippet(marked) + ('…' if end < len(content) else '')
+
+
+def _like_pattern(chunk):
+    escaped = chunk.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f'%{escaped}%'
+
+
+def _like_search(session, webhook_id, chunks, limit, after):
+    """Busca sem índice de texto: todos os termos via LIKE, mais novos primeiro"""
+    search_table = table(SEARCH_TABLE, column('log_id'), column('webhook_id'), column('content'))
+    stmt = (
+        select(search_table.c.log_id, search_table.c.content)
+        .where(search_table.c.webhook_id == webhook_id)
+        .where(*[search_table.c.content.ilike(_like_pattern(chunk), escape='\\') for chunk in chunks])
+        .order_by(search_table.c.log_id.desc())
+        .limit(limit)
+    )
+    if after is not None:
+        stmt = stmt.where(search_table.c.log_id < after[1])
+    rows = session.execute(stmt).all()
+    return [(log_id, 0.0, highlight(content, chunks)) for log_id, content in rows]
+
+
+def search(session, webhook_id, q, limit=50, after=None):
+    """Buscar nos logs do webhook; retorna [(log_id, score, trecho)] por relevância.
+
+    ``after`` = (score, log_id) do último resultado da página anterior.
+    """
+    chunks = query_terms(q)
+    if not chunks:
+        return []
+    dialect = session.get_bind().dialect.name
+    params = {'webhook_id': webhook_id, 'limit': limit}
+    if after is not None:
+        params['after_score'], params['after_id'] = float(after[0]), int(after[1])
+    after_sql = '(score < :after_score OR (score = :after_score AND log_id < :after_id))'
+
+    if dialect == 'sqlite':
+        rows = session.execute(text(
+            f"SELECT log_id, score, snippet FROM ("
+            f"SELECT s.log_id AS log_id, -bm25({FTS_TABLE}) AS score, "
+            f"snippet({FTS_TABLE}, 0, :open, :close, '…', 24) AS snippet "
+            f"FROM {FTS_TABLE} JOIN {SEARCH_TABLE} s ON s.log_id = {FTS_TABLE}.rowid "
+            f"WHERE {FTS_TABLE} MATCH :q AND s.webhook_id = :webhook_id) "
+            + (f"WHERE {after_sql} " if after is not None else '')
+            + "ORDER BY score DESC, log_id DESC LIMIT :limit"
+        ), {**params, 'q': _fts5_query(chunks), 'open': _OPEN, 'close': _CLOSE}).all()
+        return [(log_id, float(score), _finish_snippet(snippet or '')) for log_id, score, snippet in rows]
+
+    if dialect == 'mysql':
+        rows = session.execute(text(
+            f"SELECT log_id, MATCH(content) AGAINST (:q IN BOOLEAN MODE) AS score, content "
+            f"FROM {SEARCH_TABLE} "
+            f"WHERE webhook_id = :webhook_id AND MATCH(content) AGAINST (:q IN BOOLEAN MODE) "
+            + (f"HAVING {after_sql} " if after is not None else '')
+            + "ORDER BY score DESC, log_id DESC LIMIT :limit"
+        ), {**params, 'q': _mysql_query(chunks)}).all()
+        return [(log_id, float(score), highlight(content, chunks)) for log_id, score, content in rows]
+
+    return _like_search(session, webhook_id, chunks, limit, after)
+
+
+# EXECUÇÃO EM SEGUNDO PLANO
+class SearchIndexer:
+    """Thread que chama ``job()`` (um lote) até não haver mais pendências.
+
+    Acorda com ``notify()`` ou a cada ``interval`` segundos; um lock de
+    arquivo evita que vários workers do gunicorn indexem os mesmos logs.
+    """
+
+    def __init__(self, job, interval=5.0, lock_path=None):
+        self.job = job
+        self.interval = interval
+        self.lock_path = lock_path
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+
+    def start(self):
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._stopping = threading.Event()
+            self._thread = threading.Thread(target=self._run, name='search-indexer', daemon=True)
+            self._thread.start()
+
+    def notify(self):
+        self._wake.set()
+
+    def stop(self):
+        self._stopping.set()
+        self._wake.set()
+
+    def run_once(self):
+        """Indexar tudo o que estiver pendente; retorna quantos logs (ou None se outro processo está indexando)"""
+        if not self.lock_path:
+            return self._drain()
+
+        with open(self.lock_path, 'a') as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                return None
+            try:
+                return self._drain()
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _drain(self):
+        total = 0
+        while not self._stopping.is_set():
+            indexed = self.job()
+            total += indexed
+            if not indexed:
+                break
+        return total
+
+    def _run(self):
+        while not self._stopping.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"Erro ao indexar logs para busca: {e}")
@@ -172,6 +172,81 @@ function showLogData(data) {
     document.body.style.overflow = 'hidden';
 }
 
+// Carregar log completo sob demanda (corpo descomprimido só ao abrir)
+function openLog(url) {
+    fetch(url)
+        .then(response => response.json())
+        .then(log => {
+            showLogData(log.body || '');
+            setupBodyPaging(log);
+        })
+        .catch(error => {
+            showToast('Erro ao carregar dados do log', 'error');
+            console.error('Erro:', error);
+        });
+}
+
+const BODY_CHUNK_BYTES = 256 * 1024;
+
+// Corpos grandes (gravados em disco) chegam só com o início; o restante
+// é pedido em trechos com Range
+function setupBodyPaging(log) {
+    const more = document.getElementById('logBodyMore');
+    if (!more) return;
+    more.innerHTML = '';
+    if (!log.body_truncated) {
+        more.style.display = 'none';
+        return;
+    }
+    
+    let offset = log.body_loaded;
+    const decoder = new TextDecoder('utf-8');
+    const logDataElement = document.getElementById('logData');
+    const status = document.createElement('small');
+    const button = document.createElement('button');
+    const download = document.createElement('a');
+    button.className = 'btn btn-sm btn-outline';
+    button.innerHTML = '<i class="fas fa-angle-double-down"></i> Carregar mais';
+    download.className = 'btn btn-sm btn-outline';
+    download.href = `${log.body_url}?download=1`;
+    download.innerHTML = '<i class="fas fa-download"></i> Baixar corpo completo';
+    
+    const updateStatus = () => {
+        status.textContent = `${formatBytes(offset)} de ${formatBytes(log.body_size)} exibidos`;
+        button.style.display = offset < log.body_size ? '' : 'none';
+    };
+    
+    button.addEventListener('click', () => {
+        button.disabled = true;
+        const end = Math.min(offset + BODY_CHUNK_BYTES, log.body_size) - 1;
+        fetch(log.body_url, { headers: { 'Range': `bytes=${offset}-${end}` } })
+            .then(response => {
+                if (response.status !== 206) throw new Error(`HTTP ${response.status}`);
+                return response.arrayBuffer();
+            })
+            .then(buffer => {
+                offset += buffer.byteLength;
+                logDataElement.textContent += decoder.decode(buffer, { stream: offset < log.body_size });
+                updateStatus();
+            })
+            .catch(error => {
+                showToast('Erro ao carregar o restante do corpo', 'error');
+                console.error('Erro:', error);
+            })
+            .finally(() => { button.disabled = false; });
+    });
+    
+    more.append(status, button, download);
+    more.style.display = 'flex';
+    updateStatus();
+}
+
+function formatBytes(bytes) {
+    if (bytes >= 1024 * 1024) return `${(bytes / (1024 * 1024)).toFixed(1)} MB`;
+    if (bytes >= 1024) return `${(bytes / 1024).toFixed(1)} KB`;
+    return `${bytes} B`;
+}
+
 // Função para fechar modal
 function closeLogModal() {
     const modal = document.getElementById('logModal');
@@ -274,12 +349,141 @@ function hideValidationMessage(input) {
     }
 }
 
+// Formatar timestamp ISO (UTC, sem fuso) como no template: dd/mm/aaaa HH:MM:SS
+function formatLogTimestamp(iso) {
+    const [date, time] = iso.split('T');
+    const [year, month, day] = date.split('-');
+    return `${day}/${month}/${year} ${time.substring(0, 8)}`;
+}
+
+// Criar linha da tabela de logs a partir do JSON da API
+function buildLogRow(log, logsUrl) {
+    const row = document.createElement('tr');
+
+    const timestampCell = document.createElement('td');
+    timestampCell.textContent = formatLogTimestamp(log.timestamp);
+
+    const methodCell = document.createElement('td');
+    const badge = document.createElement('span');
+    badge.className = `method-badge method-${log.method.toLowerCase()}`;
+    badge.textContent = log.method;
+    methodCell.appendChild(badge);
+
+    const ipCell = document.createElement('td');
+    ipCell.textContent = log.ip_address || '';
+
+    const dataCell = document.createElement('td');
+    if (log.body_size !== 0) {
+        const button = document.createElement('button');
+        button.className = 'btn btn-sm btn-outline';
+        button.innerHTML = '<i class="fas fa-eye"></i> Ver';
+        button.addEventListener('click', () => openLog(`${logsUrl}/${log.id}`));
+        dataCell.appendChild(button);
+    } else {
+        dataCell.innerHTML = '<span class="text-muted">Sem dados</span>';
+    }
+
+    row.append(timestampCell, methodCell, ipCell, dataCell);
+    return row;
+}
+
+// Rolagem infinita do histórico de logs (paginação por cursor)
+function initLogsInfiniteScroll() {
+    const table = document.getElementById('logsTable');
+    const sentinel = document.getElementById('logsSentinel');
+    if (!table || !sentinel || !('IntersectionObserver' in window)) {
+        return;
+    }
+
+    const tbody = table.querySelector('tbody');
+    const logCount = document.querySelector('.log-count');
+    let loading = false;
+
+    const observer = new IntersectionObserver(entries => {
+        if (!entries.some(entry => entry.isIntersecting)) {
+            return;
+        }
+
+        const cursor = table.dataset.nextCursor;
+        if (!cursor) {
+            observer.disconnect();
+            return;
+        }
+        if (loading) {
+            return;
+        }
+
+        loading = true;
+        fetch(`${table.dataset.logsUrl}?before=${encodeURIComponent(cursor)}`)
+            .then(response => response.json())
+            .then(data => {
+                data.logs.forEach(log => tbody.appendChild(buildLogRow(log, table.dataset.logsUrl)));
+                table.dataset.nextCursor = data.next_cursor || '';
+                if (logCount) {
+                    logCount.textContent = `${tbody.rows.length} registro(s)`;
+                }
+                if (!data.next_cursor) {
+                    observer.disconnect();
+                }
+            })
+            .catch(error => {
+                showToast('Erro ao carregar mais registros', 'error');
+                console.error('Erro:', error);
+            })
+            .finally(() => {
+                loading = false;
+            });
+    });
+
+    observer.observe(sentinel);
+}
+
+document.addEventListener('DOMContentLoaded', initLogsInfiniteScroll);
+
+// Acompanhamento ao vivo dos logs (Server-Sent Events)
+function initLogsLiveTail() {
+    const table = document.getElementById('logsTable');
+    if (!table || !table.dataset.streamUrl || !('EventSource' in window)) {
+        return;
+    }
+
+    const tbody = table.querySelector('tbody');
+    const logCount = document.querySelector('.log-count');
+    const source = new EventSource(table.dataset.streamUrl);
+    // Ao reconectar, o servidor pode reenviar logs que já chegaram
+    const shown = new Set();
+
+    source.addEventListener('log', event => {
+        const log = JSON.parse(event.data);
+        if (shown.has(log.id)) {
+            return;
+        }
+        shown.add(log.id);
+        tbody.insertBefore(buildLogRow(log, table.dataset.logsUrl), tbody.firstChild);
+
+        const emptyState = document.getElementById('logsEmptyState');
+        if (emptyState) {
+            emptyState.remove();
+            table.parentElement.hidden = false;
+        }
+        if (logCount) {
+            logCount.textContent = `${tbody.rows.length} registro(s)`;
+        }
+    });
+
+    // O navegador reconecta sozinho enviando Last-Event-ID
+    source.onerror = () => console.warn('Stream de logs desconectado, reconectando...');
+    window.addEventListener('beforeunload', () => source.close());
+}
+
+document.addEventListener('DOMContentLoaded', initLogsLiveTail);
+
 // Função para atualizar estatísticas em tempo real (opcional)
 function updateWebhookStats() {
-    fetch('/api/webhooks')
+    fetch('/api/dashboard/summary')
         .then(response => response.json())
         .then(data => {
-            data.forEach(webhook => {
+            data.webhooks.forEach(webhook => {
                 const webhookCard = document.querySelector(`[data-webhook-id="${webhook.id}"]`);
                 if (webhookCard) {
                     // Atualizar contador de requisições
@@ -294,6 +498,12 @@ function updateWebhookStats() {
                         const date = new Date(webhook.last_request);
                         lastRequest.textContent = `Última: ${date.toLocaleDateString('pt-BR')} às ${date.toLocaleTimeString('pt-BR')}`;
                     }
+                    
+                    // Atualizar volume das últimas 24h
+                    const volume = webhookCard.querySelector('.volume-24h');
+                    if (volume) {
+                        volume.textContent = `${webhook.volume_24h} nas últimas 24h`;
+                    }
                 }
             });
         })
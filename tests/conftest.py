@@ -0,0 +1,74 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Antes de importar app: o .env do projeto aponta para o banco de produção
+TEST_DIR = tempfile.mkdtemp(prefix='webhook-tests-')
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(TEST_DIR, 'test.db')
+os.environ['INSTANCE_DIR'] = os.path.join(TEST_DIR, 'instance')
+
+ADMIN = {'username': 'admin', 'password': 'admin123'}
+
+
+@pytest.fixture
+def make_app(tmp_path):
+    """Inicializar a aplicação com componentes novos (pasta instance própria do teste)"""
+    import app as module
+    from search_index import FTS_TABLE
+
+    # Configuração de cada teste não vaza para os seguintes
+    saved_config = dict(module.app.config)
+
+    def make(**config):
+        module.create_app({
+            'TESTING': True,
+            'INSTANCE_DIR': str(tmp_path / 'instance'),
+            'LIVE_TAIL_POLL_S': 0,
+            'SEARCH_INDEX_INTERVAL_S': 0.05,
+            **config
+        })
+        module.create_tables()
+        return module
+
+    yield make
+
+    module.stop_components()
+    with module.app.app_context():
+        module.db.session.remove()
+        with module.db.engine.begin() as conn:
+            conn.exec_driver_sql(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+        module.db.drop_all()
+    module.app.config.clear()
+    module.app.config.update(saved_config)
+
+
+@pytest.fixture
+def webhook_app(make_app):
+    return make_app()
+
+
+@pytest.fixture
+def client(webhook_app):
+    return webhook_app.app.test_client()
+
+
+@pytest.fixture
+def admin_client(client):
+    response = client.post('/login', data=ADMIN)
+    assert response.status_code == 302
+    return client
+
+
+@pytest.fixture
+def webhook(webhook_app):
+    """Webhook ativo do admin: (id, nome)"""
+    with webhook_app.app.app_context():
+        admin = webhook_app.User.query.filter_by(username='admin').first()
+        hook = webhook_app.Webhook(name='test_hook', token=webhook_app.generate_token(), user_id=admin.id)
+        webhook_app.db.session.add(hook)
+        webhook_app.db.session.commit()
+        return hook.id, hook.name
@@ -0,0 +1,82 @@
+import asyncio
+import json
+
+import pytest
+
+
+@pytest.fixture
+def asgi(webhook_app):
+    import asgi_ingest
+    asgi_ingest.application.setup()
+    yield asgi_ingest
+    asgi_ingest.application.bridge.max_pending = webhook_app.app.config['ASGI_MAX_PENDING']
+
+
+def call(asgi, method, path, body=b'', query=b'', headers=(), chunks=None):
+    """Executar uma requisição na aplicação ASGI; retorna (status, cabeçalhos, corpo)"""
+    messages = [{'type': 'http.request', 'body': chunk, 'more_body': True} for chunk in (chunks or [])]
+    messages.append({'type': 'http.request', 'body': body, 'more_body': False})
+    sent = []
+
+    async def receive():
+        return messages.pop(0) if messages else {'type': 'http.disconnect'}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        'type': 'http', 'method': method, 'path': path, 'query_string': query,
+        'headers': [(name.lower().encode(), value.encode()) for name, value in headers],
+        'client': ('203.0.113.7', 50000)
+    }
+    asyncio.run(asgi.application(scope, receive, send))
+    if not sent:
+        return None, {}, b''
+    start = sent[0]
+    response_headers = {name.decode(): value.decode() for name, value in start['headers']}
+    return start['status'], response_headers, b''.join(m.get('body', b'') for m in sent[1:])
+
+
+def test_post_is_stored_like_the_flask_route(asgi, webhook_app, webhook):
+    _, name = webhook
+    payload = json.dumps({'hello': 'asgi'}).encode()
+    status, headers, body = call(asgi, 'POST', f'/webhook/{name}', chunks=[payload[:5]], body=payload[5:],
+                                 headers=[('Content-Type', 'application/json')])
+
+    assert status == 200
+    assert headers['content-type'] == 'application/json'
+    data = json.loads(body)
+    assert data['status'] == 'success'
+    with webhook_app.app.app_context():
+        log = webhook_app.db.session.get(webhook_app.WebhookLog, data['log_id'])
+        assert webhook_app.load_log_body(log) == payload.decode()
+        assert log.ip_address == '203.0.113.7'
+
+
+def test_challenge_and_errors_match_flask(asgi, client, webhook):
+    _, name = webhook
+    query = 'hub.mode=subscribe&hub.challenge=1234&hub.verify_token=x'
+    status, _, body = call(asgi, 'GET', f'/webhook/{name}', query=query.encode())
+    flask_response = client.get(f'/webhook/{name}?{query}')
+    assert (status, body) == (flask_response.status_code, flask_response.data) == (200, b'1234')
+
+    status, _, body = call(asgi, 'GET', '/test-webhook/nao_existe')
+    flask_response = client.get('/test-webhook/nao_existe')
+    assert (status, json.loads(body)) == (flask_response.status_code, flask_response.json)
+
+    assert call(asgi, 'GET', '/outra/rota')[0] == 404
+    status, headers, _ = call(asgi, 'POST', '/test-webhook/x')
+    assert status == 405 and 'GET' in headers['allow']
+
+
+def test_body_over_limit_is_rejected(make_app, asgi, webhook):
+    make_app(INGEST_MAX_BODY_BYTES=1024)
+    status, _, _ = call(asgi, 'POST', f'/webhook/{webhook[1]}', chunks=[b'x' * 800], body=b'x' * 800)
+    assert status == 413
+
+
+def test_overloaded_bridge_answers_503(asgi, webhook):
+    asgi.application.bridge.max_pending = 0
+    status, headers, _ = call(asgi, 'POST', f'/webhook/{webhook[1]}', body=b'{}')
+    assert status == 503
+    assert headers['retry-after'] == '1'
@@ -0,0 +1,52 @@
+import json
+import os
+import subprocess
+import sys
+
+import benchmark
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def write_baseline(tmp_path, rps, p95, import_ms=500):
+    path = tmp_path / 'baseline.json'
+    path.write_text(json.dumps({'import_ms': import_ms,
+                                'scenarios': {'ingest': {'throughput_rps': rps, 'p95_ms': p95}}}))
+    return str(path)
+
+
+def test_compare_flags_regressions(tmp_path):
+    results = {'import_ms': 700, 'scenarios': {'ingest': {'throughput_rps': 70, 'p95_ms': 13}}}
+    regressions = benchmark.compare(results, write_baseline(tmp_path, 100, 10), 0.2)
+    assert len(regressions) == 3
+    assert benchmark.compare(results, write_baseline(tmp_path, 80, 12, 650), 0.2) == []
+
+
+def test_payloads_are_reproducible():
+    import random
+    assert benchmark.whatsapp_payload(random.Random(1)) == benchmark.whatsapp_payload(random.Random(1))
+
+
+def instance_files():
+    found = set()
+    for directory, _, files in os.walk(os.path.join(ROOT, 'instance')):
+        found.update((os.path.join(directory, name), os.path.getmtime(os.path.join(directory, name))) for name in files)
+    return found
+
+
+def test_small_run_keeps_state_out_of_the_repo(tmp_path):
+    output = tmp_path / 'bench.json'
+    before = instance_files()
+    env = {key: value for key, value in os.environ.items() if key not in ('DATABASE_URL', 'INSTANCE_DIR')}
+    run = subprocess.run(
+        [sys.executable, 'benchmark.py', '--requests', '20', '--concurrency', '2',
+         '--scenarios', 'ingest', '--output', str(output)],
+        cwd=ROOT, env=env, capture_output=True, text=True, timeout=300
+    )
+    assert run.returncode == 0, run.stdout + run.stderr
+    assert instance_files() == before
+
+    results = json.loads(output.read_text())
+    assert set(results['scenarios']) == {'ingest'}
+    assert results['scenarios']['ingest']['errors'] == 0
+    assert results['header_dedup'] == {'logs': 20, 'header_sets': 1, 'ratio': 20.0}
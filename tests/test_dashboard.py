@@ -0,0 +1,67 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+
+
+def add_webhook(webhook_app, name, user='admin', active=True):
+    with webhook_app.app.app_context():
+        owner = webhook_app.User.query.filter_by(username=user).first()
+        hook = webhook_app.Webhook(name=name, token=webhook_app.generate_token(), user_id=owner.id, is_active=active)
+        webhook_app.db.session.add(hook)
+        webhook_app.db.session.commit()
+        return hook.id
+
+
+def test_summary_totals_and_24h_volume(admin_client, webhook_app, webhook):
+    webhook_id, name = webhook
+    idle_id = add_webhook(webhook_app, 'idle_hook', active=False)
+    for _ in range(3):
+        admin_client.post(f'/webhook/{name}', json={})
+    webhook_app.traffic_stats.flush()
+    with webhook_app.app.app_context():
+        # Tráfego antigo conta no total, mas fica fora da janela de 24h
+        webhook_app.db.session.add(webhook_app.WebhookStat(
+            webhook_id=idle_id, bucket=datetime.utcnow() - timedelta(days=2), method='POST', status=200, count=5
+        ))
+        webhook_app.db.session.commit()
+
+    summary = admin_client.get('/api/dashboard/summary').json
+    by_id = {w['id']: w for w in summary['webhooks']}
+    assert by_id[webhook_id]['volume_24h'] == 3
+    assert by_id[webhook_id]['request_count'] == 3
+    assert by_id[idle_id]['volume_24h'] == 0
+    assert summary['totals'] == {
+        'webhooks': 2, 'active': 1, 'request_count': 3, 'volume_24h': 3,
+        'last_request': by_id[webhook_id]['last_request']
+    }
+
+
+def test_dashboard_loads_in_one_query(webhook_app, webhook):
+    for i in range(5):
+        add_webhook(webhook_app, f'hook_{i}')
+    statements = []
+
+    def listener(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    with webhook_app.app.app_context():
+        engine = webhook_app.db.engine
+        event.listen(engine, 'before_cursor_execute', listener)
+        try:
+            admin = webhook_app.User.query.filter_by(username='admin').first()
+            statements.clear()
+            rows = webhook_app.load_dashboard(admin.id)
+        finally:
+            event.remove(engine, 'before_cursor_execute', listener)
+
+    assert len(rows) == 6
+    assert len(statements) == 1
+
+
+def test_summary_hides_other_users_webhooks(client, webhook_app, webhook):
+    client.post('/register', data={'username': 'bob', 'email': 'bob@example.com',
+                                   'password': 'secret123', 'confirm_password': 'secret123'})
+    client.post('/login', data={'username': 'bob', 'password': 'secret123'})
+    summary = client.get('/api/dashboard/summary').json
+    assert summary['webhooks'] == []
+    assert summary['totals']['webhooks'] == 0
@@ -0,0 +1,103 @@
+import os
+import sqlite3
+import subprocess
+import sys
+import textwrap
+import time
+
+import pytest
+from flask import Flask, g
+from flask_sqlalchemy import SQLAlchemy
+
+from db_routing import REPLICA_BIND, ReplicaMonitor, RoutingSession, sync_sqlite
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def routed(tmp_path):
+    """Aplicação mínima com primário e réplica em dois SQLite"""
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'primary.db'}"
+    app.config['SQLALCHEMY_BINDS'] = {REPLICA_BIND: f"sqlite:///{tmp_path / 'replica.db'}"}
+    db = SQLAlchemy(app, session_options={'class_': RoutingSession})
+
+    class Item(db.Model):
+        id = db.Column(db.Integer, primary_key=True)
+        name = db.Column(db.String(20))
+
+    with app.app_context():
+        db.create_all()
+        db.session.add(Item(name='primary'))
+        db.session.commit()
+        sync_sqlite(db.engine, db.engines[REPLICA_BIND])
+        with db.engines[REPLICA_BIND].begin() as conn:
+            conn.exec_driver_sql("UPDATE item SET name = 'replica'")
+        yield app, db, Item, tmp_path / 'replica.db'
+        db.session.remove()
+
+
+def test_reads_go_to_replica_and_writes_to_primary(routed):
+    app, db, Item, _ = routed
+    with app.test_request_context():
+        g.db_replica = True
+        assert db.session.get(Item, 1).name == 'replica'
+        db.session.add(Item(name='new'))
+        db.session.commit()
+        g.db_replica = False
+        assert db.session.query(Item).count() == 2
+
+
+def test_replica_error_falls_back_to_primary(routed):
+    app, db, Item, replica_path = routed
+    with sqlite3.connect(replica_path) as conn:
+        conn.execute('DROP TABLE item')
+
+    with app.test_request_context():
+        g.db_replica = True
+        assert [item.name for item in Item.query.all()] == ['primary']
+        assert g.db_replica is False
+        assert 'no such table' in str(g.db_replica_error)
+
+
+def test_monitor_fail_until_next_good_check():
+    monitor = ReplicaMonitor(time.time, max_lag=5)
+    assert monitor.check() is True
+    monitor.fail('OperationalError: no such table')
+    assert monitor.healthy is False
+    assert monitor.check() is True
+
+
+def test_app_with_local_sqlite_replica(tmp_path):
+    # Processo separado: a URL da réplica é fixada na inicialização do app
+    script = textwrap.dedent(r'''
+        import re, sqlite3, sys
+        import app as module
+        module.create_app({'TESTING': True, 'DB_REPLICA_SQLITE_SYNC': True})
+        module.create_tables()
+        assert module.replica_monitor.check(), module.replica_monitor.error
+
+        client = module.app.test_client()
+        client.post('/login', data={'username': 'admin', 'password': 'admin123'})
+        client.get('/')
+        assert client.get('/api/webhooks').status_code == 200
+
+        # Réplica sem as tabelas: a consulta volta para o primário
+        with sqlite3.connect(sys.argv[1]) as conn:
+            conn.execute('DROP TABLE webhook')
+        assert client.get('/api/dashboard/summary').status_code == 200
+        assert not module.replica_monitor.healthy
+
+        routes = dict(re.findall(r'db_read_route_total\{target="(\w+)"\} ([\d.]+)', module.metrics.render()))
+        print(routes.get('replica', 0), routes.get('fallback', 0))
+    ''')
+    env = dict(os.environ,
+               DATABASE_URL=f"sqlite:///{tmp_path / 'primary.db'}",
+               DATABASE_REPLICA_URL=f"sqlite:///{tmp_path / 'replica.db'}",
+               INSTANCE_DIR=str(tmp_path / 'instance'))
+    result = subprocess.run([sys.executable, '-c', script, str(tmp_path / 'replica.db')],
+                            cwd=ROOT, env=env, capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    replica_reads, fallbacks = result.stdout.strip().splitlines()[-1].split()
+    assert float(replica_reads) >= 2
+    assert float(fallbacks) == 1
@@ -0,0 +1,76 @@
+from datetime import datetime
+
+import dedup
+
+
+def test_dedup_key_modes():
+    headers = {'X-GitHub-Delivery': 'abc'}
+    assert dedup.dedup_key(dedup.DEDUP_OFF, headers, '{}') is None
+    assert dedup.dedup_key(dedup.DEDUP_HEADER, {}, '{}') is None
+    assert dedup.dedup_key(dedup.DEDUP_HEADER, headers, '{}') == dedup.dedup_key(dedup.DEDUP_BODY, headers, '{"x": 1}')
+    assert dedup.dedup_key(dedup.DEDUP_BODY, {}, '{}') != dedup.dedup_key(dedup.DEDUP_BODY, {}, '{"x": 1}')
+
+
+def test_recent_keys_is_bounded():
+    keys = dedup.RecentKeys(maxsize=2)
+    assert keys.claim(1, 'a') == (False, None)
+    keys.add(1, 'a', 10)
+    assert keys.claim(1, 'a') == (True, 10)
+    keys.add(1, 'b', 11)
+    keys.add(1, 'c', 12)
+    assert keys.claim(1, 'a') == (False, None)
+
+
+def test_repeated_delivery_returns_original_log(make_app, webhook):
+    module = make_app(INGEST_DEDUP=dedup.DEDUP_HEADER)
+    client = module.app.test_client()
+    _, name = webhook
+    headers = {'Idempotency-Key': 'evt-1'}
+    first = client.post(f'/webhook/{name}', json={'a': 1}, headers=headers).json
+    second = client.post(f'/webhook/{name}', json={'a': 1}, headers=headers).json
+
+    assert second['duplicate'] is True
+    assert second['log_id'] == first['log_id']
+    with module.app.app_context():
+        assert module.WebhookLog.query.count() == 1
+
+
+def test_unique_index_race_resolves_to_original(make_app, webhook, monkeypatch):
+    module = make_app(INGEST_DEDUP=dedup.DEDUP_BODY)
+    webhook_id, name = webhook
+    key = dedup.dedup_key(dedup.DEDUP_BODY, {}, '{"a": 1}')
+
+    def row():
+        return {'webhook_id': webhook_id, 'method': 'POST', 'headers': '{}', 'body': '{"a": 1}',
+                'ip_address': '10.0.0.1', 'user_agent': '', 'timestamp': datetime.utcnow(), 'dedup_key': key}
+
+    with module.app.app_context():
+        original_id = module.store_webhook_logs([row()], return_ids=True)[0]
+
+        # Outro processo gravou a chave entre a consulta e o insert: a primeira
+        # consulta não vê o original, o índice único rejeita e a segunda vê
+        real = module.existing_dedup_ids
+        calls = []
+
+        def stale_first_lookup(rows):
+            calls.append(rows)
+            return {} if len(calls) == 1 else real(rows)
+
+        monkeypatch.setattr(module, 'existing_dedup_ids', stale_first_lookup)
+        ids = module.store_webhook_logs([row(), row()], return_ids=True)
+
+        assert ids == [original_id, original_id]
+        assert len(calls) == 2
+        assert module.WebhookLog.query.count() == 1
+        monkeypatch.setattr(module, 'existing_dedup_ids', real)
+
+    # Repetição atendida por outro worker (LRU vazio): o banco resolve, mesma resposta do LRU
+    client = module.app.test_client()
+    module.recent_dedup_keys.discard(webhook_id, key)
+    from_db = client.post(f'/webhook/{name}', data='{"a": 1}', content_type='application/json').json
+    from_cache = client.post(f'/webhook/{name}', data='{"a": 1}', content_type='application/json').json
+    for response in (from_db, from_cache):
+        assert response['status'] == 'duplicate'
+        assert response['duplicate'] is True
+        assert response['log_id'] == original_id
+    assert set(from_db) == set(from_cache)
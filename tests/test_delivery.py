@@ -0,0 +1,168 @@
+import socket
+import threading
+import time
+from datetime import datetime
+
+import pytest
+
+import delivery
+
+
+class RawServer:
+    """Servidor TCP mínimo: conta as requisições recebidas e responde conforme ``reply``"""
+
+    def __init__(self, reply):
+        self.reply = reply
+        self.requests = 0
+        self.sock = socket.socket()
+        self.sock.bind(('127.0.0.1', 0))
+        self.sock.listen(8)
+        self.url = f'http://127.0.0.1:{self.sock.getsockname()[1]}/hook'
+        threading.Thread(target=self._serve, daemon=True).start()
+
+    def _serve(self):
+        while True:
+            try:
+                conn, _ = self.sock.accept()
+            except OSError:
+                return
+            with conn:
+                data = b''
+                while b'\r\n\r\n' not in data:
+                    chunk = conn.recv(4096)
+                    if not chunk:
+                        break
+                    data += chunk
+                if data:
+                    self.requests += 1
+                    self.reply(conn)
+
+    def close(self):
+        self.sock.close()
+
+
+LOOPBACK = delivery.parse_allowlist('127.0.0.1')
+
+
+@pytest.mark.parametrize('url', [
+    'http://127.0.0.1/hook',
+    'http://localhost:8080/',
+    'http://169.254.169.254/latest/meta-data/',
+    'http://10.1.2.3/',
+    'http://[::1]/',
+    'http://[::ffff:192.168.0.1]/',
+    'ftp://example.com/',
+    'http:///sem-host',
+])
+def test_check_destination_rejects_internal_and_invalid_urls(url):
+    with pytest.raises(delivery.UnsafeDestination):
+        delivery.check_destination(url)
+
+
+def test_check_destination_allowlist_by_network_and_name():
+    assert [str(a) for a in delivery.check_destination('http://127.0.0.1:9/', LOOPBACK)] == ['127.0.0.1']
+    assert delivery.check_destination('http://10.1.2.3/', delivery.parse_allowlist('10.0.0.0/8'))
+    assert delivery.check_destination('http://localhost/', delivery.parse_allowlist('localhost'))
+    with pytest.raises(delivery.UnsafeDestination):
+        delivery.check_destination('http://10.1.2.3/', delivery.parse_allowlist('192.168.0.0/16'))
+
+
+def test_pool_refuses_internal_address_at_connect_time():
+    pool = delivery.HostConnectionPool(allowlist=delivery.parse_allowlist(''))
+    with pytest.raises(delivery.UnsafeDestination):
+        pool.request('POST', 'http://127.0.0.1:9/hook', b'{}')
+
+
+def test_pool_connects_to_the_validated_address(monkeypatch):
+    # O nome não resolve: a conexão só funciona se usar o IP validado
+    server = RawServer(lambda conn: conn.sendall(b'HTTP/1.1 200 OK\r\nContent-Length: 0\r\n\r\n'))
+    url = server.url.replace('127.0.0.1', 'destino.invalid')
+    checked = []
+    monkeypatch.setattr(delivery, 'check_destination', lambda u, allowlist: checked.append(u) or ['127.0.0.1'])
+    pool = delivery.HostConnectionPool(timeout=2, allowlist=LOOPBACK)
+    try:
+        assert pool.request('POST', url, b'{}') == 200
+        assert checked == [url] and server.requests == 1
+    finally:
+        server.close()
+        pool.close()
+
+
+def test_pool_does_not_resend_after_failure():
+    # Servidor lê a requisição e fecha sem responder: o pool não pode reenviar
+    server = RawServer(lambda conn: None)
+    pool = delivery.HostConnectionPool(timeout=2, allowlist=LOOPBACK)
+    try:
+        with pytest.raises(Exception):
+            pool.request('POST', server.url, b'{}', {'Content-Type': 'application/json'})
+        assert server.requests == 1
+    finally:
+        server.close()
+        pool.close()
+
+
+def test_pool_replaces_idle_connection_closed_by_server():
+    # Responde keep-alive e fecha logo em seguida: a próxima entrega abre conexão nova
+    server = RawServer(lambda conn: conn.sendall(b'HTTP/1.1 200 OK\r\nContent-Length: 0\r\n\r\n'))
+    pool = delivery.HostConnectionPool(timeout=2, allowlist=LOOPBACK)
+    try:
+        assert pool.request('POST', server.url, b'{}') == 200
+        time.sleep(0.1)
+        assert pool.request('POST', server.url, b'{}') == 200
+        assert server.requests == 2
+    finally:
+        server.close()
+        pool.close()
+
+
+def test_add_destination_rejects_internal_url(admin_client, webhook_app, webhook):
+    webhook_id, _ = webhook
+    response = admin_client.post(f'/webhook/{webhook_id}/destinations', data={'url': 'http://127.0.0.1:8080/'})
+    assert response.status_code == 302
+    with webhook_app.app.app_context():
+        assert webhook_app.WebhookDestination.query.count() == 0
+
+
+def test_add_destination_allowlisted(make_app, webhook):
+    module = make_app(DELIVERY_ALLOWED_HOSTS='127.0.0.0/8')
+    client = module.app.test_client()
+    client.post('/login', data={'username': 'admin', 'password': 'admin123'})
+    client.post(f'/webhook/{webhook[0]}/destinations', data={'url': 'http://127.0.0.1:8080/'})
+    with module.app.app_context():
+        assert module.WebhookDestination.query.count() == 1
+
+
+def test_claim_respects_concurrency_across_processes(webhook_app, webhook):
+    module = webhook_app
+    with module.app.app_context():
+        destination = module.WebhookDestination(webhook_id=webhook[0], url='http://example.com/', max_concurrency=2)
+        module.db.session.add(destination)
+        module.db.session.flush()
+        # Duas entregas em andamento em outro processo + uma pendente
+        for status in (delivery.IN_PROGRESS, delivery.IN_PROGRESS, delivery.PENDING):
+            module.db.session.add(module.DeliveryAttempt(
+                webhook_id=webhook[0], log_id=1, destination_id=destination.id,
+                status=status, updated_at=datetime.utcnow()
+            ))
+        module.db.session.commit()
+
+    assert module.claim_deliveries(10, {}) == []
+    with module.app.app_context():
+        assert module.DeliveryAttempt.query.filter_by(status=delivery.PENDING).count() == 1
+
+
+def test_blocked_destination_goes_to_dead_letter(webhook_app, webhook):
+    module = webhook_app
+    with module.app.app_context():
+        destination = module.WebhookDestination(webhook_id=webhook[0], url='http://example.com/')
+        module.db.session.add(destination)
+        module.db.session.flush()
+        attempt = module.DeliveryAttempt(webhook_id=webhook[0], log_id=1, destination_id=destination.id,
+                                         status=delivery.IN_PROGRESS)
+        module.db.session.add(attempt)
+        module.db.session.commit()
+        attempt_id = attempt.id
+
+    module.complete_delivery({'attempt_id': attempt_id}, None, 'UnsafeDestination: Destino em endereço interno')
+    with module.app.app_context():
+        assert module.db.session.get(module.DeliveryAttempt, attempt_id).status == delivery.DEAD
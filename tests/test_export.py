@@ -0,0 +1,40 @@
+import csv
+import gzip
+import io
+import json
+
+
+def post_logs(client, name, count):
+    for i in range(count):
+        client.post(f'/webhook/{name}', json={'i': i}, headers={'X-Test': str(i)})
+
+
+def test_ndjson_export_streams_every_log(admin_client, webhook, webhook_app, monkeypatch):
+    webhook_id, name = webhook
+    monkeypatch.setattr(webhook_app, 'EXPORT_BATCH_SIZE', 2)
+    post_logs(admin_client, name, 5)
+
+    response = admin_client.get(f'/api/webhooks/{webhook_id}/logs/export')
+    assert response.status_code == 200
+    assert response.is_streamed
+    assert response.mimetype == 'application/x-ndjson'
+    rows = [json.loads(line) for line in response.data.decode().splitlines()]
+    assert sorted(json.loads(row['body'])['i'] for row in rows) == [0, 1, 2, 3, 4]
+    assert all(json.loads(row['headers'])['X-Test'] for row in rows)
+
+
+def test_csv_export_with_gzip(admin_client, webhook):
+    webhook_id, name = webhook
+    post_logs(admin_client, name, 3)
+
+    response = admin_client.get(f'/api/webhooks/{webhook_id}/logs/export?format=csv&gzip=1')
+    assert response.mimetype == 'application/gzip'
+    assert response.headers['Content-Disposition'].endswith('.csv.gz"')
+    rows = list(csv.DictReader(io.StringIO(gzip.decompress(response.data).decode())))
+    assert len(rows) == 3
+    assert set(rows[0]) >= {'id', 'timestamp', 'method', 'body'}
+
+
+def test_export_rejects_unknown_format(admin_client, webhook):
+    webhook_id, _ = webhook
+    assert admin_client.get(f'/api/webhooks/{webhook_id}/logs/export?format=xml').status_code == 400
@@ -0,0 +1,56 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_import_has_no_side_effects(tmp_path):
+    instance = tmp_path / 'instance'
+    code = (
+        'import sys, threading, app, asgi_ingest; '
+        'assert app.metrics is None and app.ingest_queue is None and app.response_salt is None; '
+        'assert asgi_ingest.application.bridge is None; '
+        'assert "partitions" not in sys.modules and "zstandard" not in sys.modules; '
+        'print(threading.active_count())'
+    )
+    env = dict(os.environ, INSTANCE_DIR=str(instance), DATABASE_URL='sqlite:///' + str(tmp_path / 'x.db'))
+    output = subprocess.run([sys.executable, '-c', code], cwd=ROOT, env=env, capture_output=True, text=True)
+
+    assert output.returncode == 0, output.stderr
+    assert output.stdout.strip() == '1'
+    assert not instance.exists()
+    assert not (tmp_path / 'x.db').exists()
+
+
+def test_create_app_builds_components_from_config(make_app, tmp_path):
+    module = make_app(INGEST_MODE='queue', INGEST_BATCH_SIZE=7, RATE_LIMIT_STORE='memory',
+                      PAYLOAD_DIR=str(tmp_path / 'bodies'))
+
+    assert module.ingest_queue is not None
+    assert module.ingest_queue.batch_size == 7
+    assert type(module.rate_limit_store).__name__ == 'MemoryBucketStore'
+    assert module.payloads.root == str(tmp_path / 'bodies')
+    assert module.metrics.directory == str(tmp_path / 'instance' / 'metrics')
+    assert module.response_salt == module.build_response_salt()
+
+    previous = module.webhook_cache
+    module = make_app(INGEST_MODE='sync', RATE_LIMIT_STORE='sqlite')
+    assert module.ingest_queue is None
+    assert module.webhook_cache is not previous
+    assert type(module.rate_limit_store).__name__ == 'SQLiteBucketStore'
+
+
+def test_database_cannot_change_after_init(webhook_app):
+    with pytest.raises(RuntimeError):
+        webhook_app.create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://'})
+
+
+def test_requests_work_with_fresh_components(admin_client, webhook):
+    _, name = webhook
+    assert admin_client.post(f'/webhook/{name}', json={'a': 1}).status_code == 200
+    response = admin_client.get('/api/webhooks')
+    assert response.status_code == 200
+    assert [hook['name'] for hook in response.json] == [name]
@@ -0,0 +1,52 @@
+import json
+
+from field_extraction import FieldExtractor, load_paths
+
+
+def status_payload(status, recipient, code=None):
+    item = {'id': 'wamid.1', 'status': status, 'recipient_id': recipient}
+    if code is not None:
+        item['errors'] = [{'code': code}]
+    return {'object': 'whatsapp_business_account',
+            'entry': [{'changes': [{'field': 'messages', 'value': {'statuses': [item]}}]}]}
+
+
+def test_extracts_whatsapp_fields():
+    values = FieldExtractor().extract(json.dumps(status_payload('failed', '5511999990000', 131047)))
+    assert values == {
+        'event_object': 'whatsapp_business_account',
+        'event_field': 'messages',
+        'event_type': 'failed',
+        'message_id': 'wamid.1',
+        'sender': '5511999990000',
+        'error_code': '131047'
+    }
+
+
+def test_non_json_and_oversized_bodies_yield_empty_fields():
+    extractor = FieldExtractor(max_bytes=64)
+    assert set(extractor.extract('not json').values()) == {None}
+    assert set(extractor.extract(json.dumps({'object': 'x' * 100})).values()) == {None}
+
+
+def test_custom_paths_and_registered_extractor():
+    extractor = FieldExtractor(load_paths('{"event_type": "kind", "unknown": "x"}'))
+    extractor.register(lambda data: {'sender': data.get('user'), 'ignored': 1})
+    values = extractor.extract('{"kind": true, "user": "' + 'a' * 100 + '"}')
+    assert values['event_type'] == 'true'
+    assert values['sender'] == 'a' * 64
+    assert 'ignored' not in values
+
+
+def test_logs_api_filters_by_extracted_fields(admin_client, webhook):
+    webhook_id, name = webhook
+    admin_client.post(f'/webhook/{name}', json=status_payload('failed', '551100', 131047))
+    admin_client.post(f'/webhook/{name}', json=status_payload('read', '551100'))
+    admin_client.post(f'/webhook/{name}', json=status_payload('failed', '552200', 470))
+
+    def events(query):
+        logs = admin_client.get(f'/api/webhooks/{webhook_id}/logs?{query}').json['logs']
+        return sorted((log['fields']['event_type'], log['fields']['sender']) for log in logs)
+
+    assert events('event_type=failed') == [('failed', '551100'), ('failed', '552200')]
+    assert events('sender=551100&error_code=131047') == [('failed', '551100')]
@@ -0,0 +1,64 @@
+import pytest
+
+
+@pytest.fixture
+def admin_client(admin_client):
+    # Consumir a mensagem flash do login: com flashes pendentes não há ETag
+    admin_client.get('/')
+    return admin_client
+
+
+def get_api(client, etag=None):
+    headers = {'If-None-Match': etag} if etag else {}
+    return client.get('/api/webhooks', headers=headers)
+
+
+def test_unchanged_api_answers_304(admin_client, webhook):
+    first = get_api(admin_client)
+    assert first.status_code == 200 and first.headers['ETag']
+
+    second = get_api(admin_client, first.headers['ETag'])
+    assert second.status_code == 304
+    assert second.data == b''
+
+
+def test_ingest_invalidates_etag_immediately(admin_client, webhook, webhook_app, monkeypatch):
+    webhook_id, name = webhook
+    etag = get_api(admin_client).headers['ETag']
+    details = admin_client.get(f'/webhook/{webhook_id}')
+    assert details.status_code == 200 and details.headers['ETag']
+    bumps = []
+    real_bump = webhook_app.response_versions.store.bump
+    monkeypatch.setattr(webhook_app.response_versions.store, 'bump', lambda keys: bumps.append(list(keys)) or real_bump(keys))
+
+    admin_client.post(f'/webhook/{name}', json={'i': 1})
+    # Sem esperar o flush das estatísticas
+    assert bumps == [[f'webhook:{webhook_id}']]
+    assert get_api(admin_client, etag).status_code == 200
+    response = admin_client.get(f'/webhook/{webhook_id}', headers={'If-None-Match': details.headers['ETag']})
+    assert response.status_code == 200
+
+
+def test_stats_flush_bumps_once_per_webhook(admin_client, webhook, webhook_app, monkeypatch):
+    _, name = webhook
+    for i in range(5):
+        admin_client.post(f'/webhook/{name}', json={'i': i})
+    etag = get_api(admin_client).headers['ETag']
+    bumps = []
+    real_bump = webhook_app.response_versions.store.bump
+    monkeypatch.setattr(webhook_app.response_versions.store, 'bump', lambda keys: bumps.append(list(keys)) or real_bump(keys))
+
+    webhook_app.traffic_stats.flush()
+    assert bumps == [[f'webhook:{webhook[0]}']]
+    response = get_api(admin_client, etag)
+    assert response.status_code == 200
+    assert response.json[0]['request_count'] == 5
+
+
+def test_toggle_changes_etag_immediately(admin_client, webhook):
+    etag = get_api(admin_client).headers['ETag']
+    admin_client.post(f'/webhook/{webhook[0]}/toggle')
+    admin_client.get('/')
+    response = get_api(admin_client, etag)
+    assert response.status_code == 200
+    assert response.json == []
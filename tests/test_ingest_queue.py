@@ -0,0 +1,124 @@
+import json
+import threading
+
+import pytest
+
+import ingest_queue
+from ingest_queue import IngestQueue, QueueFull, ACK_AFTER_COMMIT, ACK_BEFORE_COMMIT
+
+
+class FlakyStore:
+    """flush_fn que falha o lote inteiro se alguma linha for 'ruim'"""
+
+    def __init__(self):
+        self.saved = []
+        self.batches = []
+
+    def __call__(self, rows, return_ids):
+        self.batches.append(len(rows))
+        if any(row.get('bad') for row in rows):
+            raise ValueError('linha inválida')
+        ids = []
+        for row in rows:
+            self.saved.append(row)
+            ids.append(len(self.saved))
+        return ids if return_ids else None
+
+
+def make_queue(store, durability, dead_letter=None):
+    # Lote grande e intervalo longo: as linhas enviadas juntas caem no mesmo lote
+    return IngestQueue(store, batch_size=10, flush_interval=0.2, durability=durability, dead_letter=dead_letter)
+
+
+def test_bad_row_does_not_drop_acknowledged_batch():
+    store = FlakyStore()
+    dead = []
+    ingest = make_queue(store, ACK_BEFORE_COMMIT, dead_letter=lambda row, error: dead.append((row, error)))
+    for i in range(5):
+        ingest.submit({'n': i, 'bad': i == 2})
+    ingest.stop()
+
+    assert store.batches[0] == 5
+    assert [row['n'] for row in store.saved] == [0, 1, 3, 4]
+    assert [row['n'] for row, _ in dead] == [2]
+    assert ingest.flushed == 4 and ingest.dropped == 1 and ingest.retried == 5
+
+
+def test_ack_after_commit_returns_ids_and_errors_per_row():
+    store = FlakyStore()
+    ingest = make_queue(store, ACK_AFTER_COMMIT)
+    pending = [ingest.submit({'n': i, 'bad': i == 1}) for i in range(3)]
+
+    assert pending[0].wait(5) == 1
+    with pytest.raises(ValueError):
+        pending[1].wait(5)
+    assert pending[2].wait(5) == 2
+    ingest.stop()
+
+
+def test_ack_before_commit_returns_immediately():
+    release = threading.Event()
+
+    def slow_store(rows, return_ids):
+        release.wait(5)
+
+    ingest = make_queue(slow_store, ACK_BEFORE_COMMIT)
+    assert ingest.submit({'n': 1}).wait(0) is None
+    release.set()
+    ingest.stop()
+    assert ingest.flushed == 1
+
+
+def test_atexit_registered_once(monkeypatch):
+    registered = []
+    monkeypatch.setattr(ingest_queue.atexit, 'register', registered.append)
+    ingest = make_queue(FlakyStore(), ACK_BEFORE_COMMIT)
+    ingest.submit({'n': 1})
+    # Thread recriada (como após um fork) não registra de novo
+    ingest._pid = None
+    ingest.submit({'n': 2})
+    ingest.stop()
+    assert registered == [ingest.stop]
+
+
+def test_submit_after_stop_is_rejected():
+    store = FlakyStore()
+    ingest = make_queue(store, ACK_BEFORE_COMMIT)
+    ingest.submit({'n': 1})
+    ingest.stop()
+    with pytest.raises(QueueFull):
+        ingest.submit({'n': 2})
+    assert [row['n'] for row in store.saved] == [1]
+    assert ingest.rejected == 1
+
+
+@pytest.mark.parametrize('durability', [ACK_BEFORE_COMMIT, ACK_AFTER_COMMIT])
+def test_queue_mode_persists_webhooks(make_app, durability):
+    module = make_app(INGEST_MODE='queue', INGEST_DURABILITY=durability)
+    with module.app.app_context():
+        admin = module.User.query.filter_by(username='admin').first()
+        module.db.session.add(module.Webhook(name='queued', token='t' * 32, user_id=admin.id))
+        module.db.session.commit()
+    client = module.app.test_client()
+
+    responses = [client.post('/webhook/queued', json={'i': i}) for i in range(3)]
+    assert all(response.status_code == 200 for response in responses)
+    if durability == ACK_AFTER_COMMIT:
+        assert all(response.json['log_id'] for response in responses)
+    else:
+        assert all(response.json['queued'] for response in responses)
+
+    module.ingest_queue.stop()
+    with module.app.app_context():
+        bodies = [json.loads(module.load_log_body(log)) for log in module.WebhookLog.query.order_by('id')]
+    assert bodies == [{'i': 0}, {'i': 1}, {'i': 2}]
+
+
+def test_failed_row_goes_to_dead_letter_file(make_app, tmp_path):
+    module = make_app(INGEST_MODE='queue', INGEST_DEAD_LETTER=str(tmp_path / 'dead.jsonl'))
+    module.write_dead_letter({'webhook_id': 1, 'body': 'x'}, ValueError('boom'))
+
+    with open(tmp_path / 'dead.jsonl') as f:
+        record = json.loads(f.readline())
+    assert record['row'] == {'webhook_id': 1, 'body': 'x'}
+    assert record['error'] == 'ValueError: boom'
@@ -0,0 +1,91 @@
+import json
+
+import pytest
+
+from live_tail import LogBroadcaster, TooManySubscribers
+
+
+def next_event(stream):
+    for message in stream:
+        if message.startswith('id:'):
+            return json.loads(message.split('data: ', 1)[1])
+
+
+def test_late_lower_ids_are_still_delivered():
+    broadcaster = LogBroadcaster(heartbeat=0.05)
+    stream = iter(broadcaster.stream(1, head_id=5))
+
+    broadcaster.publish(1, {'id': 10})
+    assert next_event(stream)['id'] == 10
+    # Gravado por outro worker antes, encontrado depois pelo poller
+    with broadcaster._cond:
+        broadcaster._append(broadcaster._channel(1), {'id': 8})
+    broadcaster.publish(1, {'id': 11})
+    assert next_event(stream)['id'] == 8
+    assert next_event(stream)['id'] == 11
+
+
+def test_history_and_duplicates_are_skipped():
+    broadcaster = LogBroadcaster(heartbeat=0.05)
+    stream = iter(broadcaster.stream(1, head_id=5, last_id=3, backlog=[{'id': 4}, {'id': 5}]))
+
+    assert next_event(stream)['id'] == 4
+    assert next_event(stream)['id'] == 5
+    broadcaster.publish(1, {'id': 5})
+    broadcaster.publish(1, {'id': 6})
+    broadcaster.publish(1, {'id': 6})
+    broadcaster.publish(1, {'id': 7})
+    assert [next_event(stream)['id'] for _ in range(2)] == [6, 7]
+
+
+def test_poller_fetches_logs_from_other_workers():
+    calls = []
+
+    def poll(webhook_id, after_id):
+        calls.append(after_id)
+        return [{'id': 21}, {'id': 20}] if len(calls) == 1 else []
+
+    broadcaster = LogBroadcaster(heartbeat=0.05, poll_fn=poll, poll_interval=0.01)
+    stream = iter(broadcaster.stream(1, head_id=19))
+    assert sorted(next_event(stream)['id'] for _ in range(2)) == [20, 21]
+    broadcaster.stop()
+    assert calls[0] == 19
+
+
+def test_subscriber_limit():
+    broadcaster = LogBroadcaster(max_subscribers=1)
+    stream = broadcaster.stream(1, head_id=0)
+    with pytest.raises(TooManySubscribers):
+        broadcaster.stream(1, head_id=0)
+    stream.close()
+    assert broadcaster.subscriber_count == 0
+    broadcaster.stream(1, head_id=0).close()
+
+
+def test_ingest_publishes_to_stream(admin_client, webhook, webhook_app):
+    webhook_id, name = webhook
+    response = admin_client.get(f'/webhook/{webhook_id}/stream')
+    assert response.mimetype == 'text/event-stream'
+    stream = iter(response.response)
+    log_id = admin_client.post(f'/webhook/{name}', json={'a': 1}).json['log_id']
+
+    for message in stream:
+        if isinstance(message, bytes):
+            message = message.decode()
+        if message.startswith('id:'):
+            break
+    assert message.startswith(f'id: {log_id}\n')
+    response.close()
+
+
+def test_resume_far_behind_pages_the_whole_gap(make_app, webhook):
+    module = make_app(LIVE_TAIL_BUFFER=2)
+    webhook_id, name = webhook
+    client = module.app.test_client()
+    ids = [client.post(f'/webhook/{name}', json={'i': i}).json['log_id'] for i in range(7)]
+    client.post('/login', data={'username': 'admin', 'password': 'admin123'})
+
+    response = client.get(f'/webhook/{webhook_id}/stream', headers={'Last-Event-ID': str(ids[0])})
+    stream = (m.decode() if isinstance(m, bytes) else m for m in response.response)
+    assert [next_event(stream)['id'] for _ in range(6)] == ids[1:]
+    response.close()
@@ -0,0 +1,37 @@
+def test_keyset_pages_cover_every_log_once(admin_client, webhook):
+    webhook_id, name = webhook
+    for i in range(7):
+        admin_client.post(f'/webhook/{name}', json={'i': i})
+    admin_client.put(f'/webhook/{name}', json={'i': 'put'})
+
+    seen = []
+    cursor = None
+    while True:
+        url = f'/api/webhooks/{webhook_id}/logs?limit=3' + (f'&before={cursor}' if cursor else '')
+        page = admin_client.get(url).json
+        assert len(page['logs']) <= 3
+        seen.extend(log['id'] for log in page['logs'])
+        cursor = page['next_cursor']
+        if not cursor:
+            break
+
+    assert len(seen) == 8
+    assert seen == sorted(seen, reverse=True)
+
+
+def test_method_filter_and_bad_cursor(admin_client, webhook):
+    webhook_id, name = webhook
+    admin_client.post(f'/webhook/{name}', json={})
+    admin_client.put(f'/webhook/{name}', json={})
+
+    logs = admin_client.get(f'/api/webhooks/{webhook_id}/logs?method=PUT').json['logs']
+    assert [log['method'] for log in logs] == ['PUT']
+    assert admin_client.get(f'/api/webhooks/{webhook_id}/logs?before=%%%').status_code == 400
+
+
+def test_logs_of_other_users_are_hidden(client, webhook):
+    webhook_id, _ = webhook
+    client.post('/register', data={'username': 'bob', 'email': 'bob@example.com',
+                                   'password': 'secret123', 'confirm_password': 'secret123'})
+    client.post('/login', data={'username': 'bob', 'password': 'secret123'})
+    assert client.get(f'/api/webhooks/{webhook_id}/logs').status_code == 404
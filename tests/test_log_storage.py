@@ -0,0 +1,66 @@
+import json
+
+import log_storage
+
+
+def test_split_headers_keeps_volatile_ones_out_of_the_set():
+    stable, volatile = log_storage.split_headers({
+        'Content-Type': 'application/json', 'User-Agent': 'meta', 'Content-Length': '12',
+        'X-Hub-Signature-256': 'sha256=ab', 'X-Request-Id': 'r1', 'Cookie': 'a=b', 'X-GitHub-Delivery': 'd1'
+    })
+    assert stable == {'Content-Type': 'application/json', 'User-Agent': 'meta'}
+    assert set(volatile) == {'Content-Length', 'X-Hub-Signature-256', 'X-Request-Id', 'Cookie', 'X-GitHub-Delivery'}
+
+
+def test_merge_headers():
+    assert log_storage.merge_headers(None, None) is None
+    assert log_storage.merge_headers('{"a": "1"}', None) == '{"a": "1"}'
+    assert log_storage.merge_headers(None, '{"b": "2"}') == '{"b": "2"}'
+    assert json.loads(log_storage.merge_headers('{"a": "1"}', '{"b": "2"}')) == {'a': '1', 'b': '2'}
+
+
+def test_body_compression_round_trip():
+    body = json.dumps({'text': 'x' * 5000})
+    stored, blob, codec, size = log_storage.encode_body(body, 1024, log_storage.CODEC_ZLIB)
+    assert stored is None and codec == log_storage.CODEC_ZLIB and size == len(body)
+    assert len(blob) < size
+    assert log_storage.decode_body(stored, blob, codec) == body
+    assert log_storage.encode_body('curto', 1024, log_storage.CODEC_ZLIB) == ('curto', None, None, 5)
+
+
+def test_deliveries_share_one_header_set(admin_client, webhook, webhook_app):
+    webhook_id, name = webhook
+    for i in range(5):
+        body = json.dumps({'i': i, 'pad': 'y' * i})
+        admin_client.post(f'/webhook/{name}', data=body, content_type='application/json',
+                          headers={'X-Hub-Signature-256': f'sha256={i}', 'X-Request-Id': str(i)})
+
+    with webhook_app.app.app_context():
+        assert webhook_app.HeaderSet.query.count() == 1
+        log_id = webhook_app.WebhookLog.query.order_by(webhook_app.WebhookLog.id.desc()).first().id
+
+    details = admin_client.get(f'/api/webhooks/{webhook_id}/logs/{log_id}').json
+    assert details['headers']['X-Request-Id'] == '4'
+    assert details['headers']['X-Hub-Signature-256'] == 'sha256=4'
+    assert details['headers']['Content-Type'] == 'application/json'
+
+
+def test_large_bodies_are_stored_compressed(admin_client, webhook, webhook_app):
+    webhook_id, name = webhook
+    body = json.dumps({'text': 'olá ' * 2000})
+    log_id = admin_client.post(f'/webhook/{name}', data=body, content_type='application/json').json['log_id']
+
+    with webhook_app.app.app_context():
+        log = webhook_app.db.session.get(webhook_app.WebhookLog, log_id)
+        assert log.body is None and log.body_codec == webhook_app.app.config['LOG_BODY_CODEC']
+    assert admin_client.get(f'/api/webhooks/{webhook_id}/logs/{log_id}').json['body'] == body
+
+
+def test_legacy_rows_with_inline_headers(admin_client, webhook, webhook_app):
+    webhook_id, _ = webhook
+    with webhook_app.app.app_context():
+        log = webhook_app.WebhookLog(webhook_id=webhook_id, method='POST', headers='{"A": "1"}', body='{}')
+        webhook_app.db.session.add(log)
+        webhook_app.db.session.commit()
+        log_id = log.id
+    assert admin_client.get(f'/api/webhooks/{webhook_id}/logs/{log_id}').json['headers'] == {'A': '1'}
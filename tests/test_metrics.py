@@ -0,0 +1,81 @@
+import json
+import os
+import subprocess
+import sys
+
+from metrics import MetricsRegistry, COUNTER, GAUGE, SUM, MIN, ARCHIVE_FILE
+
+
+def dead_pid():
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait()
+    return process.pid
+
+
+def write_snapshot(directory, pid, value):
+    snapshot = {'pid': pid, 'counters': [['hits_total', {'route': 'a'}, value]],
+                'gauges': [['depth', {}, 7]], 'histograms': []}
+    with open(os.path.join(directory, f'{pid}.json'), 'w') as f:
+        json.dump(snapshot, f)
+
+
+def registry(directory):
+    metrics = MetricsRegistry(str(directory))
+    metrics.describe('hits_total', COUNTER, 'Hits')
+    return metrics
+
+
+def test_dead_worker_is_folded_into_archive(tmp_path):
+    pid = dead_pid()
+    write_snapshot(tmp_path, pid, 5)
+    metrics = registry(tmp_path)
+    metrics.inc('hits_total', route='a')
+
+    assert 'hits_total{route="a"} 6' in metrics.render()
+    assert not (tmp_path / f'{pid}.json').exists()
+    assert 'depth' not in metrics.render()
+    # Arquivado uma vez só
+    assert 'hits_total{route="a"} 6' in metrics.render()
+
+
+def test_reused_pid_does_not_make_counters_go_backwards(tmp_path):
+    # Arquivo deixado por um processo antigo com o mesmo PID deste
+    write_snapshot(tmp_path, os.getpid(), 10)
+    metrics = registry(tmp_path)
+    metrics.inc('hits_total', 2, route='a')
+    metrics.sync()
+
+    with open(tmp_path / ARCHIVE_FILE) as f:
+        archive = json.load(f)
+    assert archive['counters'] == [['hits_total', {'route': 'a'}, 10]]
+    assert 'hits_total{route="a"} 12' in metrics.render()
+
+
+def test_live_worker_snapshot_is_summed(tmp_path):
+    write_snapshot(tmp_path, os.getppid(), 3)
+    metrics = registry(tmp_path)
+    metrics.inc('hits_total', route='a')
+
+    text = metrics.render()
+    assert 'hits_total{route="a"} 4' in text
+    assert 'depth 7' in text
+
+
+def test_gauges_are_not_multiplied_by_worker_count(tmp_path):
+    metrics = MetricsRegistry(str(tmp_path))
+    metrics.describe('queue_depth', GAUGE, 'Fila', None, SUM)
+    metrics.describe('replica_healthy', GAUGE, 'Réplica', None, MIN)
+    metrics.describe('latency_seconds', GAUGE, 'Latência')
+    # Outro worker vivo (o processo pai) e este processo, via coletor
+    other = {'pid': os.getppid(), 'counters': [], 'histograms': [], 'gauges': [
+        ['queue_depth', {}, 3], ['replica_healthy', {}, 1], ['latency_seconds', {}, 0.25]
+    ]}
+    with open(tmp_path / f'{os.getppid()}.json', 'w') as f:
+        json.dump(other, f)
+    metrics.add_collector(lambda: [(GAUGE, 'queue_depth', {}, 2), (GAUGE, 'replica_healthy', {}, 1),
+                                   (GAUGE, 'latency_seconds', {}, 0.5)])
+
+    text = metrics.render()
+    assert 'queue_depth 5' in text
+    assert 'replica_healthy 1' in text
+    assert 'latency_seconds 0.5' in text
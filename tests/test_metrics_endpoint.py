@@ -0,0 +1,24 @@
+REMOTE = {'REMOTE_ADDR': '203.0.113.9'}
+
+
+def test_metrics_without_token_only_for_localhost(client, webhook):
+    webhook_id, name = webhook
+    client.post(f'/webhook/{name}', json={})
+
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    text = response.data.decode()
+    assert f'webhook_ingest_total{{status="200",webhook_id="{webhook_id}"}} 1' in text
+    assert name not in text
+    assert 'http_request_duration_seconds_bucket' in text
+
+    assert client.get('/metrics', environ_base=REMOTE).status_code == 403
+
+
+def test_metrics_token(make_app):
+    webhook_app = make_app(METRICS_TOKEN='s3cret')
+    client = webhook_app.app.test_client()
+
+    assert client.get('/metrics').status_code == 401
+    assert client.get('/metrics', headers={'Authorization': 'Bearer errado'}, environ_base=REMOTE).status_code == 401
+    assert client.get('/metrics', headers={'Authorization': 'Bearer s3cret'}, environ_base=REMOTE).status_code == 200
@@ -0,0 +1,110 @@
+import json
+import time
+
+import pytest
+
+
+def status_payload(padding):
+    return json.dumps({
+        'object': 'whatsapp_business_account',
+        'entry': [{'changes': [{'field': 'messages', 'value': {
+            'statuses': [{'id': 'wamid.big', 'status': 'delivered', 'recipient_id': '5511999990000'}],
+            'note': 'tartaruga ' + 'x' * padding
+        }}]}]
+    })
+
+
+@pytest.fixture
+def spill_app(make_app):
+    return make_app(INGEST_SPILL_THRESHOLD=512, INGEST_MAX_BODY_BYTES=64 * 1024, PAYLOAD_PREVIEW_BYTES=100)
+
+
+@pytest.fixture
+def spill_client(spill_app):
+    client = spill_app.app.test_client()
+    assert client.post('/login', data={'username': 'admin', 'password': 'admin123'}).status_code == 302
+    return client
+
+
+def post_raw(client, name, body):
+    return client.post(f'/webhook/{name}', data=body, content_type='application/json')
+
+
+def test_spilled_body_is_stored_on_disk_with_fields(spill_app, spill_client, webhook):
+    webhook_id, name = webhook
+    body = status_payload(4096)
+    log_id = post_raw(spill_client, name, body).json['log_id']
+
+    with spill_app.app.app_context():
+        log = spill_app.db.session.get(spill_app.WebhookLog, log_id)
+        assert log.body_codec == spill_app.log_storage.CODEC_FILE
+        assert spill_app.payloads.exists(log.body_ref)
+        assert (log.event_type, log.sender, log.body_size) == ('delivered', '5511999990000', len(body))
+
+    details = spill_client.get(f'/api/webhooks/{webhook_id}/logs/{log_id}').json
+    assert details['body_truncated'] is True
+    assert len(details['body']) == 100
+
+
+def test_spilled_body_above_extract_limit_has_no_fields(make_app, webhook):
+    module = make_app(INGEST_SPILL_THRESHOLD=512, LOG_EXTRACT_MAX_BYTES=1024)
+    log_id = post_raw(module.app.test_client(), webhook[1], status_payload(4096)).json['log_id']
+    with module.app.app_context():
+        assert module.db.session.get(module.WebhookLog, log_id).event_type is None
+
+
+def test_spilled_body_is_searchable(spill_app, spill_client, webhook):
+    webhook_id, name = webhook
+    log_id = post_raw(spill_client, name, status_payload(4096)).json['log_id']
+    # Pelo lock do indexador, sem concorrer com a thread de fundo
+    while spill_app.search_indexer.run_once() is None:
+        time.sleep(0.01)
+    results = spill_client.get(f'/api/webhooks/{webhook_id}/logs/search?q=tartaruga').json['results']
+    assert [result['id'] for result in results] == [log_id]
+
+
+def test_body_larger_than_limit_is_rejected(spill_client, webhook):
+    assert post_raw(spill_client, webhook[1], status_payload(70 * 1024)).status_code == 413
+
+
+@pytest.mark.parametrize('padding', [4096, 10])
+def test_body_range_requests(spill_client, webhook, padding):
+    webhook_id, name = webhook
+    body = status_payload(padding).encode()
+    log_id = post_raw(spill_client, name, body).json['log_id']
+    url = f'/api/webhooks/{webhook_id}/logs/{log_id}/body'
+
+    full = spill_client.get(url)
+    assert full.status_code == 200
+    assert full.data == body
+    assert full.headers['Accept-Ranges'] == 'bytes'
+
+    part = spill_client.get(url, headers={'Range': 'bytes=10-19'})
+    assert part.status_code == 206
+    assert part.data == body[10:20]
+    assert part.headers['Content-Range'] == f'bytes 10-19/{len(body)}'
+
+    tail = spill_client.get(url, headers={'Range': 'bytes=-5'})
+    assert tail.data == body[-5:]
+
+    assert spill_client.get(url, headers={'Range': f'bytes={len(body) + 10}-'}).status_code == 416
+    assert spill_client.get(url, headers={'If-None-Match': full.headers['ETag']}).status_code == 304
+    # If-Range com validador antigo: corpo inteiro
+    stale = spill_client.get(url, headers={'Range': 'bytes=0-0', 'If-Range': '"outro"'})
+    assert stale.status_code == 200 and stale.data == body
+
+
+def test_extract_fields_command_keeps_spilled_fields(spill_app, webhook):
+    import compact_logs
+
+    log_id = post_raw(spill_app.app.test_client(), webhook[1], status_payload(4096)).json['log_id']
+    with spill_app.app.app_context():
+        log = spill_app.db.session.get(spill_app.WebhookLog, log_id)
+        log.event_type = log.sender = None
+        spill_app.db.session.commit()
+
+        compact_logs.extract_fields(spill_app.Webhook.query.all())
+        spill_app.db.session.expire_all()
+        log = spill_app.db.session.get(spill_app.WebhookLog, log_id)
+        assert log.body_codec == spill_app.log_storage.CODEC_FILE
+        assert (log.event_type, log.sender) == ('delivered', '5511999990000')
@@ -0,0 +1,69 @@
+import pytest
+
+from rate_limit import LoadShedder, MemoryBucketStore, SQLiteBucketStore, refill
+
+
+def test_refill():
+    assert refill(0.0, 0.0, rate=2, burst=5, now=1.0) == (1.0, None)
+    tokens, wait = refill(0.0, 0.0, rate=2, burst=5, now=0.25)
+    assert tokens == 0.5 and wait == pytest.approx(0.25)
+    assert refill(1.0, 0.0, rate=2, burst=5, now=100.0) == (4.0, None)
+
+
+@pytest.mark.parametrize('shared', [False, True])
+def test_bucket_allows_burst_then_limits(tmp_path, shared):
+    if shared:
+        path = str(tmp_path / 'buckets.sqlite')
+        workers = [SQLiteBucketStore(path), SQLiteBucketStore(path)]
+    else:
+        store = MemoryBucketStore()
+        workers = [store, store]
+
+    results = [workers[i % 2].take('webhook:1', 1.0, 3, 100.0) for i in range(4)]
+    assert results[:3] == [None, None, None]
+    assert results[3] == pytest.approx(1.0)
+    assert workers[0].take('webhook:2', 1.0, 3, 100.0) is None
+    # Um segundo depois há uma ficha de novo
+    assert workers[1].take('webhook:1', 1.0, 3, 101.0) is None
+
+
+def test_load_shedder():
+    shedder = LoadShedder(max_queue_depth=10, max_db_latency=0.5, alpha=1.0)
+    assert not shedder.should_shed(queue_depth=9)
+    assert shedder.should_shed(queue_depth=10)
+    shedder.observe_db_latency(0.6)
+    assert shedder.should_shed()
+
+
+def test_per_webhook_limit_returns_429(admin_client, webhook, webhook_app):
+    webhook_id, name = webhook
+    admin_client.post(f'/webhook/{webhook_id}/rate-limit', data={'rate_limit': '0.01', 'rate_limit_burst': '2'})
+
+    statuses = [admin_client.post(f'/webhook/{name}', json={}).status_code for _ in range(3)]
+    assert statuses == [200, 200, 429]
+    response = admin_client.post(f'/webhook/{name}', json={})
+    assert int(response.headers['Retry-After']) >= 1
+
+
+def test_per_ip_limit(make_app, webhook):
+    webhook_app = make_app(RATE_LIMIT_IP_RPS=0.01, RATE_LIMIT_IP_BURST=1)
+    client = webhook_app.app.test_client()
+    _, name = webhook
+
+    assert client.post(f'/webhook/{name}', json={}).status_code == 200
+    assert client.post(f'/webhook/{name}', json={}).status_code == 429
+    other_ip = {'REMOTE_ADDR': '198.51.100.7'}
+    assert client.post(f'/webhook/{name}', json={}, environ_base=other_ip).status_code == 200
+
+
+def test_shedding_accepts_without_storing_body(make_app, webhook):
+    webhook_app = make_app(SHED_DB_LATENCY_MS=1)
+    webhook_app.load_shedder.db_latency = 1.0
+    _, name = webhook
+
+    response = webhook_app.app.test_client().post(f'/webhook/{name}', json={'a': 1})
+    assert response.status_code == 200
+    with webhook_app.app.app_context():
+        log = webhook_app.WebhookLog.query.one()
+        assert webhook_app.load_log_body(log) is None
+    assert webhook_app.load_shedder.shed == 1
@@ -0,0 +1,67 @@
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+import delivery
+import replay
+
+
+@pytest.fixture
+def stub():
+    server = replay.StubServer().start()
+    yield server
+    server.stop()
+
+
+def jobs(count, step=0.0):
+    start = datetime(2024, 1, 1)
+    return [{'timestamp': start + timedelta(seconds=i * step), 'method': 'POST' if i % 2 else 'PUT',
+             'headers': {'Content-Type': 'application/json'}, 'body': b'{}'} for i in range(count)]
+
+
+def test_replayer_sends_every_job_to_stub(stub):
+    report = replay.Replayer(stub.url, speed=0, concurrency=3).run(jobs(10))
+    assert stub.received == 10
+    assert stub.server.methods == {'POST': 5, 'PUT': 5}
+    assert report['sent'] == 10 and report['failed'] == 0
+    assert report['statuses'] == {'2xx': 10}
+
+
+def test_replayer_keeps_original_pace(stub):
+    started = time.monotonic()
+    replay.Replayer(stub.url, speed=10, concurrency=2).run(jobs(3, step=1.0))
+    # 2s de intervalo original a 10x = 0.2s
+    assert time.monotonic() - started >= 0.18
+
+
+def test_replayer_blocks_internal_target(stub):
+    replayer = replay.Replayer(stub.url, speed=0, allowlist=delivery.parse_allowlist(''))
+    report = replayer.run(jobs(2))
+    assert stub.received == 0
+    assert report['errors'] == {'UnsafeDestination': 2}
+
+
+def test_api_rejects_internal_target(admin_client, webhook, stub):
+    response = admin_client.post(f'/api/webhooks/{webhook[0]}/replays', json={'target': stub.url, 'speed': 'max'})
+    assert response.status_code == 400
+    assert 'interno' in response.json['error']
+
+
+def test_api_replays_logs_to_allowed_stub(make_app, webhook, stub):
+    module = make_app(DELIVERY_ALLOWED_HOSTS='127.0.0.1')
+    client = module.app.test_client()
+    client.post('/login', data={'username': 'admin', 'password': 'admin123'})
+    webhook_id, name = webhook
+    for i in range(4):
+        client.post(f'/webhook/{name}', json={'i': i})
+
+    run = client.post(f'/api/webhooks/{webhook_id}/replays', json={'target': stub.url, 'speed': 'max'}).json
+    deadline = time.monotonic() + 10
+    while run['status'] == replay.RUNNING and time.monotonic() < deadline:
+        time.sleep(0.05)
+        run = client.get(f'/api/webhooks/{webhook_id}/replays/{run["id"]}').json
+
+    assert run['status'] == replay.FINISHED
+    assert stub.received == 4
+    assert run['report']['succeeded'] == 4
@@ -0,0 +1,52 @@
+from datetime import datetime, timedelta
+
+
+def post_logs(client, name, count, headers=None):
+    return [client.post(f'/webhook/{name}', json={'i': i}, headers=headers).json['log_id'] for i in range(count)]
+
+
+def test_max_rows_keeps_newest_logs(admin_client, webhook, webhook_app):
+    webhook_id, name = webhook
+    ids = post_logs(admin_client, name, 6)
+    with webhook_app.app.app_context():
+        hook = webhook_app.db.session.get(webhook_app.Webhook, webhook_id)
+        hook.retention_max_rows = 2
+        webhook_app.db.session.commit()
+        deleted = webhook_app.enforce_retention(pause=0)
+        remaining = [log.id for log in webhook_app.WebhookLog.query.order_by('id')]
+
+    assert deleted == {name: 4}
+    assert remaining == ids[-2:]
+
+
+def test_age_limit_deletes_old_logs(make_app, admin_client, webhook):
+    webhook_app = make_app(LOG_RETENTION_DAYS=7)
+    webhook_id, name = webhook
+    old_id, new_id = post_logs(admin_client, name, 2)
+    with webhook_app.app.app_context():
+        webhook_app.db.session.get(webhook_app.WebhookLog, old_id).timestamp = datetime.utcnow() - timedelta(days=8)
+        webhook_app.db.session.commit()
+        webhook_app.enforce_retention(pause=0)
+        assert [log.id for log in webhook_app.WebhookLog.query] == [new_id]
+
+
+def test_header_set_gc_does_not_break_later_deliveries(admin_client, webhook, webhook_app):
+    import compact_logs
+
+    webhook_id, name = webhook
+    headers = {'X-Provider': 'meta'}
+    post_logs(admin_client, name, 2, headers)
+    with webhook_app.app.app_context():
+        webhook_app.WebhookLog.query.delete()
+        webhook_app.db.session.commit()
+        # Conjunto órfão, mas o processo já o gravou antes
+        assert compact_logs.gc_header_sets() == 1
+        assert webhook_app.HeaderSet.query.count() == 0
+
+    log_id = post_logs(admin_client, name, 1, headers)[0]
+    with webhook_app.app.app_context():
+        log = webhook_app.db.session.get(webhook_app.WebhookLog, log_id)
+        assert webhook_app.db.session.get(webhook_app.HeaderSet, log.headers_hash) is not None
+        assert compact_logs.gc_header_sets() == 0
+    headers = admin_client.get(f'/api/webhooks/{webhook_id}/logs/{log_id}').json['headers']
+    assert headers['X-Provider'] == 'meta'
@@ -0,0 +1,90 @@
+import time
+
+import search_index
+
+
+def index_all(webhook_app):
+    # Pelo lock do indexador, sem concorrer com a thread de fundo
+    while webhook_app.search_indexer.run_once() is None:
+        time.sleep(0.01)
+
+
+def post_texts(client, name, texts):
+    return [client.post(f'/webhook/{name}', json={'text': text}).json['log_id'] for text in texts]
+
+
+def test_search_pages_by_cursor(admin_client, webhook_app, webhook):
+    webhook_id, name = webhook
+    ids = post_texts(admin_client, name, ['pedido pago', 'pedido pago pago', 'pedido cancelado', 'outro', 'pedido pago'])
+    index_all(webhook_app)
+
+    seen = []
+    cursor = None
+    while True:
+        url = f'/api/webhooks/{webhook_id}/logs/search?q=pedido&limit=2' + (f'&after={cursor}' if cursor else '')
+        page = admin_client.get(url).json
+        assert len(page['results']) <= 2
+        seen.extend(result['id'] for result in page['results'])
+        assert all('<mark>' in result['highlight'] for result in page['results'])
+        cursor = page['next_cursor']
+        if not cursor:
+            break
+
+    assert sorted(seen) == sorted(ids[:3] + ids[4:])
+    assert len(seen) == len(set(seen))
+
+
+def test_search_rejects_bad_cursor(admin_client, webhook):
+    webhook_id, _ = webhook
+    response = admin_client.get(f'/api/webhooks/{webhook_id}/logs/search?q=x&after=%%%')
+    assert response.status_code == 400
+
+
+def test_like_fallback_without_fulltext(admin_client, webhook_app, webhook):
+    webhook_id, name = webhook
+    ids = post_texts(admin_client, name, ['desconto 50% hoje', 'desconto 500 hoje', 'Desconto 50% amanhã'])
+    index_all(webhook_app)
+
+    with webhook_app.app.app_context():
+        session = webhook_app.db.session
+        hits = search_index._like_search(session, webhook_id, ['desconto', '50%'], limit=1, after=None)
+        assert [hit[0] for hit in hits] == [ids[2]]
+        assert '<mark>' in hits[0][2]
+        hits = search_index._like_search(session, webhook_id, ['desconto', '50%'], limit=5, after=(hits[-1][1], hits[-1][0]))
+        assert [hit[0] for hit in hits] == [ids[0]]
+
+
+def test_late_low_id_and_bad_body_do_not_block_indexer(make_app, webhook):
+    # Sem a thread de fundo: só as chamadas abaixo indexam
+    module = make_app(SEARCH_INDEX=False)
+    webhook_id, name = webhook
+    client = module.app.test_client()
+    ids = post_texts(client, name, [f'mensagem {i}' for i in range(6)])
+
+    def decode(body, blob, codec, ref, limit):
+        if 'mensagem 3' in (body or ''):
+            raise ValueError('corpo corrompido')
+        return module.decode_stored_body(body, blob, codec, ref, limit=limit)
+
+    def index_all_pending():
+        total = 0
+        while True:
+            indexed = search_index.index_pending(module.db.session, module.WebhookLog, module.WebhookLogSearch,
+                                                 decode, batch_size=2)
+            if not indexed:
+                return total
+            total += indexed
+
+    with module.app.app_context():
+        assert index_all_pending() == 6
+        # Como se o primeiro log tivesse sido confirmado depois dos outros
+        module.db.session.execute(module.WebhookLogSearch.__table__.delete().where(
+            module.WebhookLogSearch.log_id == ids[0]
+        ))
+        module.db.session.commit()
+        assert index_all_pending() == 1
+        indexed = dict(module.db.session.query(module.WebhookLogSearch.log_id, module.WebhookLogSearch.content))
+
+    assert set(indexed) == set(ids)
+    assert indexed[ids[3]] == ''
+    assert 'mensagem 0' in indexed[ids[0]]
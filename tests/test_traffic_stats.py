@@ -0,0 +1,44 @@
+from datetime import datetime
+
+from traffic_stats import StatsCollector
+
+
+def test_failed_flush_keeps_counts():
+    calls = []
+
+    def flush(counts, last_seen):
+        calls.append(dict(counts))
+        if len(calls) == 1:
+            raise RuntimeError('banco fora')
+
+    stats = StatsCollector(flush, interval=60)
+    now = datetime(2024, 1, 1, 12, 0, 30)
+    stats.record(1, 'POST', 200, now)
+    stats.record(1, 'POST', 200, now)
+    stats.flush()
+    stats.record(1, 'PUT', 200, now)
+    stats.flush()
+
+    minute = datetime(2024, 1, 1, 12, 0)
+    assert calls[1] == {(1, minute, 'POST', 200): 2, (1, minute, 'PUT', 200): 1}
+    assert stats.pending(1) == 0
+    stats.stop()
+
+
+def test_stats_api_reads_rollups(admin_client, webhook, webhook_app):
+    webhook_id, name = webhook
+    for _ in range(3):
+        admin_client.post(f'/webhook/{name}', json={})
+    admin_client.put(f'/webhook/{name}', json={})
+    admin_client.post('/webhook/nao_existe', json={})
+    webhook_app.traffic_stats.flush()
+    webhook_app.traffic_stats.flush()  # nada pendente: não grava de novo
+
+    data = admin_client.get(f'/api/webhooks/{webhook_id}/stats?range=1h').json
+    assert data['total'] == 4
+    assert data['request_count'] == 4
+    assert data['last_request'] is not None
+    point = data['series'][-1]
+    assert point['by_method'] == {'POST': 3, 'PUT': 1}
+    assert point['by_status'] == {'200': 4}
+    assert admin_client.get(f'/api/webhooks/{webhook_id}/stats?range=2y').status_code == 400
@@ -0,0 +1,95 @@
+import threading
+import time
+
+import pytest
+
+import user_session
+from conftest import ADMIN
+
+BOB = {'username': 'bob', 'password': 'secret123'}
+
+
+@pytest.fixture
+def loads(webhook_app, monkeypatch):
+    """Ids de usuário carregados do banco pelo cache"""
+    calls = []
+    real = webhook_app.load_cached_user
+    monkeypatch.setattr(webhook_app.user_cache, 'loader', lambda user_id: calls.append(user_id) or real(user_id))
+    return calls
+
+
+def login(webhook_app, credentials):
+    client = webhook_app.app.test_client()
+    assert client.post('/login', data=credentials).status_code == 302
+    return client
+
+
+def user_id(webhook_app, username):
+    with webhook_app.app.app_context():
+        return webhook_app.User.query.filter_by(username=username).first().id
+
+
+def test_user_cache_has_its_own_settings(make_app):
+    module = make_app(USER_CACHE_SIZE=3, USER_CACHE_NEGATIVE_TTL=0, WEBHOOK_CACHE_SIZE=99)
+    assert module.user_cache.maxsize == 3
+    assert module.user_cache.negative_ttl == 0
+    assert module.webhook_cache.maxsize == 99
+
+
+def test_session_identity_skips_the_database(webhook_app, loads):
+    client = login(webhook_app, ADMIN)
+    for _ in range(3):
+        assert client.get('/api/dashboard/summary').status_code == 200
+    assert loads == []
+
+
+def test_changing_one_user_keeps_other_sessions(webhook_app, client, loads):
+    client.post('/register', data={'username': 'bob', 'email': 'bob@example.com',
+                                   'password': 'secret123', 'confirm_password': 'secret123'})
+    admin = login(webhook_app, ADMIN)
+    bob = login(webhook_app, BOB)
+    bob_id = user_id(webhook_app, 'bob')
+
+    with webhook_app.app.app_context():
+        webhook_app.db.session.get(webhook_app.User, bob_id).is_active = False
+        webhook_app.db.session.commit()
+
+    assert admin.get('/api/dashboard/summary').status_code == 200
+    assert loads == []
+    # Só a sessão do usuário alterado é revalidada (e encerrada)
+    assert bob.get('/api/dashboard/summary').status_code == 302
+    assert loads == [bob_id]
+
+
+def test_hasher_timeout_is_busy_and_keeps_the_slot():
+    release = threading.Event()
+    hasher = user_session.PasswordHasher(workers=1, max_pending=1, timeout=0.05)
+    try:
+        with pytest.raises(user_session.HasherBusy):
+            hasher._run(release.wait, 5)
+        # O hash ainda está rodando: a vaga não foi devolvida
+        with pytest.raises(user_session.HasherBusy):
+            hasher._run(lambda: True)
+        release.set()
+        hasher.timeout = 5
+        for _ in range(50):
+            try:
+                assert hasher._run(lambda: True) is True
+                break
+            except user_session.HasherBusy:
+                time.sleep(0.01)
+        else:
+            pytest.fail('vaga não devolvida depois do hash')
+    finally:
+        release.set()
+        hasher.close()
+
+
+def test_slow_login_hash_answers_503(webhook_app, client, monkeypatch):
+    release = threading.Event()
+    monkeypatch.setattr(webhook_app.password_hasher, 'timeout', 0.05)
+    monkeypatch.setattr(user_session, 'check_password_hash', lambda *args: release.wait(5))
+    try:
+        assert client.post('/login', data=ADMIN).status_code == 503
+    finally:
+        release.set()
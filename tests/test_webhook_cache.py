@@ -0,0 +1,61 @@
+from webhook_cache import WebhookCache, CachedWebhook
+
+
+class Loader:
+    def __init__(self, webhooks):
+        self.webhooks = webhooks
+        self.calls = 0
+
+    def __call__(self, name):
+        self.calls += 1
+        return self.webhooks.get(name)
+
+
+def test_hits_and_negative_entries_skip_the_loader():
+    loader = Loader({'a': CachedWebhook(1, 'a', 't', True)})
+    cache = WebhookCache(loader, ttl=60, negative_ttl=60)
+
+    assert cache.get('a').id == 1
+    assert cache.get('a').id == 1
+    assert cache.get('missing') is None
+    assert cache.get('missing') is None
+    assert loader.calls == 2
+    assert (cache.hits, cache.misses) == (2, 2)
+
+
+def test_inactive_webhook_is_not_resolved():
+    cache = WebhookCache(Loader({'a': CachedWebhook(1, 'a', 't', False)}))
+    assert cache.get_active('a') is None
+
+
+def test_lru_eviction():
+    loader = Loader({name: CachedWebhook(i, name, 't', True) for i, name in enumerate('abc')})
+    cache = WebhookCache(loader, maxsize=2)
+    for name in 'abca':
+        cache.get(name)
+    assert loader.calls == 4
+
+
+def test_invalidation_reaches_other_processes(tmp_path):
+    stamp = str(tmp_path / 'cache.stamp')
+    webhooks = {'a': CachedWebhook(1, 'a', 't', True)}
+    loader = Loader(webhooks)
+    worker_1 = WebhookCache(loader, stamp_path=stamp, stamp_interval=0)
+    worker_2 = WebhookCache(loader, stamp_path=stamp, stamp_interval=0)
+    worker_2.get('a')
+
+    webhooks['a'] = CachedWebhook(1, 'a', 't', False)
+    worker_1.invalidate('a')
+
+    assert worker_2.get_active('a') is None
+    assert worker_1.version == worker_2.version
+
+
+def test_toggle_invalidates_public_endpoint(admin_client, webhook, webhook_app):
+    webhook_id, name = webhook
+    assert admin_client.post(f'/webhook/{name}', json={}).status_code == 200
+    assert admin_client.post(f'/webhook/{name}', json={}).status_code == 200
+    assert webhook_app.webhook_cache.hits >= 1
+
+    admin_client.post(f'/webhook/{webhook_id}/toggle')
+    assert admin_client.post(f'/webhook/{name}', json={}).status_code == 404
@@ -0,0 +1,86 @@
+"""Contadores de tráfego por webhook agregados por minuto.
+
+A ingestão só incrementa contadores em memória (por webhook, minuto,
+método e status HTTP); uma thread de fundo grava os agregados
+periodicamente com upsert na tabela de rollups. Consultas de volume leem
+os rollups em vez de fazer COUNT(*) sobre os logs.
+"""
+import atexit
+import os
+import threading
+from collections import Counter
+
+
+def minute_bucket(ts):
+    return ts.replace(second=0, microsecond=0)
+
+
+class StatsCollector:
+    """Acumula contadores e os entrega a ``flush_fn(counts, last_seen)``.
+
+    ``counts`` é um Counter {(webhook_id, minuto, método, status): n} e
+    ``last_seen`` um dict {webhook_id: datetime da última requisição}.
+    """
+
+    def __init__(self, flush_fn, interval=10.0):
+        self.flush_fn = flush_fn
+        self.interval = interval
+        self._counts = Counter()
+        self._last_seen = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._stopping = threading.Event()
+
+    def record(self, webhook_id, method, status, ts):
+        with self._lock:
+            self._counts[(webhook_id, minute_bucket(ts), method, status)] += 1
+            if ts > self._last_seen.get(webhook_id, ts.min):
+                self._last_seen[webhook_id] = ts
+        self._ensure_worker()
+
+    def pending(self, webhook_id):
+        """Total ainda não gravado de um webhook"""
+        with self._lock:
+            return sum(n for key, n in self._counts.items() if key[0] == webhook_id)
+
+    def _ensure_worker(self):
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            if self._pid is not None and self._pid != os.getpid():
+                # Contadores herdados do processo pai já são dele
+                self._counts = Counter()
+                self._last_seen = {}
+            self._pid = os.getpid()
+            self._stopping = threading.Event()
+            self._thread = threading.Thread(target=self._run, name='stats-flusher', daemon=True)
+            self._thread.start()
+            atexit.register(self.flush)
+
+    def flush(self):
+        """Gravar os contadores acumulados (devolve-os se a gravação falhar)"""
+        with self._lock:
+            counts, self._counts = self._counts, Counter()
+            last_seen, self._last_seen = self._last_seen, {}
+        if not counts:
+            return
+        try:
+            self.flush_fn(counts, last_seen)
+        except Exception as e:
+            print(f"Erro ao gravar estatísticas de tráfego: {e}")
+            with self._lock:
+                self._counts.update(counts)
+                for webhook_id, ts in last_seen.items():
+                    if ts > self._last_seen.get(webhook_id, ts.min):
+                        self._last_seen[webhook_id] = ts
+
+    def _run(self):
+        while not self._stopping.wait(self.interval):
+            self.flush()
+
+    def stop(self):
+        self._stopping.set()
+        self.flush()
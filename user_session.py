@@ -0,0 +1,109 @@
+"""Usuário autenticado sem consulta ao banco a cada requisição.
+
+- ``CachedUser``: cópia leve do usuário (sem o hash da senha) guardada num
+  ``WebhookCache`` por id, com TTL e invalidação entre processos.
+- Identidade na sessão: login grava (id, usuário, email, versão das
+  credenciais) na sessão assinada; enquanto a versão daquele usuário
+  (contador compartilhado, incrementado quando ele é alterado) não mudar e
+  a verificação for recente, ``load_user`` usa só a sessão. Alterar um
+  usuário não invalida as sessões dos demais.
+- ``PasswordHasher``: hash/verificação de senha num executor limitado,
+  recusando logins quando a fila enche em vez de prender os workers.
+"""
+import hashlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from flask_login import UserMixin
+from werkzeug.security import check_password_hash, generate_password_hash
+
+SESSION_KEY = '_identity'
+
+
+class CachedUser(UserMixin):
+    """Usuário somente leitura (current_user) montado a partir do cache ou da sessão"""
+
+    __slots__ = ('id', 'username', 'email', 'active', 'auth_version')
+
+    def __init__(self, id, username, email, active=True, auth_version=None):
+        self.id = id
+        self.username = username
+        self.email = email
+        self.active = active
+        self.auth_version = auth_version
+
+    @property
+    def is_active(self):
+        return self.active
+
+    def __repr__(self):
+        return f'<CachedUser {self.username}>'
+
+
+def auth_version(password_hash):
+    """Muda sempre que a senha muda (sem expor o hash na sessão)"""
+    return hashlib.sha256(password_hash.encode('utf-8')).hexdigest()[:16]
+
+
+def from_user(user):
+    return CachedUser(user.id, user.username, user.email, bool(user.is_active), auth_version(user.password_hash))
+
+
+def store_identity(session, user, user_version):
+    """Gravar a identidade mínima do usuário na sessão assinada"""
+    session[SESSION_KEY] = [user.id, user.username, user.email, user.auth_version, user_version, int(time.time())]
+
+
+def load_identity(session, user_id, user_version, max_age):
+    """Usuário da sessão se ainda válido (mesma versão do usuário e verificado há pouco).
+
+    ``user_version`` None (versão indisponível) nunca confia na sessão.
+    """
+    identity = session.get(SESSION_KEY)
+    if not identity or len(identity) != 6 or user_version is None:
+        return None
+    uid, username, email, version, identity_version, checked = identity
+    if str(uid) != str(user_id) or identity_version != user_version or time.time() - checked > max_age:
+        return None
+    return CachedUser(uid, username, email, True, version)
+
+
+class HasherBusy(Exception):
+    """Muitas verificações de senha pendentes"""
+
+
+class PasswordHasher:
+    """Executor limitado para o hash das senhas (PBKDF2/scrypt liberam o GIL)"""
+
+    def __init__(self, workers=2, max_pending=16, timeout=10.0):
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash')
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self.rejected = 0
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            self.rejected += 1
+            raise HasherBusy('Muitas verificações de senha em andamento')
+        try:
+            future = self._executor.submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        # A vaga só volta quando o hash termina, mesmo se a requisição desistir antes
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(self.timeout)
+        except FutureTimeout:
+            self.rejected += 1
+            raise HasherBusy('Verificação de senha demorou demais')
+
+    def check(self, password_hash, password):
+        return self._run(check_password_hash, password_hash, password)
+
+    def generate(self, password):
+        return self._run(generate_password_hash, password)
+
+    def close(self):
+        self._executor.shutdown(wait=False)
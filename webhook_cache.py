@@ -0,0 +1,123 @@
+"""Cache em memória da resolução nome -> webhook usada nas rotas públicas.
+
+Guarda (id, token, is_active) por nome com TTL e despejo LRU, e também
+guarda nomes inexistentes (cache negativo) para que varreduras de 404 não
+cheguem ao banco.
+
+Invalidação entre processos: cada invalidação grava uma nova versão num
+arquivo de carimbo compartilhado (pasta instance/). Cada worker relê o
+carimbo no máximo a cada ``stamp_interval`` segundos e limpa o cache local
+quando a versão muda, então uma desativação é vista por todos os workers do
+gunicorn em no máximo ``stamp_interval`` segundos.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+CachedWebhook = namedtuple(
+    'CachedWebhook',
+    ['id', 'name', 'token', 'is_active', 'rate_limit', 'rate_limit_burst', 'max_body_bytes'],
+    defaults=(None, None, None)
+)
+
+_MISSING = object()
+
+
+class WebhookCache:
+    """Cache LRU com TTL (positivo e negativo) e carimbo entre processos.
+
+    ``loader(name)`` deve retornar um ``CachedWebhook`` ou ``None``.
+    """
+
+    def __init__(self, loader, ttl=60.0, negative_ttl=10.0, maxsize=10000,
+                 stamp_path=None, stamp_interval=1.0):
+        self.loader = loader
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.maxsize = maxsize
+        self.stamp_path = stamp_path
+        self.stamp_interval = stamp_interval
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stamp_version = self._read_stamp()
+        self._stamp_checked = time.monotonic()
+
+        self.hits = 0
+        self.misses = 0
+
+    def _read_stamp(self):
+        if not self.stamp_path:
+            return None
+        try:
+            with open(self.stamp_path) as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _check_stamp(self, now):
+        if not self.stamp_path or now - self._stamp_checked < self.stamp_interval:
+            return
+        self._stamp_checked = now
+        version = self._read_stamp()
+        if version != self._stamp_version:
+            self._stamp_version = version
+            with self._lock:
+                self._entries.clear()
+
+    @property
+    def version(self):
+        """Versão atual do carimbo (muda a cada invalidação em qualquer processo)"""
+        self._check_stamp(time.monotonic())
+        return self._stamp_version
+
+    def get(self, name):
+        """Resolver webhook pelo nome (consulta o banco só em cache miss)"""
+        now = time.monotonic()
+        self._check_stamp(now)
+
+        with self._lock:
+            entry = self._entries.get(name, _MISSING)
+            if entry is not _MISSING:
+                expires, value = entry
+                if expires > now:
+                    self._entries.move_to_end(name)
+                    self.hits += 1
+                    return value
+                del self._entries[name]
+
+        self.misses += 1
+        value = self.loader(name)
+        ttl = self.ttl if value is not None else self.negative_ttl
+        if ttl > 0:
+            with self._lock:
+                self._entries[name] = (now + ttl, value)
+                self._entries.move_to_end(name)
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+        return value
+
+    def get_active(self, name):
+        """Como get(), mas trata webhooks inativos como inexistentes"""
+        value = self.get(name)
+        if value is None or not value.is_active:
+            return None
+        return value
+
+    def invalidate(self, name=None):
+        """Remover um nome (ou tudo) e avisar os outros processos"""
+        with self._lock:
+            if name is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(name, None)
+
+        if self.stamp_path:
+            version = f"{os.getpid()}-{time.time_ns()}"
+            try:
+                with open(self.stamp_path, 'w') as f:
+                    f.write(version)
+                self._stamp_version = version
+            except OSError as e:
+                print(f"Erro ao gravar carimbo do cache de webhooks: {e}")